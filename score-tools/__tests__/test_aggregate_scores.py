@@ -0,0 +1,49 @@
+import glob
+import os
+import subprocess
+import sys
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, script), *args], cwd=cwd, check=True,
+                          stdout=subprocess.PIPE, text=True).stdout
+
+
+def totals(directory):
+    return {os.path.basename(path): open(path, encoding='utf-8').read()
+            for path in glob.glob(os.path.join(directory, '*_totals_result.csv'))}
+
+
+def test_parallel_totals_match_serial_and_only_outdated_domains_are_rewritten(tmp_path):
+    run('benchmark-scores.py', 'generate', '-o', str(tmp_path), '--domains', '4', '--pages', '10', '--issues', '3',
+        '--history', '2', '--format', 'json', cwd=str(tmp_path))
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(tmp_path))
+    run('calculate-score.py', '-d', 'summary', cwd=str(tmp_path))
+
+    run('aggregate-scores.py', '-d', 'summary', '-s', 'serial.sqlite', '-o', 'serial', '-j', '1', cwd=str(tmp_path))
+    run('aggregate-scores.py', '-d', 'summary', '-s', 'parallel.sqlite', '-o', 'parallel', '-j', '3', cwd=str(tmp_path))
+    assert len(totals(tmp_path / 'serial')) == 4
+    assert totals(tmp_path / 'parallel') == totals(tmp_path / 'serial')
+    assert not glob.glob(str(tmp_path / 'parallel' / '*.tmp'))
+
+    # Nothing new, nothing rewritten
+    output = run('aggregate-scores.py', '-d', 'summary', '-s', 'parallel.sqlite', '-o', 'parallel', '-j', '3',
+                 cwd=str(tmp_path))
+    assert 'Summary file created' not in output
+
+    # A changed result file only rewrites the totals of its domain
+    result_file = sorted(glob.glob(str(tmp_path / 'summary' / '*_result.csv')))[0]
+    with open(result_file, 'a', encoding='utf-8') as file:
+        file.write('score,9.9\n')
+    output = run('aggregate-scores.py', '-d', 'summary', '-s', 'parallel.sqlite', '-o', 'parallel', '-j', '3',
+                 cwd=str(tmp_path))
+    assert output.count('Summary file created') == 1
+    domain = os.path.basename(result_file).rsplit('_', 2)[0]
+    assert '9.9' in totals(tmp_path / 'parallel')[f'{domain}_totals_result.csv']
+
+    # --all rewrites every domain
+    output = run('aggregate-scores.py', '-d', 'summary', '-s', 'parallel.sqlite', '-o', 'parallel', '--all',
+                 cwd=str(tmp_path))
+    assert output.count('Summary file created') == 4
@@ -0,0 +1,72 @@
+import csv
+import glob
+import json
+import os
+import subprocess
+import sys
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCORE_TOOLS)
+from sharding import in_shard, parse_shard, shard_of  # noqa: E402
+
+SHARDS = 3
+
+
+def run(script, *args, cwd):
+    return subprocess.Popen([sys.executable, os.path.join(SCORE_TOOLS, script), *args], cwd=cwd,
+                            stdout=subprocess.DEVNULL)
+
+
+def split_scan(report_file, shard_root):
+    # Writes the part of one compiledResults.json each shard would have scanned
+    with open(report_file, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    scan_id = report_file.split(os.sep)[-3]
+    for shard in range(SHARDS):
+        part = json.loads(json.dumps(report))
+        part['pagesScanned'] = [page for page in part['pagesScanned'] if shard_of(page['url'], SHARDS) == shard]
+        for category in part['items'].values():
+            for rule in category['rules']:
+                rule['pagesAffected'] = [page for page in rule['pagesAffected'] if shard_of(page['url'], SHARDS) == shard]
+        reports = os.path.join(shard_root, f"shard-{shard}", 'results', scan_id, 'reports')
+        os.makedirs(reports, exist_ok=True)
+        with open(os.path.join(reports, 'compiledResults.json'), 'w', encoding='utf-8') as file:
+            json.dump(part, file)
+
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return sorted(tuple(row) for row in csv.reader(file))
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    assert sum(in_shard('https://www.example.gov/', (index, 4)) for index in range(1, 5)) == 1
+
+
+def test_merged_shards_score_like_a_single_node(tmp_path):
+    subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, 'benchmark-scores.py'), 'generate', '-o', str(tmp_path),
+                    '--domains', '2', '--pages', '60', '--issues', '6', '--history', '1', '--format', 'json'],
+                   check=True, stdout=subprocess.DEVNULL)
+    for report_file in glob.glob(os.path.join(str(tmp_path), 'results', '*', 'reports', 'compiledResults.json')):
+        split_scan(report_file, str(tmp_path))
+
+    # One process for the whole run and one per shard, as on separate machines
+    processes = [run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(tmp_path))]
+    for shard in range(SHARDS):
+        shard_directory = tmp_path / f"shard-{shard}"
+        os.makedirs(shard_directory / 'summary')
+        processes.append(run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(shard_directory)))
+    assert all(process.wait() == 0 for process in processes)
+
+    shard_summaries = [str(tmp_path / f"shard-{shard}" / 'summary') for shard in range(SHARDS)]
+    assert run('merge-shards.py', '-i', *shard_summaries, '-o', 'merged', cwd=str(tmp_path)).wait() == 0
+    for summary in ('summary', 'merged'):
+        assert run('calculate-score.py', '-d', summary, cwd=str(tmp_path)).wait() == 0
+
+    single = sorted(os.path.basename(path) for path in glob.glob(str(tmp_path / 'summary' / '*.csv')))
+    merged = sorted(os.path.basename(path) for path in glob.glob(str(tmp_path / 'merged' / '*.csv')))
+    assert single == merged
+    assert any(name.endswith('_result.csv') for name in single)
+    for name in single:
+        assert read_rows(tmp_path / 'summary' / name) == read_rows(tmp_path / 'merged' / name), name
@@ -0,0 +1,50 @@
+import csv
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+EMPTY_RULE = {'rule': 'aria-allowed-role', 'description': 'ARIA role should be appropriate for the element',
+              'axeImpact': 'minor', 'conformance': ['best-practice'], 'totalItems': 0, 'pagesAffected': []}
+
+
+def run(script, *args, cwd):
+    subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, script), *args], cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def read_summaries(summary):
+    summaries = {}
+    for path in glob.glob(os.path.join(summary, '*.csv')):
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            summaries[os.path.basename(path)] = sorted(tuple(row) for row in csv.reader(file))
+    return summaries
+
+
+def test_json_and_csv_reports_summarize_alike_with_a_rule_without_items(tmp_path):
+    run('benchmark-scores.py', 'generate', '-o', str(tmp_path / 'both'), '--domains', '2', '--pages', '20',
+        '--issues', '4', '--history', '1', '--format', 'both', cwd=str(tmp_path))
+    for reports in glob.glob(str(tmp_path / 'both' / 'results' / '*' / 'reports')):
+        # Purple A11y keeps rules whose items were all removed, report.csv gets an empty row for them
+        with open(os.path.join(reports, 'compiledResults.json'), 'r', encoding='utf-8') as file:
+            scan = json.load(file)
+        scan['items']['goodToFix']['rules'].append(EMPTY_RULE)
+        with open(os.path.join(reports, 'compiledResults.json'), 'w', encoding='utf-8') as file:
+            json.dump(scan, file)
+        with open(os.path.join(reports, 'report.csv'), 'a', encoding='utf-8') as file:
+            file.write(',,,,,,,,,\n')
+
+    summaries = {}
+    for report_format, other in [('csv', 'compiledResults.json'), ('json', 'report.csv')]:
+        shutil.copytree(tmp_path / 'both', tmp_path / report_format)
+        for path in glob.glob(str(tmp_path / report_format / 'results' / '*' / 'reports' / other)):
+            os.remove(path)
+        run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(tmp_path / report_format))
+        summaries[report_format] = read_summaries(str(tmp_path / report_format / 'summary'))
+
+    assert summaries['json'] and summaries['json'] == summaries['csv']
+    assert any(('', '1') in rows for rows in summaries['json'].values())
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from report_watcher import ReportWatcher  # noqa: E402
+
+
+def write_report(results, scan_id, age=0):
+    reports = results / scan_id / 'reports'
+    reports.mkdir(parents=True, exist_ok=True)
+    report = reports / 'report.csv'
+    report.write_text('severity,issueId\n')
+    if age:
+        modified = time.time() - age
+        os.utime(report, (modified, modified))
+    return str(report)
+
+
+def test_waits_until_reports_settle(tmp_path):
+    finished = write_report(tmp_path, '20240101_010000_www.example.gov', age=60)
+    (tmp_path / '20240101_020000_www.example.org').mkdir()
+    watcher = ReportWatcher(str(tmp_path), settle=0.5, use_inotify=False)
+
+    assert watcher.check() == ([finished], None)
+
+    writing = write_report(tmp_path, '20240101_020000_www.example.org')
+    ready, next_check = watcher.check()
+    assert ready == []
+    assert 0 < next_check <= 0.5
+
+    time.sleep(next_check + 0.05)
+    assert watcher.check() == ([writing], None)
+
+
+def test_yields_rewritten_reports_again(tmp_path):
+    report = write_report(tmp_path, '20240101_010000_www.example.gov', age=60)
+    watcher = ReportWatcher(str(tmp_path), settle=0.5, use_inotify=False)
+    assert watcher.check()[0] == [report]
+    assert watcher.check()[0] == []
+
+    write_report(tmp_path, '20240101_010000_www.example.gov', age=30)
+    assert watcher.check()[0] == [report]
+
+
+def test_skips_known_reports_until_they_change(tmp_path):
+    known = write_report(tmp_path, '20240101_010000_www.example.gov', age=60)
+    new = write_report(tmp_path, '20240102_010000_www.example.gov', age=60)
+    watcher = ReportWatcher(str(tmp_path), settle=0.5, use_inotify=False,
+                            known={known: os.stat(known).st_mtime})
+    assert watcher.check()[0] == [new]
+
+    write_report(tmp_path, '20240101_010000_www.example.gov', age=30)
+    assert watcher.check()[0] == [known]
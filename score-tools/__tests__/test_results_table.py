@@ -0,0 +1,91 @@
+import csv
+import glob
+import os
+import subprocess
+import sys
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCORE_TOOLS)
+from score_store import RESULTS_TABLE, ScoreStore, read_results_table  # noqa: E402
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, script), *args], cwd=cwd, check=True,
+                          stdout=subprocess.PIPE, text=True).stdout
+
+
+def read_result_file(path):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return {row[0]: row[1] for row in csv.reader(file) if row}
+
+
+def test_batch_table_matches_result_files_and_is_idempotent(tmp_path):
+    run('benchmark-scores.py', 'generate', '-o', str(tmp_path), '--domains', '3', '--pages', '20', '--issues', '4',
+        '--history', '2', '--format', 'json', cwd=str(tmp_path))
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(tmp_path))
+    run('calculate-score.py', '-d', 'summary', cwd=str(tmp_path))
+
+    table = tmp_path / 'summary' / RESULTS_TABLE
+    output = run('calculate-score.py', '-d', 'summary', '--batch', cwd=str(tmp_path))
+    assert output.strip().splitlines() == [f"Scored 6 scans (0 failed), 6 rows in {os.path.join('summary', RESULTS_TABLE)}"]
+    first = table.read_text()
+
+    rows = read_results_table(table)
+    result_files = glob.glob(str(tmp_path / 'summary' / '*_result.csv'))
+    assert len(rows) == len(result_files) == 6
+    for path in result_files:
+        expected = read_result_file(path)
+        row = next(row for row in rows if (row['domain'], row['date']) == (expected['domain'], expected['date']))
+        assert {key: row[key] for key in ('number_urls', 'score', 'grade')} == \
+            {key: expected[key] for key in ('number_urls', 'score', 'grade')}
+
+    # Rerunning, also for a single scan, rewrites the same rows instead of appending
+    run('calculate-score.py', '-d', 'summary', '--batch', '--summary', cwd=str(tmp_path))
+    run('calculate-score.py', '-d', 'summary', '--batch', '--scan', rows[0]['scan_id'], cwd=str(tmp_path))
+    run('calculate-score.py', '-d', 'summary', cwd=str(tmp_path))
+    assert table.read_text() == first
+    assert all(sum(1 for _ in open(path, encoding='utf-8')) == 5 for path in result_files)
+
+    # The table is ingested like the result files and gives the same totals
+    store_path = str(tmp_path / 'table.sqlite')
+    os.makedirs(tmp_path / 'only-table')
+    os.replace(table, tmp_path / 'only-table' / RESULTS_TABLE)
+    run('aggregate-scores.py', '-d', 'only-table', '-s', store_path, cwd=str(tmp_path))
+    run('aggregate-scores.py', '-d', 'summary', '-s', str(tmp_path / 'files.sqlite'), cwd=str(tmp_path))
+    with ScoreStore(store_path) as from_table, ScoreStore(str(tmp_path / 'files.sqlite')) as from_files:
+        assert len(from_files.domains()) == 3
+        assert from_table.domains() == from_files.domains()
+        for domain in from_files.domains():
+            assert from_table.series(domain) == from_files.series(domain)
+
+    # Rewriting the table with the same rows touches no domain, a changed row only its own
+    table = tmp_path / 'only-table' / RESULTS_TABLE
+    table.write_text(table.read_text())
+    output = run('aggregate-scores.py', '-d', 'only-table', '-s', store_path, cwd=str(tmp_path))
+    assert 'Summary file created' not in output
+    table.write_text(table.read_text().replace(f",{rows[0]['score']},", ',9.9,', 1))
+    output = run('aggregate-scores.py', '-d', 'only-table', '-s', store_path, cwd=str(tmp_path))
+    assert output.count('Summary file created') == 1
+
+
+def test_score_counts_every_impact_of_the_summary(tmp_path):
+    run('benchmark-scores.py', 'generate', '-o', str(tmp_path), '--domains', '1', '--pages', '20', '--issues', '6',
+        '--history', '1', '--format', 'json', cwd=str(tmp_path))
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'summary', cwd=str(tmp_path))
+    axe_impact_file = glob.glob(str(tmp_path / 'summary' / '*_axeImpact.csv'))[0]
+    with open(axe_impact_file, 'r', encoding='utf-8', newline='') as file:
+        impacts = [row for row in csv.reader(file) if row]
+    # find-score.py writes no header, the first row is already an impact
+    assert impacts[0][0] in ('critical', 'serious', 'moderate', 'minor')
+    with open(axe_impact_file.replace('_axeImpact.csv', '_number_urls.csv'), 'r', encoding='utf-8') as file:
+        number_urls = int(file.read())
+
+    def expected_score(rows):
+        weights = {'critical': 3, 'serious': 2, 'moderate': 1.5, 'minor': 1}
+        return round(sum(weights.get(impact, 0) * int(count) for impact, count in rows) / (number_urls * 5), 4)
+
+    run('calculate-score.py', '-d', 'summary', '--batch', cwd=str(tmp_path))
+    score = float(read_results_table(tmp_path / 'summary' / RESULTS_TABLE)[0]['score'])
+    # Skipping the first row as a header gave the score without the first impact
+    assert expected_score(impacts[1:]) != expected_score(impacts)
+    assert score == expected_score(impacts)
@@ -0,0 +1,92 @@
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCORE_TOOLS)
+dispatcher = runpy.run_path(os.path.join(SCORE_TOOLS, 'scan-dispatcher.py'))
+
+
+def test_results_directory_is_the_first_word_after_the_marker(tmp_path):
+    output = ('\x1b[36m╭──────────────────────────────────────────────────────────────╮\x1b[39m\n'
+              '\x1b[36m│\x1b[39m \x1b[1mResults directory is at\x1b[22m results/20240101_www.example.gov │\n'
+              '\x1b[36m╰──────────────────────────────────────────────────────────────╯\x1b[39m\n')
+    assert dispatcher['find_results_directory'](output, str(tmp_path)) == \
+        str(tmp_path / 'results' / '20240101_www.example.gov')
+    assert dispatcher['find_results_directory']('Results directory is at\n', str(tmp_path)) is None
+
+
+def test_scan_without_its_results_directory_fails(tmp_path):
+    cli = tmp_path / 'cli.js'
+    cli.write_text("console.log('Results directory is at results/20240101_www.example.gov');\n")
+    if shutil.which('node') is None:
+        pytest.skip('node is not installed')
+    run_scan = dispatcher['run_scan']
+
+    exit_code, _, results_dir = run_scan('https://www.example.gov', str(tmp_path), [], None)
+    assert exit_code == 1 and results_dir.endswith('20240101_www.example.gov')
+
+    os.makedirs(results_dir)
+    assert run_scan('https://www.example.gov', str(tmp_path), [], None)[0] == 0
+
+
+FAKE_CLI = """
+const fs = require('fs');
+const url = process.argv[process.argv.indexOf('-u') + 1];
+const key = url.replace(/\\W+/g, '_');
+const attempts = (fs.existsSync(`attempts_${key}`) ? Number(fs.readFileSync(`attempts_${key}`)) : 0) + 1;
+fs.writeFileSync(`attempts_${key}`, String(attempts));
+if (url.includes('down') || (url.includes('flaky') && attempts < 2)) process.exit(1);
+fs.mkdirSync(`results/20240101_${key}`, {recursive: true});
+console.log(`Results directory is at results/20240101_${key}`);
+"""
+
+
+def dispatch(tmp_path, purple_dir, *extra):
+    return subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, 'scan-dispatcher.py'), '-c', 'urls.csv',
+                           '--no-header', '--purple-dir', str(purple_dir), '--no-score', '-j', '2',
+                           '--backoff', '0.05', '--retries', '2', *extra],
+                          cwd=str(tmp_path), stdout=subprocess.PIPE, text=True, timeout=60)
+
+
+def read_ledger(tmp_path):
+    with open(tmp_path / 'scan_ledger.jsonl', 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_retries_with_backoff_and_resumes_from_the_ledger(tmp_path):
+    if shutil.which('node') is None:
+        pytest.skip('node is not installed')
+    purple_dir = tmp_path / 'purple'
+    purple_dir.mkdir()
+    (purple_dir / 'cli.js').write_text(FAKE_CLI)
+    (tmp_path / 'urls.csv').write_text('https://ok.example.gov\nhttps://flaky.example.gov\nhttps://down.example.gov\n')
+
+    completed = dispatch(tmp_path, purple_dir)
+    assert completed.returncode == 1
+    outcome = {(entry['url'].split('//')[1].split('.')[0], entry['attempt']): entry['status']
+               for entry in read_ledger(tmp_path)}
+    assert outcome == {('ok', 1): 'done', ('flaky', 1): 'retry', ('flaky', 2): 'done',
+                       ('down', 1): 'retry', ('down', 2): 'retry', ('down', 3): 'failed'}
+
+    # Resumed, nothing is scanned again but the failed URL still fails the run
+    completed = dispatch(tmp_path, purple_dir)
+    assert completed.returncode == 1 and 'Nothing to scan.' in completed.stdout
+    assert len(read_ledger(tmp_path)) == 6
+
+
+def test_scan_that_cannot_start_is_recorded_as_failed(tmp_path):
+    (tmp_path / 'urls.csv').write_text('https://a.example.gov\nhttps://b.example.gov\nhttps://c.example.gov\n')
+
+    completed = dispatch(tmp_path, tmp_path / 'missing')
+
+    assert completed.returncode == 1
+    entries = read_ledger(tmp_path)
+    assert sorted(entry['url'] for entry in entries) == \
+        ['https://a.example.gov', 'https://b.example.gov', 'https://c.example.gov']
+    assert all(entry['status'] == 'failed' and 'error' in entry for entry in entries)
@@ -0,0 +1,124 @@
+import glob
+import os
+import random
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCORE_TOOLS)
+from sketches import ColumnSketch, CountMinSketch, HyperLogLog, SpaceSaving, load_sketches, save_sketches  # noqa: E402
+
+ERROR = 0.01
+
+
+def zipf_stream(length, keys, seed):
+    # XPaths and URLs are skewed, a few template elements account for most issues
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return [f"/html/body/div[{key}]" for key in rng.choices(range(keys), weights, k=length)]
+
+
+@pytest.mark.parametrize('distinct', [10, 1000, 50000])
+def test_hyperloglog_within_error(distinct):
+    sketch = HyperLogLog(ERROR)
+    sketch.update(f"https://www.example.gov/page-{number}" for number in range(distinct))
+    # Three standard errors
+    assert abs(sketch.count() - distinct) <= max(1, 3 * ERROR * distinct)
+
+
+def test_hyperloglog_merge_is_union():
+    first, second, both = HyperLogLog(ERROR), HyperLogLog(ERROR), HyperLogLog(ERROR)
+    for number in range(20000):
+        url = f"https://www.example.gov/page-{number}"
+        (first if number < 12000 else second).add(url)
+        both.add(url)
+        if 8000 <= number < 12000:
+            second.add(url)
+    assert first.merge(second).registers == both.registers
+    assert HyperLogLog.from_dict(both.to_dict()).count() == both.count()
+
+
+def test_count_min_bounds():
+    stream = zipf_stream(50000, 5000, seed=1)
+    exact = Counter(stream)
+    sketch = CountMinSketch(ERROR)
+    for value in stream:
+        sketch.add(value)
+
+    for value, count in exact.items():
+        assert sketch.estimate(value) >= count
+    over = [sketch.estimate(value) - count > ERROR * len(stream) for value, count in exact.items()]
+    assert sum(over) <= 0.01 * len(exact) + 1
+
+
+def test_space_saving_finds_heavy_hitters():
+    stream = zipf_stream(50000, 5000, seed=2)
+    exact = Counter(stream)
+    sketch = SpaceSaving(ERROR)
+    for value in stream:
+        sketch.add(value)
+
+    for value, count in exact.items():
+        if count > ERROR * len(stream):
+            assert value in sketch.counts
+            assert count <= sketch.counts[value] <= count + ERROR * len(stream)
+
+
+def test_space_saving_heap_stays_bounded():
+    sketch = SpaceSaving(capacity=10)
+    for value in zipf_stream(5000, 500, seed=3):
+        sketch.add(value)
+    assert len(sketch.counts) == 10 and len(sketch.heap) <= 40
+    # The evicted key is always the least frequent one
+    smallest = min(sketch.counts.values())
+    sketch.add('/html/body/new')
+    assert sketch.counts['/html/body/new'] == smallest + 1
+
+
+def test_merged_column_sketches_match_exact_counts(tmp_path):
+    shards = [zipf_stream(20000, 3000, seed=seed) for seed in range(3)]
+    exact = Counter(value for shard in shards for value in shard)
+
+    merged = None
+    for number, shard in enumerate(shards):
+        sketch = ColumnSketch(ERROR)
+        for value in shard:
+            sketch.add(value)
+        path = str(tmp_path / f"shard-{number}.json")
+        save_sketches(path, {'xpath': sketch})
+        loaded = load_sketches(path)['xpath']
+        merged = loaded if merged is None else merged.merge(loaded)
+
+    total = sum(exact.values())
+    assert abs(merged.distinct.count() - len(exact)) <= 3 * ERROR * len(exact)
+    top = dict(merged.top(10))
+    for value, count in exact.most_common(10):
+        assert value in top
+        assert count <= top[value] <= count + 2 * ERROR * total
+
+
+def read_page_counts(summary):
+    counts = {}
+    for path in glob.glob(os.path.join(summary, '*_number_urls.csv')):
+        with open(path, 'r', encoding='utf-8') as file:
+            counts[os.path.basename(path)] = int(file.read().strip())
+    return counts
+
+
+@pytest.mark.parametrize('report_format', ['csv', 'json'])
+def test_find_score_counts_pages_with_the_url_sketch(tmp_path, report_format):
+    subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, 'benchmark-scores.py'), 'generate', '-o', str(tmp_path),
+                    '--domains', '2', '--pages', '80', '--issues', '4', '--history', '1', '--format', report_format],
+                   check=True, stdout=subprocess.DEVNULL)
+    for summary, options in [('exact', []), ('sketched', ['--sketches'])]:
+        os.makedirs(tmp_path / summary)
+        subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, 'find-score.py'), '-d', 'results', '-p', '2024',
+                        '-o', summary, *options], cwd=str(tmp_path), check=True, stdout=subprocess.DEVNULL)
+
+    exact, sketched = read_page_counts(str(tmp_path / 'exact')), read_page_counts(str(tmp_path / 'sketched'))
+    assert exact and exact.keys() == sketched.keys()
+    for name, count in exact.items():
+        assert abs(sketched[name] - count) <= max(1, 3 * ERROR * count)
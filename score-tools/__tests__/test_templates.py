@@ -0,0 +1,75 @@
+import csv
+import glob
+import os
+import subprocess
+import sys
+from collections import Counter
+
+SCORE_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SCORE_TOOLS)
+from templates import TemplateIndex, context_hash, load_templates, normalize_xpath, save_templates  # noqa: E402
+
+HEADER_LINK = '<a href="/contact">Contact</a>'
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, os.path.join(SCORE_TOOLS, script), *args], cwd=cwd, check=True,
+                          stdout=subprocess.PIPE, text=True).stdout
+
+
+def read_counts(path):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return {row[0]: int(row[1]) for row in csv.reader(file) if row}
+
+
+def test_fingerprints_count_pages_once_and_split_templated_issues(tmp_path):
+    index = TemplateIndex()
+    for page in range(3):
+        url = f"https://www.example.gov/page-{page}"
+        index.add('link-name', '/html/body/header/a', HEADER_LINK, url)
+        index.add('link-name', ' /html/body/header/ a ', HEADER_LINK, url)
+        index.add('image-alt', f"/html/body/main/img[{page + 1}]", '<img src="photo.jpg">', url)
+
+    assert normalize_xpath(' /html/body/header/ a/ ') == '/html/body/header/a'
+    assert index.rows()[0] == ('link-name', '/html/body/header/a', context_hash(HEADER_LINK), 3, 6)
+    assert index.split() == {'templated': (1, 6), 'page_unique': (3, 3)}
+
+    save_templates(str(tmp_path / 'templates.csv'), index)
+    # Another shard with one more page of the header link
+    shard = TemplateIndex()
+    shard.add('link-name', '/html/body/header/a', HEADER_LINK, 'https://www.example.gov/page-3')
+    merged = load_templates(str(tmp_path / 'templates.csv'), shard)
+    assert merged.rows()[0][3:] == (4, 7)
+    assert merged.split() == {'templated': (1, 7), 'page_unique': (3, 3)}
+
+
+def test_templates_keep_the_scores_and_xpath_counts(tmp_path):
+    run('benchmark-scores.py', 'generate', '-o', str(tmp_path), '--domains', '2', '--pages', '40', '--issues', '5',
+        '--history', '1', '--format', 'both', cwd=str(tmp_path))
+    os.makedirs(tmp_path / 'exact')
+    os.makedirs(tmp_path / 'templates')
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'exact', cwd=str(tmp_path))
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'templates', '--templates', cwd=str(tmp_path))
+
+    templates_files = sorted(glob.glob(str(tmp_path / 'templates' / '*_templates.csv')))
+    assert len(templates_files) == 2
+    assert not glob.glob(str(tmp_path / 'templates' / '*_xpath.csv'))
+    assert not glob.glob(str(tmp_path / 'templates' / '*_context.csv'))
+    for path in templates_files:
+        xpaths = Counter()
+        for _, xpath, _, _, occurrences in load_templates(path).rows():
+            xpaths[xpath] += occurrences
+        summary_base = os.path.basename(path)[:-len('_templates.csv')]
+        assert xpaths == read_counts(str(tmp_path / 'exact' / f"{summary_base}_xpath.csv"))
+
+    exact = run('calculate-score.py', '-d', 'exact', cwd=str(tmp_path))
+    templated = run('calculate-score.py', '-d', 'templates', cwd=str(tmp_path))
+    assert [line for line in exact.splitlines() if line.startswith('Score')] == \
+        [line for line in templated.splitlines() if line.startswith('Score')]
+    assert templated.count('Templated: ') == 2
+    assert 'templated, ' in templated and 'Page-unique: ' in templated
+
+    # Summarizing again without --templates drops the templates file
+    run('find-score.py', '-d', 'results', '-p', '2024', '-o', 'templates', '--force', cwd=str(tmp_path))
+    assert not glob.glob(str(tmp_path / 'templates' / '*_templates.csv'))
+    assert len(glob.glob(str(tmp_path / 'templates' / '*_xpath.csv'))) == 2
@@ -3,9 +3,15 @@ import os
 import glob
 import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from results_catalog import domain_key, open_catalog
+from score_store import RESULTS_TABLE, ScoreStore, read_results_table
+from tool_metrics import add_metrics_arguments, metrics, metrics_session
 
 def extract_domain(filename):
-    # Assumes the filename format is 'domain_date_other.csv'
+    # Fallback for summaries without a results catalog, assumes 'domain_date_other.csv'
     parts = os.path.basename(filename).split('_')
     if len(parts) > 1:
         return '_'.join(parts[:-2])  # Extract everything before the last two parts
@@ -21,11 +27,18 @@ def read_result_file(filename):
                 data[key] = value
     return data
 
+def read_domain_results(filenames):
+    # Runs in a worker process, reads the new result files of one domain
+    return [(filename, read_result_file(filename)) for filename in filenames]
+
 def write_summary_file(output_filename, all_data):
     headers = sorted(all_data.keys())
-    dates = sorted(all_data[headers[0]].keys())
+    # Not every metric is recorded on every date, so use the dates of all of them
+    dates = sorted({date for values in all_data.values() for date in values})
 
-    with open(output_filename, 'w', newline='', encoding='utf-8') as file:
+    # Written to a temporary file and renamed, so readers never see a half written file
+    temporary = f"{output_filename}.tmp"
+    with open(temporary, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerow([''] + ['domain'] + [''] * (len(dates) - 1))
         writer.writerow([''] + dates)
@@ -35,33 +48,123 @@ def write_summary_file(output_filename, all_data):
             for date in dates:
                 row.append(all_data[header].get(date, ''))
             writer.writerow(row)
+    os.replace(temporary, output_filename)
+
+def write_domain_totals(store_path, domain, output_filename, since=None, until=None):
+    # Runs in a worker process with its own connection to the store, returns whether the
+    # domain had results to write
+    with ScoreStore(store_path) as store:
+        data = store.series(domain, since, until)
+    if not data:
+        return False
+    write_summary_file(output_filename, data)
+    return True
+
+def find_result_files(directory):
+    # Yields (result file, domain), from the results catalog when the directory has one
+    catalog = open_catalog(directory)
+    if catalog is None:
+        for filename in glob.glob(os.path.join(directory, '*_result.csv')):
+            yield filename, extract_domain(filename)
+        return
+
+    with catalog:
+        for scan in catalog.scans():
+            filename = os.path.join(directory, f"{scan['summary_base']}_result.csv")
+            if os.path.exists(filename):
+                yield filename, scan['domain_key']
 
-def aggregate_results(directory):
-    domain_data = defaultdict(lambda: defaultdict(dict))
+def run_tasks(pool, jobs, function, tasks):
+    # Runs function(*task) for every task, in the pool or in this process without one.
+    # About four chunks per worker keeps the workers busy without a round trip per domain.
+    if pool is None or not tasks:
+        return [function(*task) for task in tasks]
+    return list(pool.map(function, *zip(*tasks), chunksize=max(1, len(tasks) // (jobs * 4))))
 
-    for filename in glob.glob(os.path.join(directory, '*_result.csv')):
-        domain = extract_domain(filename)
-        data = read_result_file(filename)
-        date = data.get('date', 'unknown')
+def aggregate_results(directory, store, pool=None, jobs=1):
+    # Only files that are new or changed since the last run are read, the files of each
+    # domain by one worker. The store is only written from this process.
+    new_files = defaultdict(list)
+    for filename, domain in find_result_files(directory):
+        if not store.is_ingested(filename):
+            new_files[domain].append(filename)
 
-        for key in data:
-            if key != 'domain' and key != 'date':  # Skip 'domain' and 'date' keys
-                domain_data[domain][key][date] = data[key]
+    domains = sorted(new_files)
+    read = run_tasks(pool, jobs, read_domain_results, [(new_files[domain],) for domain in domains])
+    for domain, results in zip(domains, read):
+        for filename, data in results:
+            metrics.read_file(filename)
+            metrics.count('rows_parsed', len(data))
+            store.ingest(filename, domain, data)
+    updated_domains = set(domains)
 
-    return domain_data
+    # calculate-score.py --batch writes one table instead of the result files
+    table = os.path.join(directory, RESULTS_TABLE)
+    if os.path.exists(table) and not store.is_ingested(table):
+        metrics.read_file(table)
+        rows = [(domain_key(row['domain']), row) for row in read_results_table(table)]
+        metrics.count('rows_parsed', len(rows))
+        store.ingest_table(table, rows)
+        updated_domains.update(domain for domain, _ in rows)
+
+    return updated_domains
+
+def totals_filename(output_directory, domain):
+    return os.path.join(output_directory, f'{domain}_totals_result.csv')
+
+def outdated_domains(store, domains, output_directory):
+    # Domains whose totals file is missing or older than their latest results
+    updated_ns = store.updated_ns()
+    outdated = []
+    for domain in domains:
+        try:
+            written_ns = os.stat(totals_filename(output_directory, domain)).st_mtime_ns
+        except FileNotFoundError:
+            written_ns = None
+        if written_ns is None or domain not in updated_ns or written_ns < updated_ns[domain]:
+            outdated.append(domain)
+    return outdated
 
 def main():
     parser = argparse.ArgumentParser(description='Aggregate scores from CSV files.')
     parser.add_argument('-d', '--directory', default='./summary', help='Directory containing the CSV files')
+    parser.add_argument('-s', '--store', default=None, help='Score store database (default: scores.sqlite in the directory)')
+    parser.add_argument('-o', '--output-dir', default='./', help='Directory for the totals files (default: current directory)')
+    parser.add_argument('--domain', nargs='+', default=None, help='Only write the totals for these domains')
+    parser.add_argument('--since', default=None, help='First date to include in the totals, e.g. 20240101')
+    parser.add_argument('--until', default=None, help='Last date to include in the totals, e.g. 20241231')
+    parser.add_argument('--all', action='store_true', help='Rewrite the totals of every domain, not only of those with new results')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Worker processes (default: one per CPU, 1 to run in this process)')
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
     directory = args.directory
-    domains_data = aggregate_results(directory)
+    store_path = args.store or os.path.join(directory, 'scores.sqlite')
+    jobs = args.jobs or os.cpu_count() or 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    with metrics_session(args, 'aggregate-scores'), ScoreStore(store_path) as store, \
+            (ProcessPoolExecutor(jobs) if jobs > 1 else nullcontext()) as pool:
+        with metrics.stage('ingest'):
+            updated_domains = aggregate_results(directory, store, pool, jobs)
+        print(f"Ingested new results for {len(updated_domains)} domains into {store_path}")
+
+        domains = args.domain or store.domains()
+        if not (args.all or args.domain or args.since or args.until):
+            # A date range or an explicit list always writes, the files may hold another range
+            domains = outdated_domains(store, domains, args.output_dir)
 
-    for domain, data in domains_data.items():
-        output_filename = f'{domain}_totals_result.csv'
-        write_summary_file(output_filename, data)
-        print(f"Summary file created for {domain}: {output_filename}")
+        with metrics.stage('write_totals'):
+            written = run_tasks(pool, jobs, write_domain_totals,
+                                [(store_path, domain, totals_filename(args.output_dir, domain), args.since, args.until)
+                                 for domain in domains])
+        for domain, was_written in zip(domains, written):
+            output_filename = totals_filename(args.output_dir, domain)
+            if not was_written:
+                print(f"No results stored for {domain}")
+                continue
+            metrics.wrote_file(output_filename)
+            print(f"Summary file created for {domain}: {output_filename}")
 
 if __name__ == "__main__":
     main()
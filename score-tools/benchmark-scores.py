@@ -0,0 +1,323 @@
+#
+# Score Tools Benchmark
+#
+# Generates synthetic Purple A11y results and times find-score.py, calculate-score.py and
+# aggregate-scores.py on them, recording wall time, peak RSS and files opened per stage,
+# once for report.csv and once for compiledResults.json. Every run works on a fresh summary
+# directory. A stage that writes no CSV files fails the run, its timings would measure nothing.
+#
+# python benchmark-scores.py generate -o /tmp/bench --domains 20 --pages 200 --issues 10 --history 4
+# python benchmark-scores.py run --domains 20 --pages 200 --issues 10 --history 4 --baseline benchmark-baseline.json
+#
+
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (rule, description, axeImpact, category, conformance)
+RULES = [
+    ('image-alt', 'Images must have alternate text', 'critical', 'mustFix', ['wcag2a', 'wcag111']),
+    ('button-name', 'Buttons must have discernible text', 'critical', 'mustFix', ['wcag2a', 'wcag412']),
+    ('color-contrast', 'Elements must have sufficient color contrast', 'serious', 'mustFix', ['wcag2aa', 'wcag143']),
+    ('link-name', 'Links must have discernible text', 'serious', 'mustFix', ['wcag2a', 'wcag244', 'wcag412']),
+    ('html-has-lang', '<html> element must have a lang attribute', 'serious', 'mustFix', ['wcag2a', 'wcag311']),
+    ('label', 'Form elements must have labels', 'critical', 'mustFix', ['wcag2a', 'wcag412']),
+    ('region', 'All page content should be contained by landmarks', 'moderate', 'goodToFix', ['best-practice']),
+    ('heading-order', 'Heading levels should only increase by one', 'moderate', 'goodToFix', ['best-practice']),
+    ('landmark-unique', 'Landmarks should have a unique role or role/label/title', 'moderate', 'goodToFix', ['best-practice']),
+    ('meta-viewport-large', 'Users should be able to zoom and scale the text up to 500%', 'minor', 'goodToFix', ['best-practice']),
+    ('color-contrast-enhanced', 'Elements must meet enhanced color contrast ratio thresholds', 'serious', 'needsReview', ['wcag2aaa', 'wcag146']),
+]
+
+REPORT_FIELDS = ['severity', 'issueId', 'issueDescription', 'wcagConformance', 'url', 'context',
+                 'howToFix', 'axeImpact', 'xpath', 'learnMore']
+
+STAGES = [
+    ('find-score', 'find-score.py', lambda work: ['-d', os.path.join(work, 'results'), '-p', '',
+                                                  '-o', os.path.join(work, 'summary')]),
+    ('calculate-score', 'calculate-score.py', lambda work: ['-d', os.path.join(work, 'summary')]),
+    ('aggregate-scores', 'aggregate-scores.py', lambda work: ['-d', os.path.join(work, 'summary')]),
+]
+
+# find-score.py reads compiledResults.json when a scan has one, each format is timed on its own
+REPORT_FILES = {'csv': 'report.csv', 'json': 'compiledResults.json'}
+
+
+def build_scan(domain, pages, issues_per_page, rng):
+    # Returns the compiledResults.json structure for one scan, issue categories only
+    items = {category: {'totalItems': 0, 'rules': {}} for category in ('mustFix', 'goodToFix', 'needsReview', 'passed')}
+    for page_number in range(pages):
+        url = f"https://{domain}/page-{page_number}"
+        for issue_number in range(issues_per_page):
+            rule_id, description, impact, category, conformance = rng.choice(RULES)
+            rule = items[category]['rules'].setdefault(rule_id, {
+                'rule': rule_id, 'description': description, 'axeImpact': impact, 'conformance': conformance,
+                'helpUrl': f"https://dequeuniversity.com/rules/axe/4.8/{rule_id}", 'totalItems': 0, 'pagesAffected': {},
+            })
+            # Roughly half the issues come from the shared header and footer of the site template
+            if rng.random() < 0.5:
+                link = rng.randint(1, 8)
+                xpath = f"/html/body/header/nav/ul/li[{link}]/a"
+                html = f'<a href="/section-{link}">Section {link}</a>'
+            else:
+                xpath = f"/html/body/main/div[{issue_number + 1}]/p[{rng.randint(1, 20)}]"
+                html = f'<p class="content-{page_number}-{issue_number}">Page text</p>'
+            page = rule['pagesAffected'].setdefault(url, {'url': url, 'pageTitle': f"Page {page_number}", 'items': []})
+            page['items'].append({'html': html, 'message': f"Fix any of the following:\n  {description}", 'xpath': xpath})
+            rule['totalItems'] += 1
+            items[category]['totalItems'] += 1
+
+    for category in items.values():
+        category['rules'] = list(category['rules'].values())
+        for rule in category['rules']:
+            rule['pagesAffected'] = list(rule['pagesAffected'].values())
+    pages_scanned = [{'url': f"https://{domain}/page-{page_number}", 'pageTitle': f"Page {page_number}"}
+                     for page_number in range(pages)]
+    return {'urlScanned': f"https://{domain}", 'pagesScanned': pages_scanned, 'totalPagesScanned': pages, 'items': items}
+
+
+def write_report_csv(report_file, scan):
+    with open(report_file, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(REPORT_FIELDS)
+        for category in ('needsReview', 'mustFix', 'goodToFix'):
+            for rule in sorted(scan['items'][category]['rules'], key=lambda rule: rule['rule']):
+                wcag_conformance = ','.join(c for c in rule['conformance'] if c not in ('wcag2a', 'wcag2aa', 'wcag2aaa'))
+                for page in sorted(rule['pagesAffected'], key=lambda page: page['url']):
+                    for item in page['items']:
+                        writer.writerow([category, rule['rule'], rule['description'], wcag_conformance, page['url'],
+                                         item['html'], item['message'].replace('\n', ' '), rule['axeImpact'],
+                                         item['xpath'], rule['helpUrl']])
+
+
+def generate(output, domains, pages, issues, history, report_format='both', seed=1):
+    rng = random.Random(seed)
+    results_directory = os.path.join(output, 'results')
+    os.makedirs(results_directory, exist_ok=True)
+    os.makedirs(os.path.join(output, 'summary'), exist_ok=True)
+    first_date = datetime(2024, 1, 1, 2, 0, 0)
+
+    for domain_number in range(domains):
+        domain = f"www.site-{domain_number}.example.gov"
+        for scan_number in range(history):
+            started = first_date + timedelta(days=7 * scan_number, minutes=domain_number)
+            scan_id = f"{started.strftime('%Y%m%d_%H%M%S')}_{domain}"
+            reports = os.path.join(results_directory, scan_id, 'reports')
+            os.makedirs(reports, exist_ok=True)
+            scan = build_scan(domain, pages, issues, rng)
+            if report_format in ('csv', 'both'):
+                write_report_csv(os.path.join(reports, 'report.csv'), scan)
+            if report_format in ('json', 'both'):
+                with open(os.path.join(reports, 'compiledResults.json'), 'w', encoding='utf-8') as file:
+                    json.dump(scan, file, indent=4)
+
+    print(f"Generated {domains * history} scans in {results_directory}")
+
+
+def run_stage_child(stats_file, script, script_args):
+    # Runs one scoring script in this process and writes its resource use to stats_file. Worker
+    # processes it forks inherit the audit hook and the log, so their files are counted too.
+    import resource
+    import runpy
+
+    opened_log = f"{stats_file}.opened"
+    log = os.open(opened_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+    counting = [True]
+
+    def audit(event, args):
+        if not counting[0]:
+            return
+        if event == 'open' and isinstance(args[0], str) and not args[0].endswith(('.py', '.pyc', '.so')):
+            path = args[0]
+        elif event == 'sqlite3.connect':
+            path = str(args[0])
+        else:
+            return
+        # os.write raises no audit event, the appends of all processes land in the one log
+        os.write(log, path.encode('utf-8', 'surrogateescape') + b'\n')
+
+    sys.addaudithook(audit)
+    sys.argv = [script] + script_args
+    sys.path.insert(0, os.path.dirname(script))
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        counting[0] = False
+        os.close(log)
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS, RUSAGE_CHILDREN is the largest
+        # finished worker process
+        maxrss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                     resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        peak_rss_kb = maxrss // 1024 if sys.platform == 'darwin' else maxrss
+        with open(opened_log, 'rb') as file:
+            files_opened = file.read().count(b'\n')
+        os.remove(opened_log)
+        with open(stats_file, 'w', encoding='utf-8') as file:
+            json.dump({'peak_rss_kb': peak_rss_kb, 'files_opened': files_opened}, file)
+
+
+def csv_files_written_since(tree, since):
+    # Output of the stage, including what its worker processes wrote
+    written = 0
+    for root, _, files in os.walk(tree):
+        for name in files:
+            if name.endswith('.csv') and os.path.getmtime(os.path.join(root, name)) >= since:
+                written += 1
+    return written
+
+
+def prepare_work_directory(tree, work, report_format):
+    # A results directory linking only the reports of one format, and an empty summary
+    # directory, so every run summarizes every scan again however often the tree is used.
+    # Returns the number of scans linked.
+    results = os.path.join(tree, 'results')
+    report_name = REPORT_FILES[report_format]
+    scans = 0
+    for scan_id in sorted(os.listdir(results)):
+        source = os.path.join(results, scan_id, 'reports', report_name)
+        if not os.path.exists(source):
+            continue
+        reports = os.path.join(work, 'results', scan_id, 'reports')
+        os.makedirs(reports)
+        os.symlink(os.path.abspath(source), os.path.join(reports, report_name))
+        scans += 1
+    os.makedirs(os.path.join(work, 'summary'))
+    return scans
+
+
+def run_stages(work, label=''):
+    results = {}
+    for name, script, stage_args in STAGES:
+        name = f"{label}{name}"
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as stats:
+            stats_file = stats.name
+        command = [sys.executable, os.path.abspath(__file__), '_stage', stats_file,
+                   os.path.join(SCRIPT_DIR, script)] + stage_args(work)
+        started_at = time.time()
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=work, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall_time = time.perf_counter() - start
+        if completed.returncode != 0:
+            print(completed.stderr)
+            raise SystemExit(f"Stage {name} failed with exit code {completed.returncode}")
+        with open(stats_file, 'r', encoding='utf-8') as file:
+            stage = json.load(file)
+        os.remove(stats_file)
+        # A stage that matched no input finishes quickly and would pass as an improvement
+        if not csv_files_written_since(work, started_at):
+            raise SystemExit(f"Stage {name} wrote no CSV files, check its arguments")
+        stage['wall_time_s'] = round(wall_time, 3)
+        results[name] = stage
+        print(f"{name}: {stage['wall_time_s']}s, peak RSS {stage['peak_rss_kb']} KB, {stage['files_opened']} files opened")
+    return results
+
+
+def run_formats(tree, report_format):
+    # Runs the stages once per report format, stage names get the format as prefix, e.g.
+    # "csv/find-score"
+    formats = list(REPORT_FILES) if report_format == 'both' else [report_format]
+    results = {}
+    for name in formats:
+        with tempfile.TemporaryDirectory(prefix=f'score-bench-{name}-') as work:
+            if not prepare_work_directory(tree, work, name):
+                print(f"No {REPORT_FILES[name]} reports in {tree}, skipping the {name} format")
+                continue
+            results.update(run_stages(work, f"{name}/"))
+    if not results:
+        raise SystemExit(f"No reports to benchmark in {tree}")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    # Returns a list of regressions, a stage regresses when it is slower or bigger than the
+    # baseline by more than the tolerance
+    regressions = []
+    for name, stage in results['stages'].items():
+        expected = baseline.get('stages', {}).get(name)
+        if not expected:
+            continue
+        for metric in ('wall_time_s', 'peak_rss_kb', 'files_opened'):
+            if metric in expected and stage[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {stage[metric]} (baseline {expected[metric]})")
+    return regressions
+
+
+def run(args):
+    parameters = {'domains': args.domains, 'pages': args.pages, 'issues': args.issues,
+                  'history': args.history, 'format': args.format, 'seed': args.seed}
+    with tempfile.TemporaryDirectory(prefix='score-bench-') as scratch:
+        tree = args.tree or scratch
+        if not args.tree:
+            generate(tree, args.domains, args.pages, args.issues, args.history, args.format, args.seed)
+        results = {'parameters': parameters, 'python': sys.version.split()[0],
+                   'stages': run_formats(tree, args.format)}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('parameters') != parameters:
+            print("Warning: baseline was recorded with different parameters")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '_stage':
+        run_stage_child(sys.argv[2], sys.argv[3], sys.argv[4:])
+        return
+
+    parser = argparse.ArgumentParser(description='Benchmark the score tools on synthetic Purple A11y results.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_tree_arguments(subparser):
+        subparser.add_argument('--domains', type=int, default=10, help='Number of domains (default: 10)')
+        subparser.add_argument('--pages', type=int, default=100, help='Pages per scan (default: 100)')
+        subparser.add_argument('--issues', type=int, default=10, help='Issues per page (default: 10)')
+        subparser.add_argument('--history', type=int, default=4, help='Scans per domain (default: 4)')
+        subparser.add_argument('--format', choices=['csv', 'json', 'both'], default='both', help='Report files to write, and with run the formats to time separately (default: both)')
+        subparser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+
+    generate_parser = subparsers.add_parser('generate', help='Write a synthetic results tree.')
+    generate_parser.add_argument('-o', '--output', required=True, help='Directory for the results and summary directories.')
+    add_tree_arguments(generate_parser)
+
+    run_parser = subparsers.add_parser('run', help='Time the scoring pipeline.')
+    add_tree_arguments(run_parser)
+    run_parser.add_argument('--tree', default=None, help='Use an existing tree from "generate" instead of a temporary one')
+    run_parser.add_argument('-o', '--output', default=None, help='Write the results to this JSON file')
+    run_parser.add_argument('--baseline', default=None, help='Baseline JSON to compare against, exits 1 on regressions')
+    run_parser.add_argument('--save-baseline', default=None, help='Save the results as a new baseline JSON')
+    run_parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline (default: 0.25)')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        generate(args.output, args.domains, args.pages, args.issues, args.history, args.format, args.seed)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,12 @@
 
 #!/bin/bash
 
+# With --watch, keep running and score each scan as soon as it finishes instead
+if [ "$1" == "--watch" ]; then
+    python find-score.py --watch -o summary
+    exit $?
+fi
+
 # Get today's date in YYYYMMDD format
 DATE_TODAY=$(date +%Y%m%d)
 
@@ -4,6 +4,12 @@ from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 from operator import itemgetter
 import argparse
+import sys
+
+from results_catalog import open_catalog
+from score_store import RESULTS_TABLE, write_results_table
+from templates import TEMPLATES_SUFFIX, load_templates
+from tool_metrics import add_metrics_arguments, metrics, metrics_session
 
 def calculate_score(data, number_urls):
     score = Decimal((data.get('critical', 0) * 3 +
@@ -66,55 +72,60 @@ def calculate_grade(score):
     
     return grade, message
 
-def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file, url_file, xpath_file, output_file, data, directory):
-    axe_impact_path = os.path.join(directory, axe_impact_file)
-    number_urls_path = os.path.join(directory, number_urls_file)
-    wcag_conformance_path = os.path.join(directory, wcag_conformance_file)
-    url_path = os.path.join(directory, url_file)
-    xpath_path = os.path.join(directory, xpath_file)
-    output_path = os.path.join(directory, output_file)
-
-    try:
-        # Extract domain and date from the axe impact file name
-        base_name = os.path.splitext(os.path.basename(axe_impact_file))[0]
-        parts = base_name.split('_')
-        if len(parts) >= 3:
-            domain = '_'.join(parts[1:-2])  # Extract everything before the last two elements
-            domain = domain.replace('_', '.')  # Replace underscores with dots
-            date = parts[-2]
-
-            # Read data from axe impact file
-            with open(axe_impact_file, 'r', encoding='utf-8') as axe_file:
-                axe_reader = csv.reader(axe_file)
-                next(axe_reader)  # Skip header
-                axe_data = {row[0]: int(row[1]) for row in axe_reader}
-
-            # Read data from wcagConformance file
-            process_wcag_conformance(wcag_conformance_file, data)
-
-            # Read data from number urls file
-            with open(number_urls_file, 'r', encoding='utf-8') as nu_file:
-                number_urls = int(nu_file.readline().strip())
-
-           # Read data from URL file
-            if os.path.exists(url_file):
-                process_url(url_file, data)
+def score_summary(axe_impact_file, number_urls_file, data, scan=None):
+    # Adds the impact counts of one summary to data and returns its row of the results table,
+    # or None when the domain cannot be told from the file name
+    # The results catalog knows the domain and date, older summaries only have the file name
+    if scan is not None:
+        domain, date = scan['domain'], scan['date']
+    else:
+        domain, date = domain_and_date_from_filename(axe_impact_file)
+    if domain is None:
+        return None
 
-            # Read data from XPath file
-            if os.path.exists(xpath_file):
-                process_xpath(xpath_file, data)
+    # Read data from axe impact file
+    # find-score.py writes no header, every row is an impact and its count
+    with open(axe_impact_file, 'r', encoding='utf-8') as axe_file:
+        axe_reader = csv.reader(axe_file)
+        axe_data = {row[0]: int(row[1]) for row in axe_reader if row}
 
-            # Update running total
-            for key in axe_data:
-                data[key] = data.get(key, 0) + axe_data[key]
+    # Read data from number urls file
+    with open(number_urls_file, 'r', encoding='utf-8') as nu_file:
+        number_urls = int(nu_file.readline().strip())
 
-            # Perform calculations
-            score_value = calculate_score(data, number_urls)
+    # Update running total
+    for key in axe_data:
+        data[key] = data.get(key, 0) + axe_data[key]
 
-            grade_value = calculate_grade(score_value)
+    score_value = calculate_score(data, number_urls)
+    return {'domain': domain, 'date': date, 'scan_id': scan['scan_id'] if scan is not None else '',
+            'number_urls': number_urls, 'critical': data.get('critical', 0), 'serious': data.get('serious', 0),
+            'moderate': data.get('moderate', 0), 'minor': data.get('minor', 0), 'score': score_value,
+            'grade': calculate_grade(score_value)[0]}
 
-            # Append the results to the output file
-            with open(output_file, 'a', encoding='utf-8', newline='') as output:
+def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file, url_file, xpath_file, output_file, data, directory, scan=None):
+    try:
+        # Read data from wcagConformance file
+        process_wcag_conformance(wcag_conformance_file, data)
+
+        # Read data from URL file
+        if os.path.exists(url_file):
+            process_url(url_file, data)
+
+        # Read data from XPath file, or the issue fingerprints of find-score.py --templates
+        templates_file = xpath_file.replace('_xpath.csv', TEMPLATES_SUFFIX)
+        if os.path.exists(templates_file):
+            process_templates(templates_file, data)
+        elif os.path.exists(xpath_file):
+            process_xpath(xpath_file, data)
+
+        result = score_summary(axe_impact_file, number_urls_file, data, scan)
+        if result is not None:
+            domain, date, number_urls = result['domain'], result['date'], result['number_urls']
+            score_value = result['score']
+
+            # Each summary has its own result file, rewriting it keeps reruns from adding duplicate rows
+            with open(output_file, 'w', encoding='utf-8', newline='') as output:
                 writer = csv.writer(output)
                 writer.writerow(['domain', domain])
                 writer.writerow(['date', date])
@@ -124,7 +135,7 @@ def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file,
                 # writer.writerow(['minor', data.get('minor', 0)])
                 writer.writerow(['number_urls', number_urls])
                 writer.writerow(['score', score_value])
-                writer.writerow(['grade', grade_value[0]])
+                writer.writerow(['grade', result['grade']])
 
                 # Write the content to a CSV file
                 with open('output_wcag_conformance.csv', 'w', encoding='utf-8', newline='') as wcag_output:
@@ -134,20 +145,20 @@ def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file,
 
             # Print cumulative counts
             print(f"Domain: {domain}")
-            print(f"{extract_date_from_filename(axe_impact_file)}")
+            print(f"{format_date(date)}")
             print(f"Number of URLs: {number_urls}")
             print(f"")
             print(f"score = (({data.get('critical', 0)} * 2) +  ({data.get('serious', 0)} * 1.5) + "
                   f"({data.get('moderate', 0)} * 1.25) +  ({data.get('minor', 0)} * 1)) /({number_urls} * 5) ")
             print(f"Score: {score_value}")
-            print(f"Grade: {grade_value[0]}")
+            print(f"Grade: {result['grade']}")
 
             # Print the content to the terminal
             print("\nSummary data\n")
             for key, value in data.items():
                 if key == 'urls':
                     continue
-                elif key == 'xpaths':
+                elif key in ('xpaths', 'templates'):
                     continue
                 print(f"{key}: {value}")
 
@@ -158,7 +169,15 @@ def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file,
                     print(f"{url[0]}: {url[1]}")
 
             # Print XPath content to the terminal
-            if 'xpaths' in data:
+            if 'templates' in data:
+                templated, page_unique = data['templates']['templated'], data['templates']['page_unique']
+                print("\nMost bugs in the XPaths:")
+                print(f"Templated: {templated[1]} issues from {templated[0]} elements on more than one page")
+                print(f"Page-unique: {page_unique[1]} issues from {page_unique[0]} elements")
+                for issue_id, xpath, _, pages, occurrences in data['xpaths']:
+                    kind = f"templated, {pages} pages" if pages > 1 else "page-unique"
+                    print(f"{xpath}: {occurrences} ({issue_id}, {kind})")
+            elif 'xpaths' in data:
                 print("\nMost bugs in the XPaths:")
                 for xpath in data['xpaths']:
                     print(f"{xpath[0]}: {xpath[1]}")
@@ -173,24 +192,28 @@ def process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file,
         print(f"Error processing files {axe_impact_file}, {number_urls_file}, and {wcag_conformance_file}: {e}")
 
 
-def extract_date_from_filename(axe_impact_file):
-    try:
-        # Extracting the 8-digit date from the filename
-        date_string = axe_impact_file.split('_')[3]
+def domain_and_date_from_filename(axe_impact_file):
+    # Fallback for summaries without a results catalog, assumes 'domain_date_axeImpact.csv'
+    base_name = os.path.splitext(os.path.basename(axe_impact_file))[0]
+    parts = base_name.split('_')
+    if len(parts) >= 3:
+        domain = '_'.join(parts[:-2])  # Extract everything before the last two elements
+        return domain.replace('_', '.'), parts[-2]  # Replace underscores with dots
+    return None, None
 
-        # Converting the date string to a datetime object
-        date_object = datetime.strptime(date_string, "%Y%m%d")
 
-        # Formatting the datetime object as a human-readable date
-        formatted_date = date_object.strftime("%B %d, %Y")
+def format_date(date):
+    try:
+        # Converting the 8-digit date to a datetime object
+        date_object = datetime.strptime(date, "%Y%m%d")
 
-        return formatted_date
-    except Exception as e:
-        print(f"Error extracting date from filename {axe_impact_file}: {e}")
+        # Formatting the datetime object as a human-readable date
+        return date_object.strftime("%B %d, %Y")
+    except (TypeError, ValueError) as e:
+        print(f"Error formatting date {date}: {e}")
         return None
 
 
-
 def process_wcag_conformance(wcag_conformance_file, data):
     try:
         # Read data from wcagConformance file
@@ -260,11 +283,92 @@ def process_xpath(xpath_file, data):
 
 
 
+def process_templates(templates_file, data):
+    try:
+        index = load_templates(templates_file)
+        data['templates'] = index.split()
+        # Keep only the ten fingerprints with the most issues
+        data['xpaths'] = index.rows()[:10]
+
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error processing templates file {templates_file}: {e}")
+
+
+
+def find_summaries(directory, scan_id=None):
+    # Yields (axe impact file, catalog record) for every summarized scan in the directory,
+    # or only for scan_id
+    catalog = open_catalog(directory)
+    if catalog is None:
+        if scan_id:
+            print(f"No results catalog in {directory}, cannot look up scan {scan_id}")
+            return
+        for filename in os.listdir(directory):
+            if filename.endswith("_axeImpact.csv"):
+                yield os.path.join(directory, filename), None
+        return
+
+    with catalog:
+        scans = [catalog.get(scan_id)] if scan_id else catalog.scans()
+        for scan in scans:
+            if scan is None:
+                print(f"Scan {scan_id} is not in the results catalog")
+                continue
+            axe_impact_file = os.path.join(directory, f"{scan['summary_base']}_axeImpact.csv")
+            if os.path.exists(axe_impact_file):
+                yield axe_impact_file, scan
+
+
 def main():
     parser = argparse.ArgumentParser(description='Find and parse reports.')
     parser.add_argument('-d', '--directory', default='./', help='Directory to scan (default: current directory)')
+    parser.add_argument('--scan', default=None, help='Only score this scan id, e.g. 20240125_101530_www.example.gov')
+    parser.add_argument('--batch', nargs='?', const='', default=None, metavar='TABLE',
+                        help=f'Write one results table with a row per domain and date instead of a _result.csv per scan '
+                             f'(default table: {RESULTS_TABLE} in the directory)')
+    parser.add_argument('--summary', action='store_true', help='With --batch, print one line per scan')
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
+    with metrics_session(args, 'calculate-score'):
+        if args.batch is not None:
+            calculate_batch(args)
+        else:
+            calculate_scores(args)
+
+
+def calculate_batch(args):
+    table = args.batch or os.path.join(args.directory, RESULTS_TABLE)
+    results = []
+    failed = 0
+    for axe_impact_file, scan in find_summaries(args.directory, args.scan):
+        number_urls_file = axe_impact_file.replace('_axeImpact.csv', '_number_urls.csv')
+        with metrics.stage('score'):
+            metrics.read_file(axe_impact_file)
+            metrics.read_file(number_urls_file)
+            try:
+                result = score_summary(axe_impact_file, number_urls_file, {}, scan)
+                if result is None:
+                    print(f"Error: Unexpected file naming pattern for {axe_impact_file}", file=sys.stderr)
+            except (OSError, ValueError, IndexError) as e:
+                result = None
+                print(f"Error processing {axe_impact_file}: {e}", file=sys.stderr)
+        if result is None:
+            failed += 1
+            continue
+        results.append(result)
+        metrics.count('scans_scored')
+        if args.summary:
+            print(f"{result['domain']:<40} {result['date']} {result['number_urls']:>6} URLs "
+                  f"{result['score']:>9} {result['grade']}")
+
+    with metrics.stage('write_table'):
+        rows = write_results_table(table, results)
+    metrics.wrote_file(table)
+    print(f"Scored {len(results)} scans ({failed} failed), {rows} rows in {table}")
+
+
+def calculate_scores(args):
     cumulative_data = {}
 
     print(f"Purple A11y Accessibility Summaries")
@@ -274,30 +378,33 @@ def main():
     print(f"Directory: {args.directory}")
     print(f"")
 
-    for filename in os.listdir(args.directory):
-        if filename.endswith("_axeImpact.csv"):
-            axe_impact_file = os.path.join(args.directory, filename)
-            number_urls_file = os.path.join(args.directory, filename.replace('_axeImpact.csv', '_number_urls.csv'))
-            wcag_conformance_file = os.path.join(args.directory, filename.replace('_axeImpact.csv', '_wcagConformance.csv'))
-            url_file = os.path.join(args.directory, filename.replace('_axeImpact.csv', '_url.csv'))
-            xpath_file = os.path.join(args.directory, filename.replace('_axeImpact.csv', '_xpath.csv'))
-            output_file = os.path.join(args.directory, filename.replace('_axeImpact.csv', '_result.csv'))
+    for axe_impact_file, scan in find_summaries(args.directory, args.scan):
+        number_urls_file = axe_impact_file.replace('_axeImpact.csv', '_number_urls.csv')
+        wcag_conformance_file = axe_impact_file.replace('_axeImpact.csv', '_wcagConformance.csv')
+        url_file = axe_impact_file.replace('_axeImpact.csv', '_url.csv')
+        xpath_file = axe_impact_file.replace('_axeImpact.csv', '_xpath.csv')
+        output_file = axe_impact_file.replace('_axeImpact.csv', '_result.csv')
 
-            data = {}
+        data = {}
 
-            process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file, url_file, xpath_file, output_file, data, args.directory)
+        with metrics.stage('score'):
+            for summary_file in (axe_impact_file, number_urls_file, wcag_conformance_file, url_file, xpath_file,
+                                 axe_impact_file.replace('_axeImpact.csv', TEMPLATES_SUFFIX)):
+                metrics.read_file(summary_file)
+            process_and_append(axe_impact_file, number_urls_file, wcag_conformance_file, url_file, xpath_file, output_file, data, args.directory, scan)
+        metrics.count('scans_scored')
 
-            # Include processing for wcagConformance file
-            if os.path.exists(wcag_conformance_file):
-                process_wcag_conformance(wcag_conformance_file, data)
+        # Include processing for wcagConformance file
+        if os.path.exists(wcag_conformance_file):
+            process_wcag_conformance(wcag_conformance_file, data)
 
-            # Include processing for URL file
-            if os.path.exists(url_file):
-                process_url(url_file, data)
+        # Include processing for URL file
+        if os.path.exists(url_file):
+            process_url(url_file, data)
 
-            # Include processing for XPath file
-            if os.path.exists(xpath_file):
-                process_xpath(xpath_file, data)
+        # Include processing for XPath file
+        if os.path.exists(xpath_file):
+            process_xpath(xpath_file, data)
 
 
 if __name__ == "__main__":
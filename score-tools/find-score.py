@@ -1,10 +1,40 @@
 import os
+import re
 import csv
+import json
 from collections import defaultdict
 from datetime import datetime
 import argparse
+import subprocess
+import sys
+import time
 from urllib.parse import urlparse
 
+from report_watcher import REPORT_NAME, ReportWatcher
+from results_catalog import ResultsCatalog, catalog_path, domain_key, parse_scan_id
+from sketches import DEFAULT_ERROR, SKETCHED_COLUMNS, SKETCHES_SUFFIX, ColumnSketch, save_sketches
+from templates import TEMPLATES_SUFFIX, TemplateIndex, save_templates
+from tool_metrics import add_metrics_arguments, metrics, metrics_session
+
+try:
+    # Optional, lets large compiledResults.json files be read without loading the passed items
+    import ijson
+except ImportError:
+    ijson = None
+
+REPORT_JSON = 'compiledResults.json'
+
+# report.csv lists the categories in this order (mergeAxeResults.js sorts them in reverse),
+# the JSON summary follows it so both produce the same files
+ISSUE_CATEGORIES = ['needsReview', 'mustFix', 'goodToFix']
+LEVEL_CLAUSES = ('wcag2a', 'wcag2aa', 'wcag2aaa')
+REPORT_COLUMNS = ['severity', 'issueId', 'issueDescription', 'wcagConformance', 'url', 'context',
+                  'howToFix', 'axeImpact', 'xpath', 'learnMore']
+NEWLINES = re.compile(r'\r\n|\n|\r')
+# Columns find-score.py --templates replaces with the issue fingerprints of the templates file
+TEMPLATED_COLUMNS = ('xpath', 'context')
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def get_domain_from_csv(csv_file):
     if not os.path.exists(csv_file):
         print(f"File not found: {csv_file}")
@@ -17,7 +47,8 @@ def get_domain_from_csv(csv_file):
         if first_row:
             url = first_row[4]
             parsed_url = urlparse(url)
-            return parsed_url.netloc.replace('.', '_')
+            return parsed_url.netloc
+    return "unknown_domain"
 
 def get_unique_urls(csv_file):
     unique_urls = set()
@@ -27,13 +58,178 @@ def get_unique_urls(csv_file):
             unique_urls.add(row['url'])
     return unique_urls
 
-def update_summary(summary, report_directory):
+def new_summary(sketch_error=None, templates=False):
+    # With sketch_error the URL and XPath columns are sketches instead of exact counts,
+    # with templates the XPath and context columns are issue fingerprints
+    summary = defaultdict(lambda: defaultdict(int))
+    if sketch_error:
+        for column in SKETCHED_COLUMNS:
+            summary[column] = ColumnSketch(sketch_error)
+    if templates:
+        summary['templates'] = TemplateIndex()
+    return summary
+
+def count_value(summary, column, value, amount=1):
+    counts = summary[column]
+    if isinstance(counts, ColumnSketch):
+        counts.add(value, amount)
+    else:
+        counts[value] += amount
+
+def keeps_url_set(summary, urls=None):
+    # With --sketches the distinct URLs of a whole report are counted by the URL sketch, an
+    # exact set is only kept for the few pages of a carry forward
+    return urls is not None or not isinstance(summary.get('url'), ColumnSketch)
+
+def update_summary(summary, report_directory, urls=None):
     report_file = os.path.join(report_directory, 'report.csv')
+    templates = summary.get('templates')
     with open(report_file, 'r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
         for row in reader:
+            if urls is not None and row['url'] not in urls:
+                continue
+            metrics.count('rows_parsed')
+            if templates is not None:
+                templates.add(row['issueId'], row['xpath'], row['context'], row['url'])
             for key, value in row.items():
-                summary[key][value] += 1
+                if templates is None or key not in TEMPLATED_COLUMNS:
+                    count_value(summary, key, value)
+
+def iter_report_rules(json_file, pages_scanned=None):
+    # Yields (category, rule) for the issue categories of compiledResults.json in report.csv order.
+    # The URLs of pagesScanned are appended to the pages_scanned list when one is given.
+    rules_by_category = {category: [] for category in ISSUE_CATEGORIES}
+    with open(json_file, 'rb') as file:
+        if ijson is not None:
+            prefixes = {f"items.{category}.rules.item": category for category in ISSUE_CATEGORIES}
+            builder = None
+            for prefix, event, value in ijson.parse(file):
+                if builder is None:
+                    if pages_scanned is not None and prefix == 'pagesScanned.item.url' and event == 'string':
+                        pages_scanned.append(value)
+                    if event == 'start_map' and prefix in prefixes:
+                        builder = ijson.ObjectBuilder()
+                        rule_prefix = prefix
+                        builder.event(event, value)
+                    continue
+                builder.event(event, value)
+                if event == 'end_map' and prefix == rule_prefix:
+                    rules_by_category[prefixes[rule_prefix]].append(builder.value)
+                    builder = None
+        else:
+            report = json.load(file)
+            if pages_scanned is not None:
+                pages_scanned.extend(page.get('url', '') for page in report.get('pagesScanned', []))
+            items = report.get('items', {})
+            for category in ISSUE_CATEGORIES:
+                rules_by_category[category] = items.get(category, {}).get('rules', [])
+
+    for category in ISSUE_CATEGORIES:
+        for rule in sorted(rules_by_category[category], key=lambda rule: rule['rule']):
+            yield category, rule
+
+def item_context(item):
+    # Same as the context column of report.csv
+    violation = item.get('html')
+    if not violation:
+        page = item.get('page')
+        violation = 'Document' if page is not None and page < 0 else f"Page {'undefined' if page is None else page}"
+    return NEWLINES.sub('', violation)
+
+def count_empty_row(summary):
+    # report.csv has a row of empty fields for every rule without items (includeEmptyRows in
+    # mergeAxeResults.js), update_summary counts it like any other row
+    templates = summary.get('templates')
+    metrics.count('rows_parsed')
+    if templates is not None:
+        templates.add('', '', '', '')
+    for column in REPORT_COLUMNS:
+        if templates is None or column not in TEMPLATED_COLUMNS:
+            count_value(summary, column, '')
+
+def update_summary_from_json(summary, json_file, urls=None, pages_scanned=None):
+    # Counts the same columns as update_summary, per rule and per page rather than per row.
+    # Returns the domain of the first URL and the set of unique URLs, None with --sketches.
+    unique_urls = set() if keeps_url_set(summary, urls) else None
+    first_url = None
+    templates = summary.get('templates')
+
+    for category, rule in iter_report_rules(json_file, pages_scanned):
+        pages = sorted(rule.get('pagesAffected', []), key=lambda page: page.get('url', ''))
+        if urls is not None:
+            pages = [page for page in pages if page.get('url', '') in urls]
+        occurrences = sum(len(page.get('items', [])) for page in pages)
+        if occurrences == 0:
+            if urls is None:
+                count_empty_row(summary)
+                if unique_urls is not None:
+                    unique_urls.add('')
+            continue
+
+        wcag_conformance = ','.join(clause for clause in rule.get('conformance', []) if clause not in LEVEL_CLAUSES)
+        summary['severity'][category] += occurrences
+        summary['issueId'][rule['rule']] += occurrences
+        summary['issueDescription'][rule.get('description', '')] += occurrences
+        summary['wcagConformance'][wcag_conformance] += occurrences
+
+        for page in pages:
+            items = page.get('items', [])
+            if not items:
+                continue
+            url = page.get('url', '')
+            if unique_urls is not None:
+                unique_urls.add(url)
+            if first_url is None:
+                first_url = url
+            count_value(summary, 'url', url, len(items))
+            metrics.count('rows_parsed', len(items))
+            for item in items:
+                if templates is not None:
+                    templates.add(rule['rule'], item.get('xpath') or '', item_context(item), url)
+                else:
+                    summary['context'][item_context(item)] += 1
+                    count_value(summary, 'xpath', item.get('xpath') or '')
+                summary['howToFix'][NEWLINES.sub(' ', item.get('message', ''))] += 1
+
+        summary['axeImpact'][rule.get('axeImpact') or ''] += occurrences
+        summary['learnMore'][rule.get('helpUrl') or ''] += occurrences
+
+    domain = urlparse(first_url).netloc if first_url else "unknown_domain"
+    return domain, unique_urls
+
+def summarize_report(summary, report_file, urls=None, pages_scanned=None):
+    # Adds a compiledResults.json or report.csv to the summary, only the pages in urls when given.
+    # Returns the domain and the set of unique URLs with issues, None with --sketches.
+    metrics.read_file(report_file)
+    if report_file.endswith('.json'):
+        return update_summary_from_json(summary, report_file, urls, pages_scanned)
+    update_summary(summary, os.path.dirname(report_file), urls)
+    if not keeps_url_set(summary, urls):
+        return get_domain_from_csv(report_file), None
+    unique_urls = get_unique_urls(report_file)
+    if urls is not None:
+        unique_urls &= urls
+    return get_domain_from_csv(report_file), unique_urls
+
+def read_url_list(list_file):
+    with open(list_file, 'r', encoding='utf-8') as file:
+        return {line.strip() for line in file if line.strip()}
+
+def carry_forward(summary, catalog, domain, timestamp, urls):
+    # Adds the issues of pages that were not rescanned because they did not change, taken from
+    # the last earlier scan of each page. Returns the URLs that were carried forward with issues.
+    carried = set()
+    pages_by_report = defaultdict(set)
+    for url, scan in catalog.last_scans_of_pages(domain, urls, timestamp).items():
+        pages_by_report[scan['report_path']].add(url)
+    for report_file, report_urls in pages_by_report.items():
+        if not os.path.exists(report_file):
+            print(f"Cannot carry forward {len(report_urls)} pages, missing {report_file}")
+            continue
+        _, found = summarize_report(summary, report_file, report_urls)
+        carried |= found
+    return carried
 
 def save_summary_to_file(output_filename, values, output_directory):
     output_path = os.path.join(output_directory, output_filename)
@@ -41,54 +237,189 @@ def save_summary_to_file(output_filename, values, output_directory):
         csv_writer = csv.writer(output_file)
         for key, value in values.items():
             csv_writer.writerow([key, value])
+    metrics.wrote_file(output_path)
 
 def save_urls_to_file(output_filename, count, output_directory):
     output_path = os.path.join(output_directory, output_filename)
     with open(output_path, 'w', encoding='utf-8', newline='') as output_file:
         csv_writer = csv.writer(output_file)
         csv_writer.writerow([count])
+    metrics.wrote_file(output_path)
 
 
-def find_and_parse_reports(directory, partial_string, output_directory):
+def summarize_scan(subdir_path, output_directory, catalog, force=False, unchanged_urls=None, sketch_error=None,
+                   templates=False):
+    # Summarizes one Purple A11y results directory, returns the catalog record or None
+    subdir = os.path.basename(os.path.normpath(subdir_path))
+    report_directory = os.path.join(subdir_path, 'reports')
+    # Prefer the JSON results, report.csv repeats the rule details on every row
+    report_file = os.path.join(report_directory, REPORT_JSON)
+    if not os.path.exists(report_file):
+        report_file = os.path.join(report_directory, 'report.csv')
+
+    if not os.path.exists(report_file):
+        print(f"No report found for {subdir_path}")
+        return None
+
+    if not force and catalog.is_current(subdir, report_file):
+        print(f"Already summarized {subdir_path}")
+        return None
+
+    summary = new_summary(sketch_error, templates)
+    print(f"Building report for {subdir_path}")
+
+    try:
+        pages_scanned = [] if report_file.endswith('.json') else None
+        with metrics.stage('parse_report'):
+            domain, unique_urls = summarize_report(summary, report_file, pages_scanned=pages_scanned)
+
+        date, timestamp = parse_scan_id(subdir)
+        if unchanged_urls:
+            with metrics.stage('carry_forward'):
+                scanned = set(pages_scanned) if pages_scanned else unique_urls
+                unscanned = {url for url in unchanged_urls if urlparse(url).netloc == domain}
+                if scanned is not None:
+                    unscanned -= scanned
+                else:
+                    # Count-Min never misses a URL that was counted, a collision at worst keeps
+                    # an unchanged page from being carried forward
+                    unscanned = {url for url in unscanned if summary['url'].frequency.estimate(url) == 0}
+                carried = carry_forward(summary, catalog, domain, timestamp, unscanned)
+            if carried:
+                print(f"Carried forward {len(carried)} unchanged pages with issues")
+                metrics.count('pages_carried_forward', len(carried))
+                if unique_urls is not None:
+                    unique_urls |= carried
+
+        # The URL sketch also counted the carried forward pages
+        page_count = len(unique_urls) if unique_urls is not None else summary['url'].distinct.count()
+
+        output_filename_base = f"{domain_key(domain)}_{date}"
+
+        with metrics.stage('write_summary'):
+            for column, values in summary.items():
+                output_filename = f"{output_filename_base}_{column}.csv"
+                if isinstance(values, TemplateIndex):
+                    templates_path = os.path.join(output_directory, output_filename)
+                    save_templates(templates_path, values)
+                    metrics.wrote_file(templates_path)
+                    continue
+                if isinstance(values, ColumnSketch):
+                    # Only the heavy hitters, calculate-score.py uses the top ten
+                    values = dict(values.top())
+                save_summary_to_file(output_filename, values, output_directory)
+
+            # Files of an earlier summary with or without --templates would be read instead
+            stale = [TEMPLATES_SUFFIX] if not templates else [f"_{column}.csv" for column in TEMPLATED_COLUMNS]
+            for suffix in stale:
+                stale_path = os.path.join(output_directory, f"{output_filename_base}{suffix}")
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+            sketches_path = os.path.join(output_directory, f"{output_filename_base}{SKETCHES_SUFFIX}")
+            if sketch_error:
+                save_sketches(sketches_path, {column: summary[column] for column in SKETCHED_COLUMNS})
+                metrics.wrote_file(sketches_path)
+            elif os.path.exists(sketches_path):
+                os.remove(sketches_path)
+
+            output_filename_urls = f"{output_filename_base}_number_urls.csv"
+            save_urls_to_file(output_filename_urls, page_count, output_directory)
+
+        catalog.register(subdir, domain, page_count, subdir_path, report_file,
+                         output_directory, output_filename_base, pages_scanned)
+        metrics.count('scans_summarized')
+        return catalog.get(subdir)
+    except FileNotFoundError as e:
+        print(f"Skipping directory {subdir} due to missing file: {e}")
+        return None
+
+def find_and_parse_reports(directory, partial_string, output_directory, catalog, force=False, unchanged_urls=None,
+                           sketch_error=None, templates=False):
     for subdir in os.listdir(directory):
         subdir_path = os.path.join(directory, subdir)
         if os.path.isdir(subdir_path) and partial_string in subdir:
-            report_directory = os.path.join(subdir_path, 'reports')
-            report_file = os.path.join(report_directory, 'report.csv')
-
-            if os.path.exists(report_file):
-                domain = get_domain_from_csv(report_file)
-                timestamp = subdir.split('_')[0]
-                output_filename_base = f"{domain}_{timestamp}"
-
-                summary = defaultdict(lambda: defaultdict(int))
-                unique_urls = set()
-                print(f"Building report for {subdir_path}")
-
-                try:
-                    update_summary(summary, report_directory)
-                    unique_urls.update(get_unique_urls(report_file))
-
-                    for column, values in summary.items():
-                        output_filename = f"{output_filename_base}_{column}.csv"
-                        save_summary_to_file(output_filename, values, output_directory)
-
-                    output_filename_urls = f"{output_filename_base}_number_urls.csv"
-                    save_urls_to_file(output_filename_urls, len(unique_urls), output_directory)
-                except FileNotFoundError as e:
-                    print(f"Skipping directory {subdir} due to missing file: {e}")
-                    continue
-            else:
-                print(f"No report found for {subdir_path}")
+            summarize_scan(subdir_path, output_directory, catalog, force, unchanged_urls, sketch_error, templates)
+
+def score_scan(scan, output_directory):
+    # Scores one summarized scan and updates the totals of its domain
+    for script, script_args in (('calculate-score.py', ['--scan', scan['scan_id']]),
+                                ('aggregate-scores.py', ['--domain', scan['domain_key']])):
+        command = [sys.executable, os.path.join(SCRIPT_DIR, script), '-d', output_directory] + script_args
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{script} failed for {scan['scan_id']}: {result.stderr.strip()}")
+            return False
+    return True
+
+def known_reports(directory, catalog):
+    # report.csv of every scan the catalog already has, so the watcher does not yield them
+    known = {}
+    for scan_id in catalog.current_scan_ids():
+        report = os.path.join(directory, scan_id, 'reports', REPORT_NAME)
+        try:
+            known[report] = os.stat(report).st_mtime
+        except FileNotFoundError:
+            pass
+    return known
+
+def watch_reports(directory, partial_string, output_directory, catalog, args):
+    # Summarizes, scores and aggregates every scan as soon as its report is written
+    known = {} if args.force else known_reports(directory, catalog)
+    watcher = ReportWatcher(directory, settle=args.settle, poll_interval=args.poll_interval, known=known)
+    print(f"Watching {directory} for finished scans ({watcher.mode}), press Ctrl-C to stop")
+    try:
+        for report in watcher:
+            subdir_path = os.path.dirname(os.path.dirname(report))
+            subdir = os.path.basename(subdir_path)
+            if partial_string and partial_string not in subdir:
+                continue
+            report_file = os.path.join(os.path.dirname(report), REPORT_JSON)
+            if not os.path.exists(report_file):
+                report_file = report
+            if not args.force and catalog.is_current(subdir, report_file):
+                continue
+
+            started = time.monotonic()
+            with metrics.stage('watch_scan'):
+                scan = summarize_scan(subdir_path, output_directory, catalog, True,
+                                      args.unchanged_urls, args.sketches, args.templates)
+                if scan is not None and score_scan(scan, output_directory):
+                    print(f"Scored {subdir} in {time.monotonic() - started:.1f}s")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Find and parse reports.')
     parser.add_argument('-d', '--directory', default='./', help='Directory to scan (default: current directory)')
-    parser.add_argument('-p', '--partial-string', default=datetime.today().strftime('%Y%m%d'), help='Partial string to search for (default: today\'s date)')
+    parser.add_argument('-p', '--partial-string', default=None, help='Partial string to search for (default: today\'s date, any scan with --watch)')
     parser.add_argument('-o', '--output', default='./', help='Output directory for files (default: current directory)')
+    parser.add_argument('-f', '--force', action='store_true', help='Summarize scans again even if the results catalog has them')
+    parser.add_argument('--carry-forward', default=None, help='File listing unchanged pages, one URL per line, whose issues are carried forward from their last scan')
+    compact = parser.add_mutually_exclusive_group()
+    compact.add_argument('--sketches', nargs='?', type=float, const=DEFAULT_ERROR, default=None, metavar='ERROR',
+                         help=f'Keep the URL and XPath columns as mergeable sketches with this relative error (default: {DEFAULT_ERROR}) instead of exact counts')
+    compact.add_argument('--templates', action='store_true',
+                         help=f'Keep each issue once per issueId, XPath and context with its number of pages, in a {TEMPLATES_SUFFIX} file instead of the XPath and context columns')
+    parser.add_argument('--watch', action='store_true', help='Keep running and score every scan as soon as its report is written')
+    parser.add_argument('--settle', type=float, default=10, help='With --watch, seconds a report must be unchanged to count as finished (default: 10)')
+    parser.add_argument('--poll-interval', type=float, default=30, help='With --watch, seconds between directory listings without inotify (default: 30)')
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
-    find_and_parse_reports(args.directory, args.partial_string, args.output)
+    with metrics_session(args, 'find-score'):
+        with ResultsCatalog(catalog_path(args.output)) as catalog:
+            args.unchanged_urls = read_url_list(args.carry_forward) if args.carry_forward else None
+            if args.watch:
+                watch_reports(args.directory, args.partial_string, args.output, catalog, args)
+            else:
+                partial_string = args.partial_string
+                if partial_string is None:
+                    partial_string = datetime.today().strftime('%Y%m%d')
+                find_and_parse_reports(args.directory, partial_string, args.output, catalog, args.force,
+                                       args.unchanged_urls, args.sketches, args.templates)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+#
+# Merge Shards
+#
+# Combines the summaries find-score.py wrote on several machines, each scanning one shard of
+# the domains or URLs (scan-dispatcher.py --shard, sitemap-randomizer.py --shard), into the
+# summaries a single machine would have written. Counts are added up and the number of URLs
+# is the size of the union of the URLs in the _url.csv files, so calculate-score.py and
+# aggregate-scores.py give the same scores as for an unsharded run.
+#
+# Summaries written with find-score.py --sketches keep only the heavy hitters of the URL and
+# XPath columns, their sketches are merged instead and the number of URLs is estimated.
+# The issue fingerprints of find-score.py --templates are merged by adding up their pages and
+# occurrences.
+#
+# python merge-shards.py -i shard-1/summary shard-2/summary shard-3/summary -o summary
+#
+
+import argparse
+import csv
+import os
+from collections import defaultdict
+
+from results_catalog import ResultsCatalog, catalog_path, open_catalog
+from sketches import SKETCHED_COLUMNS, SKETCHES_SUFFIX, ColumnSketch, load_sketches, save_sketches
+from templates import TEMPLATES_SUFFIX, TemplateIndex, load_templates, save_templates
+from tool_metrics import add_metrics_arguments, metrics, metrics_session
+
+# The report.csv columns find-score.py writes a summary file for
+SUMMARY_COLUMNS = ['severity', 'issueId', 'issueDescription', 'wcagConformance', 'url', 'context',
+                   'howToFix', 'axeImpact', 'xpath', 'learnMore']
+
+
+def shard_summaries(directory):
+    # Yields (summary base, catalog record or None, pages scanned) for each summary in a shard
+    catalog = open_catalog(directory)
+    if catalog is None:
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('_number_urls.csv'):
+                yield filename[:-len('_number_urls.csv')], None, []
+        return
+
+    with catalog:
+        for scan in catalog.scans():
+            yield scan['summary_base'], dict(scan), catalog.pages(scan['scan_id'])
+
+
+def read_counts(path, counts):
+    metrics.read_file(path)
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) == 2:
+                counts[row[0]] += int(row[1])
+
+
+def read_number_urls(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return int(file.readline().strip() or 0)
+
+
+def write_counts(path, counts):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        for key, value in counts.items():
+            writer.writerow([key, value])
+    metrics.wrote_file(path)
+
+
+def merge_sketches(summary_base, shards):
+    # Returns the merged sketches of the shards, or None when no shard has any
+    shard_sketches = {}
+    for directory in shards:
+        path = os.path.join(directory, f"{summary_base}{SKETCHES_SUFFIX}")
+        if os.path.exists(path):
+            metrics.read_file(path)
+            shard_sketches[directory] = load_sketches(path)
+    if not shard_sketches:
+        return None
+
+    error = next(iter(shard_sketches.values()))[SKETCHED_COLUMNS[0]].error
+    merged = {column: ColumnSketch(error) for column in SKETCHED_COLUMNS}
+    for directory in shards:
+        sketches = shard_sketches.get(directory)
+        for column in SKETCHED_COLUMNS:
+            if sketches is None:
+                # A shard summarized without --sketches still has the exact counts
+                sketch = ColumnSketch(error)
+                counts = defaultdict(int)
+                path = os.path.join(directory, f"{summary_base}_{column}.csv")
+                if os.path.exists(path):
+                    read_counts(path, counts)
+                for value, count in counts.items():
+                    sketch.add(value, count)
+            else:
+                sketch = sketches[column]
+            merged[column].merge(sketch)
+    return merged
+
+
+def merge_templates(summary_base, shards, output_directory):
+    templates = TemplateIndex()
+    for directory in shards:
+        path = os.path.join(directory, f"{summary_base}{TEMPLATES_SUFFIX}")
+        if os.path.exists(path):
+            metrics.read_file(path)
+            load_templates(path, templates)
+    if templates:
+        path = os.path.join(output_directory, f"{summary_base}{TEMPLATES_SUFFIX}")
+        save_templates(path, templates)
+        metrics.wrote_file(path)
+
+
+def merge_summary(summary_base, shards, output_directory):
+    # shards is a list of summary directories holding this summary base. Returns the number of URLs.
+    sketches = merge_sketches(summary_base, shards)
+    merge_templates(summary_base, shards, output_directory)
+    columns = {column: defaultdict(int) for column in SUMMARY_COLUMNS
+               if sketches is None or column not in SKETCHED_COLUMNS}
+    number_urls = 0
+    for directory in shards:
+        for column, counts in columns.items():
+            path = os.path.join(directory, f"{summary_base}_{column}.csv")
+            if os.path.exists(path):
+                read_counts(path, counts)
+        number_urls += read_number_urls(os.path.join(directory, f"{summary_base}_number_urls.csv"))
+
+    # Shards split the URLs, but a URL in two shards must only be counted once
+    if sketches is not None:
+        number_urls = len(sketches['url'].distinct)
+        columns.update({column: dict(sketch.top()) for column, sketch in sketches.items()})
+        save_sketches(os.path.join(output_directory, f"{summary_base}{SKETCHES_SUFFIX}"), sketches)
+    elif columns['url']:
+        number_urls = len(columns['url'])
+
+    for column, counts in columns.items():
+        if counts:
+            write_counts(os.path.join(output_directory, f"{summary_base}_{column}.csv"), counts)
+    with open(os.path.join(output_directory, f"{summary_base}_number_urls.csv"), 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerow([number_urls])
+    return number_urls
+
+
+def merge_shards(input_directories, output_directory):
+    summaries = defaultdict(list)
+    scans = defaultdict(list)
+    for directory in input_directories:
+        for summary_base, scan, pages in shard_summaries(directory):
+            summaries[summary_base].append(directory)
+            if scan is not None:
+                scans[summary_base].append((scan, pages))
+
+    with ResultsCatalog(catalog_path(output_directory)) as catalog:
+        for summary_base, shards in sorted(summaries.items()):
+            with metrics.stage('merge_summary'):
+                number_urls = merge_summary(summary_base, shards, output_directory)
+            # Every shard scan stays in the catalog so --carry-forward can still find its pages
+            shard_scans = {}
+            for scan, pages in scans[summary_base]:
+                _, scan_pages = shard_scans.setdefault(scan['scan_id'], (scan, set()))
+                scan_pages.update(pages)
+            for scan, pages in shard_scans.values():
+                catalog.register(scan['scan_id'], scan['domain'], number_urls, scan['results_dir'],
+                                 scan['report_path'], output_directory, summary_base, sorted(pages) or None)
+            print(f"Merged {summary_base} from {len(shards)} shards, {number_urls} URLs")
+            metrics.count('summaries_merged')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge find-score.py summaries from several shards.')
+    parser.add_argument('-i', '--input', nargs='+', required=True, help='Summary directories of the shards')
+    parser.add_argument('-o', '--output', default='./', help='Output directory for the merged summaries (default: current directory)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    with metrics_session(args, 'merge-shards'):
+        merge_shards(args.input, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#
+# Report Watcher
+#
+# Yields the reports/report.csv of each Purple A11y scan once it is completely written, for
+# find-score.py --watch. Purple A11y writes compiledResults.json before report.csv, so a
+# finished report.csv means both are there. A report counts as finished when it has not
+# changed for `settle` seconds.
+#
+# New files are noticed through inotify when the optional inotify_simple package is
+# installed (Linux only), otherwise the results directory is listed every `poll_interval`.
+# With inotify only the scans an event belongs to are looked at again, so a wakeup does not
+# go through the whole history. Reports passed as `known` are not yielded unless they change.
+#
+
+import os
+import time
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+REPORT_NAME = 'report.csv'
+
+
+class ReportWatcher:
+    def __init__(self, directory, settle=10.0, poll_interval=30.0, use_inotify=True, known=None):
+        # known maps report paths that were already handled, e.g. the scans in the results
+        # catalog, to their mtime, so they are not yielded again on startup
+        self.directory = directory
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.reported = dict(known or {})  # report path -> mtime of the version already yielded
+        self.watches = {}   # watched directory -> watch descriptor
+        self.watched = {}   # watch descriptor -> watched directory
+        self.pending = set()  # scan directories to look at on the next check
+        self.listed = False
+
+        self.inotify = None
+        if use_inotify and INotify is not None:
+            try:
+                self.inotify = INotify()
+                self._watch(directory)
+            except OSError:
+                # Out of watches or not supported by the file system
+                self.inotify = None
+        self.mode = 'inotify' if self.inotify else 'polling'
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def _watch(self, path):
+        if self.inotify is not None and path not in self.watches:
+            try:
+                descriptor = self.inotify.add_watch(path, flags.CREATE | flags.MOVED_TO | flags.CLOSE_WRITE)
+            except OSError:
+                return
+            self.watches[path] = descriptor
+            self.watched[descriptor] = path
+
+    def _unwatch(self, path):
+        descriptor = self.watches.pop(path, None)
+        if descriptor is not None:
+            self.watched.pop(descriptor, None)
+            try:
+                self.inotify.rm_watch(descriptor)
+            except OSError:
+                pass
+
+    def _list(self):
+        # Every scan directory, the only way to see changes without inotify. With inotify
+        # this only runs on startup and after the event queue overflowed.
+        with os.scandir(self.directory) as entries:
+            self.pending.update(entry.path for entry in entries if entry.is_dir())
+        self.listed = True
+
+    def check(self):
+        # Returns the finished reports not yielded before, and how long until the next
+        # unfinished one could be finished (None when there is none)
+        if self.inotify is None or not self.listed:
+            self._list()
+        now = time.time()
+        ready = []
+        next_check = None
+        for scan_directory in list(self.pending):
+            reports_directory = os.path.join(scan_directory, 'reports')
+            report = os.path.join(reports_directory, REPORT_NAME)
+            try:
+                mtime = os.stat(report).st_mtime
+            except FileNotFoundError:
+                # Scan still running, watch for its reports directory and files
+                if os.path.isdir(scan_directory):
+                    self._watch(scan_directory)
+                    if os.path.isdir(reports_directory):
+                        self._watch(reports_directory)
+                else:
+                    self.pending.discard(scan_directory)
+                continue
+            if self.reported.get(report) == mtime:
+                self.pending.discard(scan_directory)
+                continue
+            age = now - mtime
+            if age >= self.settle:
+                ready.append(report)
+                self.reported[report] = mtime
+                self.pending.discard(scan_directory)
+                self._unwatch(scan_directory)
+                self._unwatch(reports_directory)
+            else:
+                self._watch(reports_directory)
+                wait = self.settle - age
+                next_check = wait if next_check is None else min(next_check, wait)
+        return sorted(ready), next_check
+
+    def wait(self, timeout):
+        if self.inotify is not None:
+            # Any event in a watched directory ends the wait early, only the scans it
+            # belongs to are looked at again
+            for event in self.inotify.read(timeout=int(timeout * 1000)):
+                if event.mask & flags.Q_OVERFLOW:
+                    self.listed = False
+                    continue
+                path = self.watched.get(event.wd)
+                if path == self.directory:
+                    self.pending.add(os.path.join(self.directory, event.name))
+                elif path is not None:
+                    self.pending.add(os.path.dirname(path) if os.path.basename(path) == 'reports' else path)
+        else:
+            time.sleep(timeout)
+
+    def __iter__(self):
+        while True:
+            ready, next_check = self.check()
+            yield from ready
+            if next_check is None:
+                self.wait(self.poll_interval)
+            else:
+                # A report is being written, look again once it could have settled
+                self.wait(min(next_check + 0.1, self.poll_interval))
@@ -0,0 +1,154 @@
+#
+# Results Catalog
+#
+# Index of the scans summarized by find-score.py. It is written once per scan and maps the
+# scan id (the Purple A11y results directory name) to its domain, date, page count and the
+# paths of its report and summary files, so the other scoring tools can look scans up
+# instead of listing directories and re-deriving the domain and date from file names.
+#
+
+import os
+import re
+import sqlite3
+
+CATALOG_FILENAME = 'results_catalog.sqlite'
+
+# Purple A11y names results directories {YYYYMMDD}_{HHMMSS}[_label]_{hostname}[_nnn]
+SCAN_ID_PATTERN = re.compile(r'^(\d{8})_(\d{6})')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    domain_key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    page_count INTEGER,
+    results_dir TEXT,
+    report_path TEXT,
+    report_mtime_ns INTEGER,
+    summary_dir TEXT,
+    summary_base TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_summary_base ON scans (summary_base);
+CREATE INDEX IF NOT EXISTS scans_domain_date ON scans (domain, date);
+CREATE TABLE IF NOT EXISTS scan_pages (
+    scan_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (scan_id, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scan_pages_url ON scan_pages (url);
+"""
+
+
+def catalog_path(summary_directory):
+    return os.path.join(summary_directory, CATALOG_FILENAME)
+
+
+def parse_scan_id(scan_id):
+    # Returns (date, timestamp), e.g. ('20240125', '20240125_101530')
+    match = SCAN_ID_PATTERN.match(scan_id)
+    if match:
+        return match.group(1), f"{match.group(1)}_{match.group(2)}"
+    date = scan_id.split('_')[0]
+    return date, date
+
+
+def domain_key(domain):
+    # Domains appear in summary file names with the dots replaced by underscores
+    return domain.replace('.', '_')
+
+
+class ResultsCatalog:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def register(self, scan_id, domain, page_count, results_dir, report_path, summary_dir, summary_base,
+                 pages_scanned=None):
+        # pages_scanned lists every page of the scan, including those without issues
+        date, timestamp = parse_scan_id(scan_id)
+        report_mtime_ns = os.stat(report_path).st_mtime_ns if os.path.exists(report_path) else None
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO scans (scan_id, domain, domain_key, date, timestamp, page_count, results_dir, '
+                'report_path, report_mtime_ns, summary_dir, summary_base) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (scan_id, domain, domain_key(domain), date, timestamp, page_count, os.path.abspath(results_dir),
+                 os.path.abspath(report_path), report_mtime_ns, os.path.abspath(summary_dir), summary_base)
+            )
+            if pages_scanned is not None:
+                self.connection.execute('DELETE FROM scan_pages WHERE scan_id = ?', (scan_id,))
+                self.connection.executemany('INSERT OR IGNORE INTO scan_pages (scan_id, url) VALUES (?, ?)',
+                                            ((scan_id, url) for url in pages_scanned))
+
+    def get(self, scan_id):
+        return self.connection.execute('SELECT * FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+
+    def is_current(self, scan_id, report_path):
+        # True when the scan was already summarized from this exact report file
+        scan = self.get(scan_id)
+        return scan is not None and os.path.exists(report_path) and \
+            scan['report_mtime_ns'] == os.stat(report_path).st_mtime_ns
+
+    def current_scan_ids(self):
+        # Scan ids of every scan whose report has not changed since it was summarized
+        for scan in self.connection.execute('SELECT scan_id, report_path, report_mtime_ns FROM scans'):
+            try:
+                if os.stat(scan['report_path']).st_mtime_ns == scan['report_mtime_ns']:
+                    yield scan['scan_id']
+            except (OSError, TypeError):
+                pass
+
+    def by_summary_base(self, summary_base):
+        # Several scans of a domain on one day share a summary base, the latest one wrote the files
+        return self.connection.execute(
+            'SELECT * FROM scans WHERE summary_base = ? ORDER BY timestamp DESC LIMIT 1', (summary_base,)
+        ).fetchone()
+
+    def pages(self, scan_id):
+        return [row['url'] for row in self.connection.execute('SELECT url FROM scan_pages WHERE scan_id = ?', (scan_id,))]
+
+    def last_scans_of_pages(self, domain, urls, before):
+        # Maps each url to the latest scan of the domain before the timestamp that scanned it
+        query = ('SELECT scans.* FROM scan_pages JOIN scans ON scans.scan_id = scan_pages.scan_id '
+                 'WHERE scan_pages.url = ? AND scans.domain = ? AND scans.timestamp < ? '
+                 'ORDER BY scans.timestamp DESC LIMIT 1')
+        found = {}
+        for url in urls:
+            scan = self.connection.execute(query, (url, domain, before)).fetchone()
+            if scan is not None:
+                found[url] = scan
+        return found
+
+    def scans(self, partial_string=None):
+        # Latest scan per summary base, optionally only scan ids containing partial_string
+        query = 'SELECT * FROM scans'
+        params = []
+        if partial_string:
+            query += ' WHERE instr(scan_id, ?) > 0'
+            params.append(partial_string)
+        query += ' ORDER BY summary_base, timestamp DESC'
+        seen = set()
+        for scan in self.connection.execute(query, params).fetchall():
+            if scan['summary_base'] not in seen:
+                seen.add(scan['summary_base'])
+                yield scan
+
+
+def open_catalog(summary_directory):
+    # Summaries written before the catalog existed have none, callers fall back to file names
+    path = catalog_path(summary_directory)
+    if os.path.exists(path):
+        return ResultsCatalog(path)
+    return None
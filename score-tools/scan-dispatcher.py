@@ -0,0 +1,318 @@
+#
+# Scan Dispatcher
+#
+# Parallel replacement for scan_csv_list.sh. Runs several `node cli.js` scans at once,
+# retries failed scans with backoff, keeps a ledger so an interrupted run can be resumed,
+# and hands every finished results directory straight to find-score.py.
+#
+# python scan-dispatcher.py -c domains.csv --purple-dir ~/purple-a11y -o summary
+#
+
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sharding import add_shard_argument, in_shard
+from tool_metrics import add_metrics_arguments, metrics, metrics_session
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_MARKER = 'Results directory is at'
+# cli.js colours its messages with kleur and draws a box around them
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+
+def read_urls(csv_file, skip_header=True):
+    urls = []
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        if skip_header:
+            next(reader, None)
+        for row in reader:
+            if row and row[0].strip() and not row[0].startswith('#'):
+                urls.append(row[0].strip())
+    return urls
+
+
+def available_memory_mb():
+    # MemAvailable is the best estimate on Linux, fall back to total physical memory elsewhere
+    try:
+        with open('/proc/meminfo', 'r', encoding='utf-8') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def worker_count(requested_jobs, mem_per_scan_mb):
+    # Each cli.js scan drives its own browser, so bound by both CPUs and memory
+    jobs = requested_jobs or os.cpu_count() or 1
+    memory = available_memory_mb()
+    if memory and mem_per_scan_mb:
+        jobs = min(jobs, memory // mem_per_scan_mb)
+    return max(1, jobs)
+
+
+def load_ledger(ledger_file):
+    # Returns {url: {'done': bool, 'attempts': int}} from a previous (possibly interrupted) run
+    state = {}
+    if not os.path.exists(ledger_file):
+        return state
+    with open(ledger_file, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            url_state = state.setdefault(entry['url'], {'done': False, 'attempts': 0})
+            url_state['attempts'] = max(url_state['attempts'], entry.get('attempt', 0))
+            if entry.get('status') == 'done':
+                url_state['done'] = True
+    return state
+
+
+class Ledger:
+    def __init__(self, ledger_file):
+        self.ledger_file = ledger_file
+        self.lock = threading.Lock()
+
+    def record(self, **entry):
+        entry['recorded_at'] = datetime.now().isoformat(timespec='seconds')
+        line = json.dumps(entry, sort_keys=True)
+        with self.lock:
+            with open(self.ledger_file, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+
+def find_results_directory(output, purple_dir):
+    for line in output.splitlines():
+        line = ANSI_ESCAPE.sub('', line)
+        if RESULTS_MARKER in line:
+            # Only the first word after the marker, like awk '{print $6}' in sitemap-purple-a11y-crawl.sh,
+            # the rest of the line is the border of the box
+            words = line.split(RESULTS_MARKER, 1)[1].split()
+            if not words:
+                continue
+            directory = words[0]
+            if not os.path.isabs(directory):
+                directory = os.path.join(purple_dir, directory)
+            return os.path.normpath(directory)
+    return None
+
+
+def run_scan(url, purple_dir, scan_args, timeout):
+    command = ['node', 'cli.js'] + scan_args + ['-u', url]
+    start = time.monotonic()
+    try:
+        # No stdin, a cli.js that prompts for missing options fails instead of waiting forever
+        completed = subprocess.run(command, cwd=purple_dir, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                   timeout=timeout)
+        exit_code = completed.returncode
+        output = completed.stdout + completed.stderr
+    except subprocess.TimeoutExpired as e:
+        exit_code = None
+        output = e.stdout if isinstance(e.stdout, str) else ''
+    duration = round(time.monotonic() - start, 3)
+
+    results_dir = find_results_directory(output, purple_dir)
+    if 'No pages were scanned' in output:
+        # Same treatment as sitemap-purple-a11y-crawl.sh, an empty scan is a failed scan
+        exit_code = exit_code or 1
+    elif results_dir and not os.path.isdir(results_dir):
+        # Nothing to score, the scan failed even if cli.js exited with 0
+        print(f"Results directory {results_dir} of {url} does not exist")
+        exit_code = exit_code or 1
+    return exit_code, duration, results_dir
+
+
+def score_results(results_dir, output_directory):
+    # find-score.py takes the parent directory and a partial string, the results directory
+    # name is unique so it selects exactly this scan
+    command = [sys.executable, os.path.join(SCRIPT_DIR, 'find-score.py'),
+               '-d', os.path.dirname(results_dir),
+               '-p', os.path.basename(results_dir),
+               '-o', output_directory]
+    return subprocess.run(command, capture_output=True, text=True).returncode
+
+
+class JobQueue:
+    # Scan jobs ordered by the time they are due, so a retry waits out its backoff without
+    # holding up the jobs behind it. get() returns None once every URL is finished.
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()
+        self.unfinished = 0
+        self.condition = threading.Condition()
+
+    def add(self, url, attempt):
+        with self.condition:
+            self.unfinished += 1
+            heapq.heappush(self.heap, (0, next(self.order), url, attempt))
+            self.condition.notify()
+
+    def retry(self, url, attempt, not_before):
+        with self.condition:
+            heapq.heappush(self.heap, (not_before, next(self.order), url, attempt))
+            self.condition.notify()
+
+    def finish(self):
+        with self.condition:
+            self.unfinished -= 1
+            self.condition.notify_all()
+
+    def get(self):
+        with self.condition:
+            while self.unfinished:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                wait = self.heap[0][0] - time.monotonic()
+                if wait <= 0:
+                    _, _, url, attempt = heapq.heappop(self.heap)
+                    return url, attempt
+                self.condition.wait(wait)
+            return None
+
+
+def dispatch(urls, ledger, state, options):
+    # Returns the URLs that failed, in this run or by using up their retries in an earlier one
+    jobs = JobQueue()
+    failed = []
+    failed_lock = threading.Lock()
+    for url in urls:
+        url_state = state.get(url, {'done': False, 'attempts': 0})
+        if url_state['done']:
+            print(f"Skipping {url}, already scanned")
+            continue
+        if url_state['attempts'] > options.retries:
+            print(f"Skipping {url}, retries exhausted in a previous run")
+            failed.append(url)
+            continue
+        jobs.add(url, url_state['attempts'] + 1)
+
+    if jobs.unfinished == 0:
+        print("Nothing to scan.")
+        return failed
+
+    def process(url, attempt):
+        # Scans url once, returns True when the URL is finished and False when it is retried
+        print(f"Processing URL: {url} (attempt {attempt})")
+        with metrics.stage('scan'):
+            exit_code, duration, results_dir = run_scan(url, options.purple_dir, options.scan_args, options.timeout)
+        metrics.count('scans')
+
+        if exit_code == 0 and results_dir:
+            score_code = None
+            if not options.no_score:
+                with metrics.stage('score'):
+                    score_code = score_results(results_dir, options.output)
+            ledger.record(url=url, attempt=attempt, status='done', exit_code=exit_code,
+                          duration=duration, results_dir=results_dir, score_exit_code=score_code)
+            print(f"Finished {url} in {duration}s: {results_dir}")
+            return True
+        if attempt <= options.retries:
+            delay = options.backoff * (2 ** (attempt - 1))
+            delay += random.uniform(0, delay / 2)
+            ledger.record(url=url, attempt=attempt, status='retry', exit_code=exit_code,
+                          duration=duration, results_dir=results_dir)
+            print(f"Scan of {url} failed (exit code {exit_code}), retrying in {delay:.0f}s")
+            metrics.count('retries')
+            jobs.retry(url, attempt + 1, time.monotonic() + delay)
+            return False
+        ledger.record(url=url, attempt=attempt, status='failed', exit_code=exit_code,
+                      duration=duration, results_dir=results_dir)
+        print(f"Giving up on {url} after {attempt} attempts")
+        with failed_lock:
+            failed.append(url)
+        return True
+
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            url, attempt = job
+            try:
+                finished = process(url, attempt)
+            except Exception as e:
+                # E.g. node or --purple-dir missing, retrying would fail the same way
+                print(f"Scan of {url} failed: {e!r}")
+                with failed_lock:
+                    failed.append(url)
+                try:
+                    ledger.record(url=url, attempt=attempt, status='failed', error=repr(e))
+                except OSError as ledger_error:
+                    print(f"Could not record {url} in the ledger: {ledger_error}")
+                finished = True
+            if finished:
+                jobs.finish()
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(options.jobs)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Purple A11y scans for a CSV list of URLs in parallel.')
+    parser.add_argument('-c', '--csv', required=True, help='CSV file containing URLs to scan.')
+    parser.add_argument('--no-header', action='store_true', help='The CSV file has no header row.')
+    parser.add_argument('--purple-dir', default='./', help='Directory containing cli.js (default: current directory)')
+    parser.add_argument('--scan-args', default='-c 2 -p 250', help='Arguments passed to cli.js before -u (default: "-c 2 -p 250")')
+    parser.add_argument('-k', '--name-email', default=None, help='Name and email passed to cli.js -k, e.g. "Jane Doe:jane@example.gov"')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of concurrent scans (default: one per CPU, bounded by memory)')
+    parser.add_argument('--mem-per-scan', type=int, default=1500, help='Memory budget per scan in MB (default: 1500)')
+    parser.add_argument('--retries', type=int, default=2, help='Retries for a failed scan (default: 2)')
+    parser.add_argument('--backoff', type=float, default=30, help='Initial retry delay in seconds, doubled per attempt (default: 30)')
+    parser.add_argument('--timeout', type=float, default=None, help='Kill a scan after this many seconds')
+    parser.add_argument('-l', '--ledger', default='scan_ledger.jsonl', help='Job ledger used to resume runs (default: scan_ledger.jsonl)')
+    parser.add_argument('-o', '--output', default='summary', help='Output directory for find-score.py (default: summary)')
+    parser.add_argument('--no-score', action='store_true', help='Do not run find-score.py on finished scans.')
+    add_shard_argument(parser, 'domains')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    args.purple_dir = os.path.abspath(args.purple_dir)
+    args.scan_args = shlex.split(args.scan_args)
+    if args.name_email:
+        args.scan_args += ['-k', args.name_email]
+    args.jobs = worker_count(args.jobs, args.mem_per_scan)
+    if not args.no_score:
+        os.makedirs(args.output, exist_ok=True)
+
+    urls = [url for url in read_urls(args.csv, skip_header=not args.no_header) if in_shard(url, args.shard)]
+    state = load_ledger(args.ledger)
+    print(f"Scanning {len(urls)} URLs with {args.jobs} workers, ledger: {args.ledger}")
+
+    with metrics_session(args, 'scan-dispatcher'):
+        failed = dispatch(urls, Ledger(args.ledger), state, args)
+    if failed:
+        print(f"{len(failed)} of {len(urls)} URLs failed, see {args.ledger}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
 #!/bin/bash
 
+# Scans run one after another. For large lists use scan-dispatcher.py, which runs
+# scans in parallel, retries failures and resumes interrupted runs.
+
 # Function to display usage
 usage() {
     echo "Usage: $0 -c <csv_file>"
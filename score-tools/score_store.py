@@ -0,0 +1,157 @@
+#
+# Score Store
+#
+# Time-series store for the results written by calculate-score.py. Every `*_result.csv`
+# and the results table of --batch is ingested once into SQLite, keyed on (domain, metric, date), so aggregate-scores.py
+# only reads new or changed files and builds the per-domain totals from queries.
+#
+
+import csv
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+# calculate-score.py --batch writes one row per domain and date to this table in the summary
+# directory instead of a _result.csv per scan
+RESULTS_TABLE = 'results_table.csv'
+TABLE_COLUMNS = ['domain', 'date', 'scan_id', 'number_urls', 'critical', 'serious', 'moderate', 'minor',
+                 'score', 'grade']
+# The columns a _result.csv has, the totals are built from these
+RESULT_METRICS = ['number_urls', 'score', 'grade']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    domain TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (domain, metric, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    domain TEXT
+);
+CREATE TABLE IF NOT EXISTS domain_updates (
+    domain TEXT PRIMARY KEY,
+    updated_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class ScoreStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_ingested(self, filename):
+        stat = os.stat(filename)
+        row = self.connection.execute(
+            'SELECT mtime_ns, size FROM ingested_files WHERE path = ?', (os.path.abspath(filename),)
+        ).fetchone()
+        return row is not None and row == (stat.st_mtime_ns, stat.st_size)
+
+    def ingest(self, filename, domain, data):
+        # data is the key/value dictionary of one result file, 'domain' and 'date' are keys
+        date = data.get('date', 'unknown')
+        stat = os.stat(filename)
+        with self.connection:
+            changed = self._upsert(domain, [(key, date, value) for key, value in data.items()
+                                            if key not in ('domain', 'date')])
+            self.connection.execute(
+                'INSERT OR REPLACE INTO ingested_files (path, mtime_ns, size, domain) VALUES (?, ?, ?, ?)',
+                (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, domain)
+            )
+            self._touch([domain] if changed else [])
+
+    def ingest_table(self, filename, rows):
+        # rows are (domain key, row of the results table), all ingested in one transaction
+        stat = os.stat(filename)
+        by_domain = defaultdict(list)
+        for domain, row in rows:
+            by_domain[domain].extend((metric, row['date'], row[metric]) for metric in RESULT_METRICS)
+        with self.connection:
+            # The whole table is ingested again after every --batch run, only domains with new
+            # or changed values get their totals rewritten
+            changed = [domain for domain, values in by_domain.items() if self._upsert(domain, values)]
+            self.connection.execute(
+                'INSERT OR REPLACE INTO ingested_files (path, mtime_ns, size, domain) VALUES (?, ?, ?, ?)',
+                (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, None)
+            )
+            self._touch(changed)
+
+    def _upsert(self, domain, values):
+        # values are (metric, date, value), returns whether any of them was new or different
+        before = self.connection.total_changes
+        self.connection.executemany(
+            'INSERT INTO scores (domain, metric, date, value) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (domain, metric, date) DO UPDATE SET value = excluded.value '
+            'WHERE value IS NOT excluded.value',
+            [(domain, metric, date, value) for metric, date, value in values]
+        )
+        return self.connection.total_changes > before
+
+    def _touch(self, domains):
+        # Records when each domain last got new results, to tell which totals are out of date
+        now = time.time_ns()
+        self.connection.executemany('INSERT OR REPLACE INTO domain_updates (domain, updated_ns) VALUES (?, ?)',
+                                    [(domain, now) for domain in domains])
+
+    def updated_ns(self):
+        # {domain: time of its last new results in ns}, domains ingested before this was kept are missing
+        return dict(self.connection.execute('SELECT domain, updated_ns FROM domain_updates'))
+
+    def domains(self):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT domain FROM scores ORDER BY domain')]
+
+    def series(self, domain, since=None, until=None):
+        # Returns {metric: {date: value}} for one domain, optionally limited to a date range
+        query = 'SELECT metric, date, value FROM scores WHERE domain = ?'
+        params = [domain]
+        if since:
+            query += ' AND date >= ?'
+            params.append(since)
+        if until:
+            query += ' AND date <= ?'
+            params.append(until)
+        data = defaultdict(dict)
+        for metric, date, value in self.connection.execute(query, params):
+            data[metric][date] = value
+        return data
+
+
+def read_results_table(path):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        return list(csv.DictReader(file))
+
+
+def write_results_table(path, results):
+    # Replaces the rows of the same domain and date and keeps the others, so rerunning a batch
+    # gives the same table. Returns the number of rows in the table.
+    rows = {}
+    if os.path.exists(path):
+        for row in read_results_table(path):
+            rows[(row['domain'], row['date'])] = row
+    for row in results:
+        rows[(row['domain'], row['date'])] = row
+
+    # Written in one go to a temporary file, readers never see half a table
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8', newline='', buffering=1 << 20) as file:
+        writer = csv.DictWriter(file, TABLE_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows[key] for key in sorted(rows))
+    os.replace(temporary, path)
+    return len(rows)
@@ -0,0 +1,49 @@
+#
+# Sharding
+#
+# Splits a list of domains or URLs between several machines with --shard i/N. Every key is
+# hashed with MD5, as sitemap-randomizer.py already does for sampling, and placed with jump
+# consistent hashing, so each key always lands in the same shard and growing from N to N+1
+# shards only moves about 1/(N+1) of the keys.
+#
+
+import argparse
+import hashlib
+
+
+def jump_hash(key, buckets):
+    # Lamping and Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(key, shards):
+    # Zero based shard of a domain or URL
+    return jump_hash(int(hashlib.md5(key.encode()).hexdigest()[:16], 16), shards)
+
+
+def parse_shard(value):
+    # argparse type for 'i/N' with 1 <= i <= N, returns (i, N)
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 1/4, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {value!r} is out of range, i must be between 1 and N")
+    return index, count
+
+
+def in_shard(key, shard):
+    if shard is None:
+        return True
+    index, count = shard
+    return shard_of(key, count) == index - 1
+
+
+def add_shard_argument(parser, keys='URLs'):
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help=f'Only keep the {keys} of shard i of N, e.g. 2/4, to split the work between machines')
@@ -0,0 +1,223 @@
+#
+# Sketches
+#
+# Fixed-size summaries of large columns, used by find-score.py --sketches instead of keeping
+# every URL and XPath in memory. All of them serialize to JSON and merge, so the sketches of
+# several scans or shards combine as if the reports had been read together.
+#
+#   HyperLogLog     distinct count, relative standard error about `error`
+#   CountMinSketch  count of any key, overestimated by at most error * total (99% of the time)
+#   SpaceSaving     the most frequent keys, counts overestimated by at most error * total
+#
+# ColumnSketch bundles the three for one summary column.
+#
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+
+DEFAULT_ERROR = 0.01
+
+# Summary columns find-score.py --sketches keeps as sketches, and the file they are saved in
+SKETCHED_COLUMNS = ('url', 'xpath')
+SKETCHES_SUFFIX = '_sketches.json'
+
+
+def hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    def __init__(self, error=DEFAULT_ERROR, precision=None):
+        # The standard error is 1.04 / sqrt(2 ** precision)
+        if precision is None:
+            precision = math.ceil(math.log2((1.04 / error) ** 2))
+        self.precision = min(18, max(4, precision))
+        self.registers = bytearray(1 << self.precision)
+
+    def add(self, value):
+        hashed = hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def count(self):
+        registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / registers)
+        estimate = alpha * registers * registers / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * registers and zeros:
+            # Linear counting is more accurate for small sets
+            estimate = registers * math.log(registers / zeros)
+        return round(estimate)
+
+    def __len__(self):
+        return self.count()
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        self.registers = bytearray(max(pair) for pair in zip(self.registers, other.registers))
+        return self
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(precision=data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+class CountMinSketch:
+    def __init__(self, error=DEFAULT_ERROR, confidence=0.99, width=None, depth=None):
+        self.width = width or math.ceil(math.e / error)
+        self.depth = depth or math.ceil(math.log(1 / (1 - confidence)))
+        self.table = [[0] * self.width for _ in range(self.depth)]
+        self.total = 0
+
+    def _columns(self, value):
+        # Double hashing gives the depth independent-enough hash functions from one hash
+        hashed = hash64(value)
+        first, second = hashed >> 32, hashed & 0xFFFFFFFF
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, value, count=1):
+        for row, column in enumerate(self._columns(value)):
+            self.table[row][column] += count
+        self.total += count
+
+    def estimate(self, value):
+        return min(self.table[row][column] for row, column in enumerate(self._columns(value)))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('Cannot merge Count-Min sketches of different sizes')
+        for row, other_row in zip(self.table, other.table):
+            for column, count in enumerate(other_row):
+                row[column] += count
+        self.total += other.total
+        return self
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth, 'total': self.total, 'table': self.table}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(width=data['width'], depth=data['depth'])
+        sketch.table = data['table']
+        sketch.total = data['total']
+        return sketch
+
+
+class SpaceSaving:
+    def __init__(self, error=DEFAULT_ERROR, capacity=None):
+        self.capacity = capacity or math.ceil(1 / error)
+        self.counts = {}
+        # (count, key) of every count a key had, the smallest current one is evicted. Entries
+        # whose count is out of date are skipped when popped and dropped when the heap is rebuilt.
+        self.heap = []
+
+    def _rebuild(self):
+        self.heap = [(count, value) for value, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def add(self, value, count=1):
+        if value in self.counts or len(self.counts) < self.capacity:
+            self.counts[value] = self.counts.get(value, 0) + count
+        else:
+            # Replace the least frequent key, the new key inherits its count as possible overcount
+            while True:
+                smallest_count, smallest = heapq.heappop(self.heap)
+                if self.counts.get(smallest) == smallest_count:
+                    break
+            self.counts[value] = self.counts.pop(smallest) + count
+        heapq.heappush(self.heap, (self.counts[value], value))
+        if len(self.heap) > 4 * self.capacity:
+            self._rebuild()
+
+    def minimum(self):
+        # Count any key that is not monitored could have
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def top(self, number=None):
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:number] if number else ranked
+
+    def merge(self, other):
+        # Keys missing from one summary may have had up to its minimum count there
+        own_minimum, other_minimum = self.minimum(), other.minimum()
+        merged = {}
+        for value in set(self.counts) | set(other.counts):
+            merged[value] = self.counts.get(value, own_minimum) + other.counts.get(value, other_minimum)
+        self.capacity = max(self.capacity, other.capacity)
+        self.counts = dict(sorted(merged.items(), key=lambda item: (-item[1], item[0]))[:self.capacity])
+        self._rebuild()
+        return self
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(capacity=data['capacity'])
+        sketch.counts = dict(data['counts'])
+        sketch._rebuild()
+        return sketch
+
+
+class ColumnSketch:
+    def __init__(self, error=DEFAULT_ERROR):
+        self.error = error
+        self.distinct = HyperLogLog(error)
+        self.frequency = CountMinSketch(error)
+        self.heavy_hitters = SpaceSaving(error)
+
+    def add(self, value, count=1):
+        self.distinct.add(value)
+        self.frequency.add(value, count)
+        self.heavy_hitters.add(value, count)
+
+    def top(self, number=None):
+        # Space-Saving finds the keys, Count-Min usually has the tighter count
+        ranked = [(value, min(count, self.frequency.estimate(value)))
+                  for value, count in self.heavy_hitters.top()]
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:number] if number else ranked
+
+    def merge(self, other):
+        self.distinct.merge(other.distinct)
+        self.frequency.merge(other.frequency)
+        self.heavy_hitters.merge(other.heavy_hitters)
+        return self
+
+    def to_dict(self):
+        return {'error': self.error, 'distinct': self.distinct.to_dict(), 'frequency': self.frequency.to_dict(),
+                'heavy_hitters': self.heavy_hitters.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['error'])
+        sketch.distinct = HyperLogLog.from_dict(data['distinct'])
+        sketch.frequency = CountMinSketch.from_dict(data['frequency'])
+        sketch.heavy_hitters = SpaceSaving.from_dict(data['heavy_hitters'])
+        return sketch
+
+
+def save_sketches(path, sketches):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({column: sketch.to_dict() for column, sketch in sketches.items()}, file)
+
+
+def load_sketches(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return {column: ColumnSketch.from_dict(data) for column, data in json.load(file).items()}
@@ -0,0 +1,97 @@
+#
+# Templates
+#
+# Issue fingerprints for find-score.py --templates. The same axe issue on a shared header or
+# footer is reported once for every page of a site, each occurrence is fingerprinted by
+# (issueId, normalized XPath, hash of the context) and kept once with the number of pages and
+# occurrences, instead of counting every XPath and context string.
+#
+# A fingerprint found on more than one page is templated, the others are page-unique. The
+# fingerprints of several shards or scans merge by adding up both counts.
+#
+#   issueId,xpath,contextHash,pages,occurrences
+#   color-contrast,/html/body/header/nav/ul/li[2]/a,5f0c8e1d2a3b4c6d,1200,1200
+#
+
+import csv
+import hashlib
+import re
+
+TEMPLATES_SUFFIX = '_templates.csv'
+TEMPLATE_COLUMNS = ['issueId', 'xpath', 'contextHash', 'pages', 'occurrences']
+
+WHITESPACE = re.compile(r'\s+')
+STEP_SEPARATOR = re.compile(r'\s*/\s*')
+
+
+def normalize_xpath(xpath):
+    # Same XPath whatever the whitespace around its steps, a trailing slash selects nothing more
+    xpath = STEP_SEPARATOR.sub('/', WHITESPACE.sub(' ', xpath.strip()))
+    return xpath.rstrip('/') if len(xpath) > 1 else xpath
+
+
+def context_hash(context):
+    return hashlib.blake2b(context.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class TemplateIndex:
+    def __init__(self):
+        # (issueId, xpath, context hash) -> [pages, occurrences, last URL]
+        self.fingerprints = {}
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def add(self, issue_id, xpath, context, url, amount=1):
+        # Occurrences of one page are added together, a page only counts once per fingerprint
+        # as long as its occurrences are not interleaved with other pages, as in the reports
+        key = (issue_id, normalize_xpath(xpath), context_hash(context))
+        entry = self.fingerprints.get(key)
+        if entry is None:
+            self.fingerprints[key] = [1, amount, url]
+            return
+        if entry[2] != url:
+            entry[0] += 1
+            entry[2] = url
+        entry[1] += amount
+
+    def add_fingerprint(self, key, pages, occurrences):
+        entry = self.fingerprints.setdefault(key, [0, 0, None])
+        entry[0] += pages
+        entry[1] += occurrences
+
+    def merge(self, other):
+        for key, (pages, occurrences, _) in other.fingerprints.items():
+            self.add_fingerprint(key, pages, occurrences)
+        return self
+
+    def rows(self):
+        # (issueId, xpath, context hash, pages, occurrences), the most occurrences first
+        rows = [(*key, pages, occurrences) for key, (pages, occurrences, _) in self.fingerprints.items()]
+        return sorted(rows, key=lambda row: (-row[4], row[:3]))
+
+    def split(self):
+        # {'templated': (fingerprints, occurrences), 'page_unique': (fingerprints, occurrences)}
+        totals = {'templated': [0, 0], 'page_unique': [0, 0]}
+        for pages, occurrences, _ in self.fingerprints.values():
+            total = totals['templated' if pages > 1 else 'page_unique']
+            total[0] += 1
+            total[1] += occurrences
+        return {kind: tuple(total) for kind, total in totals.items()}
+
+
+def save_templates(path, index):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(TEMPLATE_COLUMNS)
+        writer.writerows(index.rows())
+
+
+def load_templates(path, index=None):
+    # Adds the fingerprints of a templates file to index, a new one without
+    index = TemplateIndex() if index is None else index
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file):
+            index.add_fingerprint((row['issueId'], row['xpath'], row['contextHash']),
+                                  int(row['pages']), int(row['occurrences']))
+    return index
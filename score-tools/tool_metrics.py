@@ -0,0 +1,207 @@
+#
+# Tool Metrics
+#
+# Opt-in instrumentation shared by the score-tools and sitemap-tools scripts. A script adds
+# the --profile and --metrics-out options with add_metrics_arguments() and wraps its work in
+# metrics_session(). Nothing is recorded unless one of the options is given.
+#
+#   --metrics-out metrics.json  per-stage wall time, HTTP requests per host with a latency
+#                               histogram, bytes read and written, rows parsed and peak RSS
+#   --profile [profile.prof]    the same timing report on stderr plus a cProfile dump
+#
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Upper bounds of the request latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.stages = defaultdict(lambda: {'calls': 0, 'wall_time_s': 0.0})
+        self.counters = defaultdict(int)
+        self.hosts = defaultdict(lambda: {'requests': 0, 'errors': 0, 'bytes': 0, 'total_time_s': 0.0,
+                                          'status': defaultdict(int),
+                                          'latency_ms': [0] * (len(LATENCY_BUCKETS_MS) + 1)})
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self.stages[name]
+            stage['calls'] += 1
+            stage['wall_time_s'] += time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def read_file(self, path):
+        # Counts the size of a file the tool reads in full
+        if self.enabled and os.path.exists(path):
+            self.counters['bytes_read'] += os.path.getsize(path)
+
+    def wrote_file(self, path):
+        if self.enabled and os.path.exists(path):
+            self.counters['bytes_written'] += os.path.getsize(path)
+
+    def record_request(self, url, seconds, status=None, size=0, error=False):
+        if not self.enabled:
+            return
+        host = self.hosts[urlparse(url).netloc or url]
+        host['requests'] += 1
+        host['total_time_s'] += seconds
+        host['bytes'] += size
+        if error:
+            host['errors'] += 1
+        else:
+            host['status'][str(status)] += 1
+        milliseconds = seconds * 1000
+        bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS_MS) if milliseconds <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        host['latency_ms'][bucket] += 1
+        self.counters['requests'] += 1
+        self.counters['bytes_downloaded'] += size
+
+    def to_dict(self, tool):
+        return {
+            'tool': tool,
+            'argv': sys.argv[1:],
+            'wall_time_s': round(time.perf_counter() - self.started, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'stages': {name: {'calls': stage['calls'], 'wall_time_s': round(stage['wall_time_s'], 6)}
+                       for name, stage in self.stages.items()},
+            'counters': dict(self.counters),
+            'latency_buckets_ms': LATENCY_BUCKETS_MS + ['inf'],
+            'hosts': {name: {**host, 'total_time_s': round(host['total_time_s'], 6), 'status': dict(host['status'])}
+                      for name, host in self.hosts.items()},
+        }
+
+
+metrics = Metrics()
+
+
+def install_http_hooks():
+    # Times every HTTP request made through requests or urllib, including each redirect hop.
+    # The sitemap tools only import requests when they first need it, so it is imported here.
+    try:
+        import requests
+    except ImportError:
+        requests = None
+
+    if requests is not None:
+        if not getattr(requests.Session.send, '_tool_metrics', False):
+            original_send = requests.Session.send
+
+            def send(self, request, **kwargs):
+                start = time.perf_counter()
+                try:
+                    response = original_send(self, request, **kwargs)
+                except Exception:
+                    metrics.record_request(request.url, time.perf_counter() - start, error=True)
+                    raise
+                if kwargs.get('stream'):
+                    size = int(response.headers.get('Content-Length') or 0)
+                else:
+                    size = len(response.content or b'')
+                metrics.record_request(request.url, time.perf_counter() - start, response.status_code, size)
+                return response
+
+            send._tool_metrics = True
+            requests.Session.send = send
+
+    import urllib.request
+
+    if not getattr(urllib.request.OpenerDirector.open, '_tool_metrics', False):
+        original_open = urllib.request.OpenerDirector.open
+
+        def open_url(self, fullurl, *args, **kwargs):
+            url = fullurl if isinstance(fullurl, str) else fullurl.full_url
+            start = time.perf_counter()
+            try:
+                response = original_open(self, fullurl, *args, **kwargs)
+            except Exception:
+                metrics.record_request(url, time.perf_counter() - start, error=True)
+                raise
+            metrics.record_request(url, time.perf_counter() - start, getattr(response, 'status', None),
+                                   int(response.headers.get('Content-Length') or 0))
+            return response
+
+        open_url._tool_metrics = True
+        urllib.request.OpenerDirector.open = open_url
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics-out', default=None, help='Write timing, request and memory metrics to this JSON file')
+    parser.add_argument('--profile', nargs='?', const='profile.prof', default=None,
+                        help='Print a timing report and write a cProfile dump (default: profile.prof)')
+
+
+def print_report(report, stream=sys.stderr):
+    print(f"\n{report['tool']}: {report['wall_time_s']:.3f}s, peak RSS {report['peak_rss_kb']} KB", file=stream)
+    for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['wall_time_s']):
+        print(f"  {name}: {stage['wall_time_s']:.3f}s in {stage['calls']} calls", file=stream)
+    for name, value in sorted(report['counters'].items()):
+        print(f"  {name}: {value}", file=stream)
+    for name, host in sorted(report['hosts'].items()):
+        average = host['total_time_s'] / host['requests'] * 1000 if host['requests'] else 0
+        print(f"  {name}: {host['requests']} requests, {host['errors']} errors, {average:.0f} ms average", file=stream)
+
+
+@contextmanager
+def metrics_session(args, tool):
+    metrics_out = getattr(args, 'metrics_out', None)
+    profile_out = getattr(args, 'profile', None)
+    if not metrics_out and not profile_out:
+        yield metrics
+        return
+
+    metrics.reset()
+    metrics.enabled = True
+    install_http_hooks()
+    profiler = None
+    if profile_out:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_out)
+        report = metrics.to_dict(tool)
+        if metrics_out:
+            with open(metrics_out, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+        if profile_out:
+            print_report(report)
+            print(f"  cProfile data written to {profile_out}", file=sys.stderr)
+        metrics.enabled = False
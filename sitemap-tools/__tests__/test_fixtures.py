@@ -0,0 +1,108 @@
+import csv
+import glob
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('requests')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from purple_sitemap.cli import run_command  # noqa: E402
+from purple_sitemap.fixtures import FixtureServer, make_certificate  # noqa: E402
+from purple_sitemap.randomizer import filter_and_randomize_urls  # noqa: E402
+
+
+def read_locs(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return {line.split('<loc>')[1].split('</loc>')[0] for line in file if '<loc>' in line}
+
+
+def test_randomize_reads_nested_gzip_indexes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=120, sitemaps=6, indexes=3) as site:
+        run_command('randomize', ['-u', f"{site.url}/sitemap.xml", '-n', '500', '-p', '50', '-f', 'csv',
+                                  '-o', 'random.csv', '--mirror', 'mirror'])
+        with open('random.csv', 'r', encoding='utf-8') as file:
+            urls = [row[0] for row in csv.reader(file) if row]
+        assert sorted(urls) == sorted(filter_and_randomize_urls(site.page_urls(), [], [], 50))
+        assert site.hits['/sitemaps/index-2.xml.gz'] == 1 and site.hits['/sitemaps/sitemap-5.xml.gz'] == 1
+
+        # Unchanged according to lastmod, only the index is asked again and it answers 304
+        run_command('randomize', ['-u', f"{site.url}/sitemap.xml", '-n', '500', '-f', 'csv', '-o', 'again.csv',
+                                  '--mirror', 'mirror'])
+        assert site.hits['/sitemap.xml'] == 2 and site.hits['/sitemaps/index-2.xml.gz'] == 1
+
+
+def test_crawl_stays_within_robots_txt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=40, links=3) as site:
+        run_command('crawl', ['-d', site.url])
+        locs = read_locs(glob.glob(str(tmp_path / '*_sitemap_*.xml'))[0])
+        assert {f"{site.url}/page/{number}" for number in range(40)} <= locs
+        # Disallowed pages are listed as found but never fetched
+        assert not any(path.startswith('/private/') for path in site.hits)
+        assert site.hits['/robots.txt'] == 1
+
+
+def test_crawl_skips_hosts_whose_robots_txt_cannot_be_fetched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run_command('crawl', ['-d', '127.0.0.1:1', '--retries', '0'])
+    assert read_locs(tmp_path / f"127.0.0.1:1_sitemap_{datetime.now():%Y%m%d}.xml") == set()
+
+
+def test_generate_follows_redirects_on_hosts_that_reject_head(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=10, redirects=3, head=False) as site:
+        (tmp_path / 'urls.csv').write_text(''.join(f"{url}\n" for url in site.page_urls()))
+        run_command('generate', ['-c', 'urls.csv', '-o', 'sitemap.xml'])
+        # Every HEAD gets 405, the pages are only kept because the redirects were followed with GET
+        assert read_locs(tmp_path / 'sitemap.xml') == set(site.page_urls())
+
+
+def test_generate_probes_urls_without_a_scheme(tmp_path, monkeypatch):
+    from purple_sitemap import generate
+
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=3) as site:
+        host = site.url.split('://')[1]
+        (tmp_path / 'urls.csv').write_text(f"{host}/page/1\n{host}/redirect/2/page/2\n127.0.0.1:1/page/0\n")
+        run_command('generate', ['-c', 'urls.csv', '-o', 'sitemap.xml', '--retries', '0'])
+        # The path redirect is listed where it ends, the root is only probed once for both paths
+        assert read_locs(tmp_path / 'sitemap.xml') == {f"{site.url}/page/1", f"{site.url}/page/2"}
+        assert site.hits['/'] == 1 and site.hits['/redirect/2/page/2'] == 1
+        # The dead host is not cached as failed and comes back with https instead of no scheme
+        assert '127.0.0.1:1' not in generate.canonical_origins
+        assert generate.preprocess_url('127.0.0.1:1/page/0') == 'https://127.0.0.1:1/page/0'
+
+
+def test_verify_over_https_with_a_ca_bundle(tmp_path, monkeypatch):
+    certificate = make_certificate(str(tmp_path))
+    if certificate is None:
+        pytest.skip('openssl is not installed')
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=5, redirects=1, certfile=certificate[0], keyfile=certificate[1]) as site:
+        (tmp_path / 'urls.csv').write_text(''.join(f"{url}\n" for url in site.page_urls()))
+        run_command('verify', ['-c', 'urls.csv', '-o', 'without.csv', '--retries', '0'])
+        assert (tmp_path / 'without.csv').read_text() == ''
+
+        run_command('verify', ['-c', 'urls.csv', '-o', 'verified.csv', '--ca-bundle', certificate[0]])
+        with open(tmp_path / 'verified.csv', 'r', encoding='utf-8') as file:
+            assert {row[0] for row in csv.reader(file)} == {f"{site.url}/page/{number}" for number in range(5)}
+
+
+def test_discover_validates_with_a_local_schema(tmp_path, monkeypatch):
+    pytest.importorskip('lxml')
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer(pages=5, sitemaps=0) as plain, FixtureServer(pages=5) as indexed:
+        (tmp_path / 'domain_source.csv').write_text(f"{plain.url}\n{indexed.url}\n")
+        run_command('discover', ['--schema', f"{plain.url}/sitemap.xsd"])
+        # The schema only allows a urlset, an index is reported as a failure
+        assert set((tmp_path / 'sitemap_extracts.csv').read_text().split()) == {f"{plain.url}/sitemap.xml", indexed.url}
+        assert (tmp_path / 'sitemap_failures.csv').read_text().split() == [indexed.url]
+        assert plain.hits['/sitemap.xsd'] == 1
+
+        run_command('discover', ['--schema', 'bundled'])
+        assert (tmp_path / 'sitemap_failures.csv').read_text().split() == [indexed.url]
+        assert plain.hits['/sitemap.xsd'] == 1
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+SITEMAP_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, SITEMAP_TOOLS)
+from purple_sitemap.cli import COMMANDS, run_batch  # noqa: E402
+
+HEAVY = ['requests', 'bs4', 'lxml', 'urllib.request', 'urllib.robotparser']
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.gov/</loc></url>
+</urlset>
+"""
+
+
+def test_commands_start_without_heavy_imports(tmp_path):
+    (tmp_path / 'sitemap.xml').write_text(SITEMAP)
+    (tmp_path / 'new.csv').write_text('https://example.gov/\nhttps://example.gov/about\n')
+    script = f"""
+import sys
+from purple_sitemap.cli import build_parser, run_command
+for name in {list(COMMANDS)!r}:
+    build_parser(name)
+run_command('merge', ['-x', 'sitemap.xml', '-c', 'new.csv', '-o', 'combined.xml'])
+print(','.join(name for name in {HEAVY!r} if name in sys.modules), file=sys.stderr)
+"""
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': SITEMAP_TOOLS}, check=True)
+    assert result.stderr.strip() == ''
+    assert 'https://example.gov/about' in (tmp_path / 'combined.xml').read_text()
+
+
+def test_batch_keeps_going_after_a_failed_command(tmp_path, monkeypatch):
+    (tmp_path / 'sitemap.xml').write_text(SITEMAP)
+    (tmp_path / 'new.csv').write_text('https://example.gov/contact\n')
+    (tmp_path / 'batch.txt').write_text(
+        '# combine twice\n'
+        'merge -x sitemap.xml -c new.csv -o first.xml\n'
+        '\n'
+        'merge -x missing.xml -c new.csv -o broken.xml\n'
+        'merge -x first.xml -c new.csv -o "second copy.xml"\n'
+        'unknown --flag\n')
+    monkeypatch.chdir(tmp_path)
+
+    assert run_batch('batch.txt') == 2
+    assert 'https://example.gov/contact' in (tmp_path / 'first.xml').read_text()
+    assert (tmp_path / 'second copy.xml').exists()
+    assert not (tmp_path / 'broken.xml').exists()
+
+
+def test_shared_modules_match_score_tools():
+    for name in ['tool_metrics.py', 'sharding.py']:
+        with open(os.path.join(SITEMAP_TOOLS, 'purple_sitemap', name), 'rb') as copy, \
+                open(os.path.join(SITEMAP_TOOLS, '..', 'score-tools', name), 'rb') as original:
+            assert copy.read() == original.read(), f"purple_sitemap/{name} differs from score-tools/{name}"
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('requests')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from purple_sitemap.changes import ChangeStore, normalize_body  # noqa: E402
+from purple_sitemap.cli import run_command  # noqa: E402
+from purple_sitemap.fetch import Fetcher  # noqa: E402
+from purple_sitemap.update import get_final_url_and_mime_type  # noqa: E402
+from test_sitemap_fetch import StubHandler, stub_server  # noqa: E402,F401
+
+
+def test_normalize_body_ignores_volatile_markup():
+    first = '<p>Hello</p>\n<!-- built 10:01 --><script nonce="a1">var t = 1;</script>'
+    second = '<p>Hello</p>  <!-- built 10:02 --><script nonce="b2">var t = 2;</script>'
+    assert normalize_body(first) == normalize_body(second)
+    assert normalize_body('<p>Hello</p>') != normalize_body('<p>Hello!</p>')
+
+
+def test_change_store_detects_changes(tmp_path, stub_server):
+    StubHandler.responses['/page'] = [(200, {'Content-Type': 'text/html', 'ETag': '"v1"'})]
+    fetcher = Fetcher()
+    url = f"{stub_server}/page"
+
+    with ChangeStore(str(tmp_path / 'changes.sqlite')) as changes:
+        assert changes.conditional_headers(url) == {}
+        assert changes.record(url, fetcher.get(url)) is True
+        assert changes.conditional_headers(url) == {'If-None-Match': '"v1"'}
+        # Same body again, still changed until its scan is confirmed
+        assert changes.record(url, fetcher.get(url)) is True
+        assert changes.mark_scanned([url]) == 1
+        assert changes.record(url, fetcher.get(url)) is False
+        changed_at = changes.get(url)['changed_at']
+
+        page = changes.not_modified(url)
+        assert page['final_url'] == url
+        assert page['changed_at'] == changed_at
+
+
+def test_not_modified_for_an_unknown_page_fetches_it_again(tmp_path, stub_server):
+    # A cache in front of the site answers 304 to a page the store never saw
+    StubHandler.responses['/cached'] = [(304, {}), (200, {'Content-Type': 'text/html'})]
+    url = f"{stub_server}/cached"
+
+    with ChangeStore(str(tmp_path / 'changes.sqlite')) as changes:
+        assert get_final_url_and_mime_type(url, changes) == (url, 'text/html', 200, True)
+        assert changes.get(url)['final_url'] == url
+    assert StubHandler.hits['/cached'] == 2
+
+
+def test_pages_stay_changed_until_their_scan_is_confirmed(tmp_path, stub_server, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for path in ('/a', '/b'):
+        StubHandler.responses[path] = [(200, {'Content-Type': 'text/html', 'ETag': '"v1"'})]
+    urls = [f"{stub_server}/a", f"{stub_server}/b"]
+
+    def update(*extra):
+        (tmp_path / 'sitemap.xml').write_text(
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f'<url><loc>{url}</loc></url>' for url in urls) + '</urlset>')
+        run_command('update', ['-x', 'sitemap.xml', '--changes-store', 'changes.sqlite', *extra])
+        return (sorted((tmp_path / 'sitemap-changed.xml').read_text().split('<loc>')[1:]),
+                (tmp_path / 'sitemap-unchanged.txt').read_text().split())
+
+    assert len(update()[0]) == 2
+    # Updated again without a scan in between, nothing may be carried forward
+    changed, unchanged = update()
+    assert len(changed) == 2 and unchanged == []
+
+    # Only /a was scanned
+    (tmp_path / 'scanned.txt').write_text(f"{urls[0]}\n")
+    changed, unchanged = update('--scanned', 'scanned.txt')
+    assert unchanged == [urls[0]] and len(changed) == 1 and changed[0].startswith(urls[1])
+
+    changed, unchanged = update('--scanned', 'sitemap-changed.xml')
+    assert changed == [] and sorted(unchanged) == urls
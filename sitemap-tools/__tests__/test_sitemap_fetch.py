@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from purple_sitemap.fetch import Fetcher, RedirectResolver, TokenBucket, retry_after_seconds  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path -> list of (status, headers) served in order, the last one repeats
+    responses = {}
+    hits = {}
+    connections = set()
+
+    def do_GET(self):
+        StubHandler.connections.add(self.client_address)
+        hits = StubHandler.hits.get(self.path, 0)
+        StubHandler.hits[self.path] = hits + 1
+        plan = StubHandler.responses.get(self.path, [(200, {})])
+        status, headers = plan[min(hits, len(plan) - 1)]
+        if headers.get('X-Sleep'):
+            time.sleep(float(headers['X-Sleep']))
+        body = f"{self.path} {status}".encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.responses = {}
+    StubHandler.hits = {}
+    StubHandler.connections = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_5xx_until_success(stub_server):
+    StubHandler.responses['/flaky'] = [(503, {}), (502, {}), (200, {})]
+    fetcher = Fetcher(retries=3, backoff=0.01)
+
+    response = fetcher.get(f"{stub_server}/flaky")
+
+    assert response.status_code == 200
+    assert StubHandler.hits['/flaky'] == 3
+    assert fetcher.stats['retries'] == 2
+
+
+def test_gives_up_after_retries(stub_server):
+    StubHandler.responses['/down'] = [(500, {})]
+    fetcher = Fetcher(retries=2, backoff=0.01)
+
+    response = fetcher.get(f"{stub_server}/down")
+
+    assert response.status_code == 500
+    assert StubHandler.hits['/down'] == 3
+
+
+def test_does_not_retry_404(stub_server):
+    StubHandler.responses['/missing'] = [(404, {})]
+    fetcher = Fetcher(retries=3, backoff=0.01)
+
+    assert fetcher.get(f"{stub_server}/missing").status_code == 404
+    assert StubHandler.hits['/missing'] == 1
+
+
+def test_honours_retry_after(stub_server):
+    StubHandler.responses['/busy'] = [(429, {'Retry-After': '1'}), (200, {})]
+    fetcher = Fetcher(retries=1, backoff=0.01)
+
+    start = time.monotonic()
+    response = fetcher.get(f"{stub_server}/busy")
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.9
+
+
+def test_reuses_connections(stub_server):
+    fetcher = Fetcher()
+
+    for page in range(10):
+        assert fetcher.get(f"{stub_server}/page-{page}").status_code == 200
+
+    assert len(StubHandler.connections) == 1
+
+
+def test_timeout_raises_after_retries(stub_server):
+    StubHandler.responses['/slow'] = [(200, {'X-Sleep': '0.5'})]
+    fetcher = Fetcher(timeout=0.1, retries=1, backoff=0.01)
+
+    with pytest.raises(requests.Timeout):
+        fetcher.get(f"{stub_server}/slow")
+    assert StubHandler.hits['/slow'] == 2
+
+
+def test_rate_limit_spaces_requests(stub_server):
+    fetcher = Fetcher(rate_limit=20)
+
+    start = time.monotonic()
+    for page in range(40):
+        fetcher.get(f"{stub_server}/rate-{page}")
+
+    # A burst of 20 is allowed, the other 20 requests take about a second
+    assert time.monotonic() - start >= 0.9
+
+
+def test_token_bucket_burst():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+
+def test_retry_after_http_date():
+    response = requests.Response()
+    response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert retry_after_seconds(response) == 0.0
+    response.headers['Retry-After'] = '7'
+    assert retry_after_seconds(response) == 7.0
+
+
+def test_redirect_resolver_walks_shared_chains_once(stub_server):
+    StubHandler.responses['/http'] = [(301, {'Location': '/https'})]
+    StubHandler.responses['/www'] = [(301, {'Location': '/https'})]
+    StubHandler.responses['/https'] = [(302, {'Location': f"{stub_server}/final"})]
+    resolver = RedirectResolver(fetch=Fetcher())
+
+    assert resolver.resolve(f"{stub_server}/http") == (f"{stub_server}/final", 200)
+    assert resolver.resolve(f"{stub_server}/www") == (f"{stub_server}/final", 200)
+    assert resolver.resolve(f"{stub_server}/http") == (f"{stub_server}/final", 200)
+
+    assert StubHandler.hits == {'/http': 1, '/www': 1, '/https': 1, '/final': 1}
+    assert [status for _, _, status in resolver.chain(f"{stub_server}/http")] == [301, 302]
+
+
+def test_redirect_resolver_stops_loops(stub_server):
+    StubHandler.responses['/a'] = [(302, {'Location': '/b'})]
+    StubHandler.responses['/b'] = [(302, {'Location': '/a'})]
+    resolver = RedirectResolver(fetch=Fetcher(), max_redirects=5)
+
+    assert resolver.resolve(f"{stub_server}/a") == (None, None)
+
+
+def test_redirect_resolver_asks_again_after_errors(stub_server):
+    StubHandler.responses['/start'] = [(301, {'Location': '/late'})]
+    StubHandler.responses['/late'] = [(200, {'X-Sleep': '0.5'}), (200, {})]
+    resolver = RedirectResolver(fetch=Fetcher(timeout=0.1, retries=0))
+
+    assert resolver.resolve(f"{stub_server}/start") == (None, None)
+    assert resolver.resolve(f"{stub_server}/start") == (f"{stub_server}/late", 200)
+    assert StubHandler.hits == {'/start': 2, '/late': 2}
+
+
+def test_robots_txt_statuses_follow_robotfileparser(stub_server, monkeypatch):
+    from purple_sitemap import crawl
+
+    monkeypatch.setattr(crawl, 'fetcher', lambda: Fetcher(retries=0))
+    for status, allowed in ((200, True), (403, False), (404, True), (503, False)):
+        StubHandler.responses['/robots.txt'] = [(status, {})]
+        crawl.robots_parsers.clear()
+        assert crawl.can_fetch(f"{stub_server}/page") is allowed, status
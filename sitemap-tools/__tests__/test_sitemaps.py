@@ -0,0 +1,191 @@
+import gzip
+import io
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from purple_sitemap.cli import run_command  # noqa: E402
+from purple_sitemap.fetch import Fetcher  # noqa: E402
+from purple_sitemap.sitemaps import SitemapLoader, SitemapMirror, parse_sitemap  # noqa: E402
+
+NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+class SitemapHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path -> body, served with an ETag of its version
+    files = {}
+    versions = {}
+    downloads = {}
+    # path -> number of downloads that break off after half the body
+    broken = {}
+
+    def do_GET(self):
+        body = SitemapHandler.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = f'"{SitemapHandler.versions.get(self.path, 1)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        SitemapHandler.downloads[self.path] = SitemapHandler.downloads.get(self.path, 0) + 1
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if SitemapHandler.broken.get(self.path):
+            SitemapHandler.broken[self.path] -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def urlset(urls):
+    entries = ''.join(f'<url><loc>{url}</loc></url>' for url in urls)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{NS}">{entries}</urlset>'.encode()
+
+
+def sitemap_index(children):
+    entries = ''.join(f'<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>' for loc, lastmod in children)
+    return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{NS}">{entries}</sitemapindex>'.encode()
+
+
+@pytest.fixture
+def sitemap_server():
+    SitemapHandler.files = {}
+    SitemapHandler.versions = {}
+    SitemapHandler.downloads = {}
+    SitemapHandler.broken = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SitemapHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def publish_site(base, lastmods):
+    # An index of gzipped children, child i lists pages i-0 ... i-49
+    children = []
+    for child, lastmod in enumerate(lastmods):
+        path = f"/sitemap-{child}.xml.gz"
+        SitemapHandler.files[path] = gzip.compress(urlset(f"{base}/page/{child}-{page}" for page in range(50)))
+        children.append((f"{base}{path}", lastmod))
+    SitemapHandler.files['/sitemap_index.xml'] = sitemap_index(children)
+
+
+def test_extension_locs_are_not_page_urls():
+    sitemap = (f'<?xml version="1.0" encoding="UTF-8"?>'
+               f'<urlset xmlns="{NS}" xmlns:image="http://www.google.com/schemas/sitemap-image/1.1" '
+               f'xmlns:xhtml="http://www.w3.org/1999/xhtml">'
+               f'<url><loc>https://ex.gov/a</loc>'
+               f'<image:image><image:loc>https://ex.gov/img.jpg</image:loc></image:image></url>'
+               f'<url><image:image><image:loc>https://ex.gov/first.jpg</image:loc></image:image>'
+               f'<loc>https://ex.gov/b</loc><xhtml:link rel="alternate" hreflang="fr" href="https://ex.gov/fr/b"/>'
+               f'<lastmod>2024-01-01</lastmod></url>'
+               f'<url><image:image><image:loc>https://ex.gov/orphan.jpg</image:loc></image:image></url>'
+               f'</urlset>').encode()
+    assert parse_sitemap(io.BytesIO(sitemap)) == ('urlset', ['https://ex.gov/a', 'https://ex.gov/b'])
+
+    index = sitemap_index([('https://ex.gov/sitemap-1.xml', '2024-01-01')]).replace(
+        b'</sitemap>', b'<loc xmlns="urn:other">https://ex.gov/other.xml</loc></sitemap>')
+    assert parse_sitemap(io.BytesIO(index)) == ('sitemapindex', [('https://ex.gov/sitemap-1.xml', '2024-01-01')])
+
+
+def test_index_with_gzip_children_in_document_order(sitemap_server):
+    publish_site(sitemap_server, ['2024-01-01'] * 4)
+
+    urls = SitemapLoader(workers=4, fetch=Fetcher()).load(f"{sitemap_server}/sitemap_index.xml")
+
+    assert urls == [f"{sitemap_server}/page/{child}-{page}" for child in range(4) for page in range(50)]
+
+
+def test_mirror_only_downloads_changed_children(tmp_path, sitemap_server):
+    publish_site(sitemap_server, ['2024-01-01'] * 4)
+    index = f"{sitemap_server}/sitemap_index.xml"
+    with SitemapMirror(str(tmp_path / 'mirror')) as mirror:
+        first = SitemapLoader(mirror=mirror, fetch=Fetcher()).load(index)
+
+    # Child 2 changes and says so in the index, child 3 changes its ETag only
+    publish_site(sitemap_server, ['2024-01-01', '2024-01-01', '2024-02-01', '2024-01-01'])
+    SitemapHandler.files['/sitemap-2.xml.gz'] = gzip.compress(urlset([f"{sitemap_server}/page/new"]))
+    SitemapHandler.versions['/sitemap_index.xml'] = 2
+    SitemapHandler.versions['/sitemap-2.xml.gz'] = 2
+    downloads = dict(SitemapHandler.downloads)
+    with SitemapMirror(str(tmp_path / 'mirror')) as mirror:
+        loader = SitemapLoader(mirror=mirror, fetch=Fetcher())
+        second = loader.load(index)
+
+    assert second == first[:100] + [f"{sitemap_server}/page/new"] + first[150:]
+    assert {path: count - downloads.get(path, 0) for path, count in SitemapHandler.downloads.items()} == \
+        {'/sitemap_index.xml': 1, '/sitemap-0.xml.gz': 0, '/sitemap-1.xml.gz': 0, '/sitemap-2.xml.gz': 1,
+         '/sitemap-3.xml.gz': 0}
+    assert loader.stats == {'downloaded': 2, 'not_modified': 0, 'skipped': 3, 'errors': 0}
+
+    # Nothing changed, the index answers 304 and every child is skipped
+    with SitemapMirror(str(tmp_path / 'mirror')) as mirror:
+        loader = SitemapLoader(mirror=mirror, fetch=Fetcher())
+        assert loader.load(index) == second
+    assert loader.stats == {'downloaded': 0, 'not_modified': 1, 'skipped': 4, 'errors': 0}
+
+
+def test_failed_child_is_skipped(tmp_path, sitemap_server):
+    publish_site(sitemap_server, ['2024-01-01'] * 2)
+    del SitemapHandler.files['/sitemap-1.xml.gz']
+    (tmp_path / 'index.xml').write_bytes(SitemapHandler.files['/sitemap_index.xml'])
+
+    loader = SitemapLoader(fetch=Fetcher(retries=0))
+    urls = loader.load(str(tmp_path / 'index.xml'))
+
+    assert urls == [f"{sitemap_server}/page/0-{page}" for page in range(50)]
+    assert loader.kind(str(tmp_path / 'index.xml')) == 'sitemapindex'
+    assert loader.stats['errors'] == 1
+
+
+def test_broken_bodies_are_retried_and_then_skipped(sitemap_server):
+    publish_site(sitemap_server, ['2024-01-01'] * 3)
+    SitemapHandler.broken = {'/sitemap-0.xml.gz': 1, '/sitemap-1.xml.gz': 5}
+    # Valid gzip header, corrupt deflate data
+    SitemapHandler.files['/sitemap-2.xml.gz'] = gzip.compress(urlset(['x']))[:10] + b'\xff' * 40
+
+    loader = SitemapLoader(fetch=Fetcher(retries=2, backoff=0.01))
+    urls = loader.load(f"{sitemap_server}/sitemap_index.xml")
+
+    assert urls == [f"{sitemap_server}/page/0-{page}" for page in range(50)]
+    assert SitemapHandler.downloads['/sitemap-0.xml.gz'] == 2
+    assert SitemapHandler.downloads['/sitemap-1.xml.gz'] == 3
+    assert SitemapHandler.downloads['/sitemap-2.xml.gz'] == 3
+    assert loader.stats['errors'] == 2
+
+
+def test_merge_refuses_an_index_with_failed_children(tmp_path, sitemap_server):
+    publish_site(sitemap_server, ['2024-01-01'] * 2)
+    del SitemapHandler.files['/sitemap-1.xml.gz']
+    (tmp_path / 'index.xml').write_bytes(SitemapHandler.files['/sitemap_index.xml'])
+    (tmp_path / 'new.csv').write_text(f"{sitemap_server}/page/new\n")
+    arguments = ['-x', str(tmp_path / 'index.xml'), '-c', str(tmp_path / 'new.csv'),
+                 '-o', str(tmp_path / 'combined.xml'), '--retries', '0']
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_command('merge', arguments)
+    assert exit_info.value.code and not (tmp_path / 'combined.xml').exists()
+
+    run_command('merge', arguments + ['--allow-partial'])
+    combined = (tmp_path / 'combined.xml').read_text()
+    assert combined.count('loc>http') == 51 and '/page/1-' not in combined
@@ -0,0 +1,82 @@
+#
+# Benchmark Startup
+#
+# Times how long each purple-sitemap command takes to start, by running `<command> --help`
+# in a fresh Python process, and lists the heavy modules it imported. The shell drivers
+# start these tools hundreds of times per run, so this is what a slow import costs.
+#
+# python benchmark-startup.py [--runs 10] [--max-ms 150]
+#
+# With --max-ms it exits with 1 when a command starts slower than that, or imports one of
+# the HEAVY modules just to print its help.
+#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, SCRIPT_DIR)
+from purple_sitemap.cli import COMMANDS  # noqa: E402
+
+# Modules that are only needed once a command makes requests or parses HTML
+HEAVY = ['requests', 'bs4', 'lxml', 'urllib.request', 'urllib.robotparser']
+
+IMPORTED = """
+import sys
+sys.argv = ['purple-sitemap', {command!r}, '--help']
+from purple_sitemap.cli import main
+try:
+    main()
+except SystemExit:
+    pass
+print(','.join(name for name in {heavy!r} if name in sys.modules), file=sys.stderr)
+"""
+
+
+def median_ms(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def heavy_imports(command):
+    result = subprocess.run([sys.executable, '-c', IMPORTED.format(command=command, heavy=HEAVY)],
+                            cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    lines = result.stderr.strip().splitlines()
+    return [name for name in lines[-1].split(',') if name] if lines else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the startup of each purple-sitemap command.')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command, the median is reported (default: 10)')
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail when a command takes longer than this to start')
+    parser.add_argument('commands', nargs='*', default=list(COMMANDS), help='Commands to time (default: all)')
+    args = parser.parse_args()
+
+    baseline = median_ms([sys.executable, '-c', 'pass'], args.runs)
+    print(f"{'python -c pass':<12} {baseline:7.1f} ms")
+
+    failed = False
+    for command in args.commands:
+        median = median_ms([sys.executable, os.path.join(SCRIPT_DIR, 'purple-sitemap'), command, '--help'], args.runs)
+        heavy = heavy_imports(command)
+        note = f"  imports {', '.join(heavy)}" if heavy else ''
+        print(f"{command:<12} {median:7.1f} ms{note}")
+        if args.max_ms is not None and (median > args.max_ms or heavy):
+            failed = True
+
+    if failed:
+        print(f"\nStartup slower than {args.max_ms} ms or heavy modules imported at startup", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#
+# Load Test
+#
+# Runs each network-bound purple-sitemap command against local fixture sites
+# (purple_sitemap/fixtures.py) with a fixed latency per response, and reports how many URLs
+# per second it gets through. Nothing leaves the machine, so the numbers can be compared
+# between runs, in CI and on air-gapped machines.
+#
+# python load-test.py [--pages 200] [--latency 0.01] [--output results.json]
+# python load-test.py --save-baseline baseline.json
+# python load-test.py --baseline baseline.json --tolerance 0.25
+#
+# The fixture sites are served over HTTPS with a self-signed certificate the commands trust
+# with --ca-bundle. Without openssl they are served over HTTP and verify, which only
+# requests https:// URLs, is skipped.
+#
+# With --baseline it exits with 1 when a command is slower than the baseline by more than
+# the tolerance.
+#
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, SCRIPT_DIR)
+from purple_sitemap.fixtures import FixtureServer, make_certificate  # noqa: E402
+
+
+def write_url_csv(path, urls):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows([url] for url in urls)
+
+
+def write_sitemap(path, urls):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for url in urls:
+            file.write(f'  <url><loc>{url}</loc></url>\n')
+        file.write('</urlset>\n')
+
+
+def scenarios(sites, directory, tls):
+    # Yields (command, arguments, number of URLs) for every command under test. `site` is a
+    # plain site, `redirects` lists its pages behind two redirects and rejects HEAD, `slow`
+    # answers four times slower.
+    site, redirects, slow = sites['site'], sites['redirects'], sites['slow']
+    urls = redirects.page_urls()
+
+    yield 'randomize', ['-u', f"{site.url}/sitemap.xml", '-n', str(site.pages), '-p', '50', '-f', 'csv',
+                        '-o', 'randomized.csv'], site.pages
+    yield 'crawl', ['-d', site.url], site.pages
+
+    write_url_csv(os.path.join(directory, 'urls.csv'), urls)
+    yield 'generate', ['-c', 'urls.csv', '-o', 'generated.xml'], len(urls)
+    if tls:
+        yield 'verify', ['-c', 'urls.csv', '-o', 'verified.csv'], len(urls)
+
+    write_sitemap(os.path.join(directory, 'update.xml'), urls)
+    yield 'update', ['-x', 'update.xml'], len(urls)
+
+    domains = [fixture.url for fixture in (site, redirects, slow)]
+    write_url_csv(os.path.join(directory, 'domain_source.csv'), domains)
+    yield 'discover', ['--schema', f"{site.url}/sitemap.xsd"], len(domains)
+
+
+def run_scenarios(sites, directory, tls, ca_bundle):
+    results = {}
+    for command, arguments, urls in scenarios(sites, directory, tls):
+        fetch_arguments = ['--ca-bundle', ca_bundle] if ca_bundle else []
+        requests_before = sum(site.requests() for site in sites.values())
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, 'purple-sitemap'), command,
+                                    *arguments, *fetch_arguments],
+                                   cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            print(completed.stderr)
+            raise SystemExit(f"{command} failed with exit code {completed.returncode}")
+        requests = sum(site.requests() for site in sites.values()) - requests_before
+        results[command] = {'urls': urls, 'requests': requests, 'seconds': round(seconds, 3),
+                            'urls_per_second': round(urls / seconds, 1)}
+        print(f"{command:<10} {urls:>6} URLs {requests:>6} requests {seconds:7.2f} s "
+              f"{results[command]['urls_per_second']:>8.1f} URLs/s")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    # Returns a list of regressions, a command regresses when it gets through fewer URLs per
+    # second than the baseline by more than the tolerance
+    regressions = []
+    for command, result in results['commands'].items():
+        expected = baseline.get('commands', {}).get(command)
+        if expected and result['urls_per_second'] < expected['urls_per_second'] * (1 - tolerance):
+            regressions.append(f"{command}: {result['urls_per_second']} URLs/s "
+                               f"(baseline {expected['urls_per_second']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the purple-sitemap commands against local fixture sites.')
+    parser.add_argument('--pages', type=int, default=200, help='Pages per fixture site (default: 200)')
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds every response is delayed (default: 0.01)')
+    parser.add_argument('--no-tls', action='store_true', help='Serve the fixture sites over HTTP, skips verify')
+    parser.add_argument('-o', '--output', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='Baseline JSON to compare against, exits 1 on regressions')
+    parser.add_argument('--save-baseline', default=None, help='Save the results as a new baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    parameters = {'pages': args.pages, 'latency': args.latency}
+    with tempfile.TemporaryDirectory(prefix='sitemap-load-') as directory:
+        certificate = None if args.no_tls else make_certificate(directory)
+        if certificate is None and not args.no_tls:
+            print("openssl not found, serving HTTP and skipping verify")
+        certfile, keyfile = certificate or (None, None)
+        options = {'pages': args.pages, 'certfile': certfile, 'keyfile': keyfile}
+        sites = {
+            'site': FixtureServer(latency=args.latency, **options),
+            'redirects': FixtureServer(latency=args.latency, redirects=2, head=False, **options),
+            'slow': FixtureServer(latency=args.latency * 4, **options),
+        }
+        for site in sites.values():
+            site.start()
+        try:
+            results = {'parameters': parameters, 'python': sys.version.split()[0],
+                       'commands': run_scenarios(sites, directory, certificate is not None, certfile)}
+        finally:
+            for site in sites.values():
+                site.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('parameters') != parameters:
+            print("Warning: baseline was recorded with different parameters")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
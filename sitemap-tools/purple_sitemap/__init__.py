@@ -0,0 +1,12 @@
+#
+# Purple Sitemap
+#
+# The sitemap tools as one package, run through `purple-sitemap <command>` or the scripts
+# next to this directory. Each command is a module with add_arguments(parser) and run(args)
+# that imports requests, BeautifulSoup and lxml only in the functions that use them, so
+# starting a command costs little more than starting Python.
+#
+# tool_metrics.py and sharding.py are copies of the ones in ../score-tools, so the package
+# does not depend on where it is run from. Change them there and copy them over, a test
+# checks that both stay the same.
+#
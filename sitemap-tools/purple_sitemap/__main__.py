@@ -0,0 +1,6 @@
+# python -m purple_sitemap <command> ...
+
+from purple_sitemap.cli import main
+
+if __name__ == '__main__':
+    main()
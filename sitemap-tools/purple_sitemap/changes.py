@@ -0,0 +1,127 @@
+#
+# Page Changes
+#
+# Local store of the ETag, Last-Modified and a normalized body hash of each page that
+# update_sitemap.py checked. The next check sends a conditional GET and compares the hash
+# with the one of the last confirmed scan of the page (update_sitemap.py --scanned), so the
+# tools can tell which pages changed since they were scanned and only rescan those. A page
+# stays changed until a scan of it is confirmed, however often it is checked.
+#
+
+import hashlib
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    final_url TEXT,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT,
+    checked_at TEXT,
+    changed_at TEXT,
+    scanned_hash TEXT
+);
+"""
+
+# Parts of a page that change on every request without the content changing
+VOLATILE = [
+    re.compile(r'<!--.*?-->', re.DOTALL),
+    re.compile(r'(<script\b[^>]*>).*?(</script>)', re.DOTALL | re.IGNORECASE),
+    re.compile(r'\snonce="[^"]*"', re.IGNORECASE),
+    re.compile(r'(<meta\s+name="csrf-token"\s+content=")[^"]*', re.IGNORECASE),
+    re.compile(r'(<input[^>]+name="(?:form_build_id|csrf_token|_token)"[^>]*value=")[^"]*', re.IGNORECASE),
+]
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_body(text):
+    # Inline scripts are dropped but script tags are kept, a new or removed script is a change
+    for pattern in VOLATILE:
+        text = pattern.sub(lambda match: ''.join(group or '' for group in match.groups()), text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def body_hash(text):
+    return hashlib.sha256(normalize_body(text).encode('utf-8')).hexdigest()
+
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ChangeStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        columns = {row['name'] for row in self.connection.execute('PRAGMA table_info(pages)')}
+        if 'scanned_hash' not in columns:
+            # Stores from before scans were confirmed, every page counts as changed once
+            self.connection.execute('ALTER TABLE pages ADD COLUMN scanned_hash TEXT')
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, url):
+        return self.connection.execute('SELECT * FROM pages WHERE url = ?', (url,)).fetchone()
+
+    def conditional_headers(self, url):
+        page = self.get(url)
+        headers = {}
+        if page is not None:
+            if page['etag']:
+                headers['If-None-Match'] = page['etag']
+            if page['last_modified']:
+                headers['If-Modified-Since'] = page['last_modified']
+        return headers
+
+    def not_modified(self, url):
+        # The server answered 304, the stored page is still current
+        with self.connection:
+            self.connection.execute('UPDATE pages SET checked_at = ? WHERE url = ?', (now(), url))
+        return self.get(url)
+
+    def record(self, url, response):
+        # Stores a full response and returns True when the page is new or its content differs
+        # from its last confirmed scan
+        page = self.get(url)
+        digest = body_hash(response.text)
+        checked_at = now()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO pages (url, final_url, content_type, etag, last_modified, body_hash, '
+                'checked_at, changed_at, scanned_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, response.url, response.headers.get('Content-Type', ''), response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), digest, checked_at,
+                 checked_at if page is None or page['body_hash'] != digest else page['changed_at'],
+                 page['scanned_hash'] if page is not None else None)
+            )
+        return self.changed(self.get(url))
+
+    @staticmethod
+    def changed(page):
+        # Whether the page as last checked was not scanned yet
+        return page['scanned_hash'] is None or page['scanned_hash'] != page['body_hash']
+
+    def mark_scanned(self, urls):
+        # The pages of urls, given by URL or final URL, were scanned as last checked. Returns the
+        # number of pages marked.
+        marked = 0
+        with self.connection:
+            for url in urls:
+                marked += self.connection.execute(
+                    'UPDATE pages SET scanned_hash = body_hash WHERE url = ? OR final_url = ?', (url, url)
+                ).rowcount
+        return marked
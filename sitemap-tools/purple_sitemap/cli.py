@@ -0,0 +1,122 @@
+#
+# Purple Sitemap CLI
+#
+# One entry point for all sitemap tools:
+#
+#   purple-sitemap discover
+#   purple-sitemap randomize -u https://example.gov/sitemap.xml -o sample.xml
+#   purple-sitemap crawl -d example.gov
+#   purple-sitemap verify -c urls.csv -o verified.csv
+#   purple-sitemap merge -x sitemap.xml -c new-urls.csv -o combined.xml
+#   purple-sitemap generate -c urls.csv -o sitemap.xml
+#   purple-sitemap update -x sitemap.xml
+#
+#   purple-sitemap batch commands.txt
+#
+# Only the module of the chosen command is imported. A batch file has one command per line,
+# e.g. "randomize -u https://example.gov/sitemap.xml -o example.xml", all run in this process
+# so Python starts once and the pooled connections are reused between commands. Blank lines
+# and lines starting with # are skipped, a failing command does not stop the batch.
+#
+
+import argparse
+import importlib
+import os
+import shlex
+import sys
+
+from purple_sitemap.tool_metrics import add_metrics_arguments, metrics_session
+
+# Command -> module in this package
+COMMANDS = {
+    'discover': 'discovery',
+    'randomize': 'randomizer',
+    'crawl': 'crawl',
+    'verify': 'verify',
+    'merge': 'merge',
+    'generate': 'generate',
+    'update': 'update',
+}
+
+USAGE = """usage: purple-sitemap <command> [options]
+       purple-sitemap batch FILE
+
+commands:
+  discover   find the sitemap of each domain in domain_source.csv
+  randomize  sample the URLs of a sitemap
+  crawl      crawl a site without a sitemap
+  verify     remove duplicate URLs and check that the others load
+  merge      add the URLs of a CSV file to a sitemap
+  generate   build a sitemap from a CSV list of URLs or domains
+  update     recheck the URLs of a sitemap
+  batch      run the commands in FILE, one per line, in this process
+
+Run purple-sitemap <command> --help for the options of a command."""
+
+
+def load_command(name):
+    return importlib.import_module(f'purple_sitemap.{COMMANDS[name]}')
+
+
+def build_parser(name, prog=None):
+    module = load_command(name)
+    parser = argparse.ArgumentParser(prog=prog or f'purple-sitemap {name}', description=module.DESCRIPTION)
+    module.add_arguments(parser)
+    add_metrics_arguments(parser)
+    return module, parser
+
+
+def run_command(name, argv, prog=None):
+    module, parser = build_parser(name, prog)
+    args = parser.parse_args(argv)
+    with metrics_session(args, module.TOOL):
+        module.run(args)
+
+
+def run_batch(path):
+    # Returns the number of commands that failed
+    failed = 0
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = [line.strip() for line in file]
+    for number, line in enumerate(lines, 1):
+        if not line or line.startswith('#'):
+            continue
+        name, *argv = shlex.split(line)
+        if name not in COMMANDS:
+            print(f"{path}:{number}: unknown command {name!r}", file=sys.stderr)
+            failed += 1
+            continue
+        try:
+            run_command(name, argv)
+        except SystemExit as e:
+            # argparse errors and --help end the command, not the batch
+            if e.code:
+                print(f"{path}:{number}: {name} exited with {e.code}", file=sys.stderr)
+                failed += 1
+        except Exception as e:
+            print(f"{path}:{number}: {name} failed: {e!r}", file=sys.stderr)
+            failed += 1
+    return failed
+
+
+def run_tool(name):
+    # Entry point of the scripts kept for the shell drivers, e.g. sitemap-randomizer.py
+    run_command(name, sys.argv[1:], prog=os.path.basename(sys.argv[0]))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(USAGE)
+        sys.exit(0 if argv else 2)
+
+    name, *argv = argv
+    if name == 'batch':
+        if len(argv) != 1:
+            print('usage: purple-sitemap batch FILE', file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if run_batch(argv[0]) else 0)
+    if name not in COMMANDS:
+        print(f"purple-sitemap: unknown command {name!r}\n\n{USAGE}", file=sys.stderr)
+        sys.exit(2)
+    run_command(name, argv)
@@ -0,0 +1,137 @@
+#
+# Crawl to Sitemap
+#
+# purple-sitemap crawl -d example.gov
+# Follows the links of a site that has no sitemap, within robots.txt, and writes the pages
+# found to {domain}_sitemap_{date}.xml.
+#
+
+from datetime import datetime
+from urllib.parse import urljoin, urlparse, urlunparse
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args, fetcher
+
+DESCRIPTION = 'Crawl a website and create a sitemap.'
+TOOL = 'crawl_to_sitemap'
+
+# robots.txt is read once per host, not once per URL
+robots_parsers = {}
+
+def can_fetch(url, user_agent='*'):
+    import requests
+    from urllib.robotparser import RobotFileParser
+
+    parsed_url = urlparse(url)
+    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+    rp = robots_parsers.get(robots_url)
+    if rp is None:
+        rp = RobotFileParser()
+        rp.set_url(robots_url)
+        try:
+            response = fetcher().get(robots_url)
+            # Same rules as RobotFileParser.read(), a robots.txt that cannot be read because
+            # of a server error, after the retries, disallows everything
+            if response.status_code in (401, 403) or response.status_code >= 500:
+                rp.disallow_all = True
+            elif 400 <= response.status_code < 500:
+                rp.allow_all = True
+            else:
+                rp.parse(response.text.splitlines())
+        except requests.RequestException:
+            # Neither is a host that cannot be reached at all
+            rp.disallow_all = True
+        robots_parsers[robots_url] = rp
+    return rp.can_fetch(user_agent, url)
+
+def get_links(url, domain):
+    import requests
+    from bs4 import BeautifulSoup
+
+    page_links = set()
+    try:
+        response = fetcher().get(url)
+        soup = BeautifulSoup(response.content, "html.parser")
+        for link in soup.find_all("a", href=True):
+            href = urljoin(url, link['href'])
+            if urlparse(href).netloc == domain:
+                page_links.add(normalize_url(href))
+    except requests.RequestException:
+        pass
+    return page_links
+
+def normalize_url(url):
+    parsed_url = urlparse(url)
+    return urlunparse((parsed_url.scheme, parsed_url.netloc, parsed_url.path, '', '', ''))
+
+def crawl_website(start_url):
+    domain = urlparse(start_url).netloc
+    visited_urls = set()
+    urls_to_visit = {start_url}
+    all_links = set()
+
+    while urls_to_visit:
+        current_url = urls_to_visit.pop()
+        with metrics.stage('robots'):
+            allowed = current_url not in visited_urls and can_fetch(current_url)
+        if allowed:
+            visited_urls.add(current_url)
+
+            # print(f"New URL found: {current_url}")  # Echo new URL to terminal
+
+            with metrics.stage('get_links'):
+                found_links = get_links(current_url, domain)
+            metrics.count('pages_crawled')
+            new_links = found_links - all_links
+            for link in new_links:
+                print(f"Adding new link to sitemap: {link}")  # Echo new link to terminal
+            all_links.update(new_links)
+            urls_to_visit.update(new_links - visited_urls)
+        else:
+            print(f"Duplicate or inaccessible URL skipped: {current_url}")  # Echo duplicate URL to terminal
+
+    return all_links
+
+def create_sitemap(urls, output_file):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url in urls:
+        if not url.endswith(('.pdf', '.xml', '.txt', '.json', '.doc', '.docx')):
+            lines.append(f'    <url><loc>{url}</loc></url>')
+
+    lines.append('</urlset>')
+
+    formatted_xml = '\n'.join(lines)
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(formatted_xml)
+    metrics.wrote_file(output_file)
+
+def format_xml(xml_content):
+    """Formats the XML string with proper indentation and line breaks."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for line in xml_content.splitlines():
+        if line.strip().startswith('<url>'):
+            lines.append('  ' + line.strip())
+        elif line.strip().startswith('<loc>'):
+            lines.append('    ' + line.strip())
+        elif line.strip().startswith('</url>'):
+            lines.append('  ' + line.strip())
+    lines.append('</urlset>')
+    return '\n'.join(lines)
+
+def crawl_domain(domain):
+    domain_name = domain if urlparse(domain).scheme else f"http://{domain}"
+    today_date = datetime.now().strftime('%Y%m%d')
+    # The host names the file, also when the domain is given as a URL
+    output_file = f"{urlparse(domain_name).netloc}_sitemap_{today_date}.xml"
+    urls = crawl_website(domain_name)
+    with metrics.stage('create_sitemap'):
+        create_sitemap(urls, output_file)
+    print(f"Sitemap for {domain} created as {output_file}")
+
+def add_arguments(parser):
+    parser.add_argument('-d', '--domain', required=True, help='Domain to crawl and create a sitemap for.')
+    add_fetch_arguments(parser)
+
+def run(args):
+    configure_from_args(args)
+    crawl_domain(args.domain)
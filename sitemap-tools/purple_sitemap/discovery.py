@@ -0,0 +1,127 @@
+#
+# Sitemap Discover
+#
+# purple-sitemap discover
+# Pulls a list of domain names from "domain_source.csv" and then saves successfully discovered sitemaps to "sitemap_extracts.csv"
+# and also includes a list of failures "sitemap_failures.csv" for manual inspection.
+#
+
+import csv
+import os
+from urllib.parse import urljoin, urlparse, urlunparse
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args, fetcher
+
+DESCRIPTION = 'Discover sitemaps for the domains in domain_source.csv.'
+TOOL = 'sitemap-discovery'
+
+SCHEMA_URL = "http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd"
+# Copy of the schema for machines without internet access, --schema bundled
+BUNDLED_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sitemap.xsd')
+
+# The schema is downloaded once per run rather than once per domain
+schema_source = SCHEMA_URL
+sitemap_schema = None
+
+def get_sitemap_schema():
+    from lxml import etree
+
+    global sitemap_schema
+    if sitemap_schema is None:
+        if urlparse(schema_source).scheme in ('http', 'https'):
+            response = fetcher().get(schema_source)
+            response.raise_for_status()
+            content = response.content
+        else:
+            with open(schema_source, 'rb') as file:
+                content = file.read()
+        sitemap_schema = etree.XMLSchema(etree.fromstring(content))
+    return sitemap_schema
+
+def is_valid_sitemap(xml_content):
+    import requests
+    from lxml import etree
+
+    try:
+        parser = etree.XMLParser(schema=get_sitemap_schema())
+        etree.fromstring(xml_content, parser)
+        return True
+    except (requests.RequestException, etree.XMLSyntaxError):
+        return False
+
+def get_valid_domains(domains):
+    import requests
+
+    valid_domains = set()
+    failed_domains = set()
+
+    for domain in domains:
+        try:
+            # Step 1: Check if the main page loads
+            with metrics.stage('fetch_home_page'):
+                response = fetcher().get(domain)
+            if response.status_code == 200:
+                # Step 2: Check for sitemap.xml
+                sitemap_url = urljoin(response.url, '/sitemap.xml')
+                with metrics.stage('fetch_sitemap'):
+                    sitemap_response = fetcher().get(sitemap_url)
+                with metrics.stage('validate_sitemap'):
+                    valid = sitemap_response.status_code == 200 and is_valid_sitemap(sitemap_response.content)
+                if valid:
+                    valid_domains.add(sitemap_url)
+                else:
+                    valid_domains.add(urlunparse(urlparse(response.url)._replace(path='', query='', fragment='')))
+                    failed_domains.add(domain)  # Add the main domain to failures if sitemap is not found or not valid
+
+        except requests.RequestException as e:
+            print(f"Error processing domain {domain}: {e}")
+            failed_domains.add(domain)
+
+    return valid_domains, failed_domains
+
+def read_domains_from_csv(file_path):
+    domains = set()
+    with open(file_path, 'r', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if row:  # Check if the row is not empty
+                metrics.count('rows_parsed')
+                domains.add(row[0])
+    metrics.read_file(file_path)
+    return domains
+
+def write_domains_to_csv(file_path, domains):
+    with open(file_path, 'w', encoding='utf-8', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for domain in domains:
+            writer.writerow([domain])
+    metrics.wrote_file(file_path)
+
+def discover_sitemaps():
+    input_domains = read_domains_from_csv("domain_source.csv")
+    unique_valid_domains, failed_domains = get_valid_domains(input_domains)
+
+    write_domains_to_csv("sitemap_extracts.csv", unique_valid_domains)
+    write_domains_to_csv("sitemap_failures.csv", failed_domains)
+
+    print("Domains with sitemaps:")
+    for domain in unique_valid_domains:
+        print(domain)
+
+    print("\nDomains without sitemaps:")
+    for domain in failed_domains:
+        print(domain)
+
+def add_arguments(parser):
+    parser.add_argument('--schema', default=SCHEMA_URL,
+                        help=f'URL or file of the sitemap schema, "bundled" for the copy in purple_sitemap (default: {SCHEMA_URL})')
+    add_fetch_arguments(parser)
+
+def run(args):
+    global schema_source, sitemap_schema
+    configure_from_args(args)
+    source = BUNDLED_SCHEMA if args.schema == 'bundled' else args.schema
+    if source != schema_source:
+        schema_source, sitemap_schema = source, None
+    discover_sitemaps()
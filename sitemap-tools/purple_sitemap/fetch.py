@@ -0,0 +1,300 @@
+#
+# Fetch
+#
+# Shared HTTP layer for the sitemap tools. All requests go through one pooled keep-alive
+# requests.Session with a global timeout, a per-host concurrency limit, an optional
+# per-host token-bucket rate limit, and jittered retries on connection errors, 429 and 5xx
+# responses that honour Retry-After. Bodies streamed with read() are retried the same way
+# when they break off half way.
+#
+#   from purple_sitemap.fetch import fetcher
+#   response = fetcher().get(url, allow_redirects=True)
+#   kind, items = fetcher().read(url, lambda response: parse_sitemap(response.raw))
+#
+# requests is only imported when the first request is made.
+#
+
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# Answers of servers that do not allow HEAD requests
+HEAD_REJECTED_STATUSES = {405, 501}
+MAX_REDIRECTS = 10
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 60
+DEFAULT_PER_HOST = 4
+USER_AGENT = 'purple-a11y-sitemap-tools'
+
+
+class TokenBucket:
+    # Allows `rate` requests per second on average with bursts of up to `capacity`
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after_seconds(response):
+    # Retry-After is either a number of seconds or an HTTP date
+    from email.utils import parsedate_to_datetime
+
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class Fetcher:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=MAX_BACKOFF, per_host=DEFAULT_PER_HOST, rate_limit=None, pool_size=None,
+                 user_agent=USER_AGENT, verify=True):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self.rate_limit = rate_limit
+        self.verify = verify
+
+        self.session = requests.Session()
+        # Retries are done here so Retry-After and the rate limit apply to them
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size or max(10, per_host), max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = user_agent
+        self.session.verify = verify
+
+        self.lock = threading.Lock()
+        self.host_slots = {}
+        self.host_buckets = {}
+        self.stats = defaultdict(int)
+
+    def close(self):
+        self.session.close()
+
+    def _host_limits(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+                if self.rate_limit:
+                    self.host_buckets[host] = TokenBucket(self.rate_limit)
+            return self.host_slots[host], self.host_buckets.get(host)
+
+    def _delay(self, attempt, response=None):
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        # Full jitter spreads out retries from many workers hitting the same host
+        return random.uniform(0, delay)
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        kwargs.setdefault('timeout', self.timeout)
+        if self.verify is not True:
+            # requests prefers REQUESTS_CA_BUNDLE over Session.verify, a given CA bundle must win
+            kwargs.setdefault('verify', self.verify)
+        slot, bucket = self._host_limits(url)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            with slot:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= self.retries:
+                        raise
+                    self.stats['retries'] += 1
+                    delay = self._delay(attempt)
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                        self.stats['requests'] += 1
+                        return response
+                    self.stats['retries'] += 1
+                    delay = self._delay(attempt, response)
+                    response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def read(self, url, reader, **kwargs):
+        # Streams a GET of url and returns reader(response). A body that breaks off, times out
+        # or does not decompress is retried like a failed connection, and raised as a
+        # requests.ConnectionError once the retries are used up.
+        import zlib
+        import requests
+        from gzip import BadGzipFile
+        from urllib3.exceptions import HTTPError
+
+        attempt = 0
+        while True:
+            response = self.get(url, stream=True, **kwargs)
+            try:
+                return reader(response)
+            except (HTTPError, requests.ConnectionError, requests.Timeout, zlib.error, BadGzipFile, EOFError) as e:
+                if attempt >= self.retries:
+                    raise requests.ConnectionError(f"Reading {url} failed: {e}") from e
+            finally:
+                response.close()
+            self.stats['retries'] += 1
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+
+class RedirectResolver:
+    # Follows redirects one hop at a time and remembers every hop, so chains that meet, like
+    # http://x, http://www.x and https://x all ending at https://www.x, are only walked once.
+    # Hosts that reject HEAD are asked with GET instead, without reading the body.
+    def __init__(self, method='HEAD', max_redirects=MAX_REDIRECTS, fetch=None):
+        self.method = method
+        self.max_redirects = max_redirects
+        self.fetch = fetch
+        self.hops = {}      # url -> (next url, status) for every redirect seen
+        self.resolved = {}  # url -> (final url, final status) of every resolution that got an answer
+        self.get_hosts = set()  # hosts that answered HEAD with 405 or 501
+        self.lock = threading.Lock()
+
+    def _request(self, url):
+        fetch = self.fetch or fetcher()
+        host = urlparse(url).netloc
+        if self.method == 'HEAD' and host not in self.get_hosts:
+            response = fetch.head(url, allow_redirects=False)
+            if response.status_code not in HEAD_REJECTED_STATUSES:
+                return response
+            response.close()
+            with self.lock:
+                self.get_hosts.add(host)
+        return fetch.get(url, allow_redirects=False, stream=True)
+
+    def resolve(self, url):
+        import requests
+
+        chain = []
+        current = url
+        while True:
+            with self.lock:
+                known = self.resolved.get(current)
+            if known is not None:
+                result = known
+                break
+            if len(chain) > self.max_redirects:
+                result = (None, None)
+                break
+            try:
+                response = self._request(current)
+            except requests.RequestException:
+                result = (None, None)
+                chain.append(current)
+                break
+            location = response.headers.get('Location')
+            response.close()
+            if response.status_code in REDIRECT_STATUSES and location:
+                next_url = urljoin(current, location)
+                with self.lock:
+                    self.hops[current] = (next_url, response.status_code)
+                chain.append(current)
+                current = next_url
+                continue
+            result = (current, response.status_code)
+            chain.append(current)
+            break
+
+        if result[0] is not None:
+            # Errors are not remembered, the next resolve() of these URLs asks again
+            with self.lock:
+                for hop in chain:
+                    self.resolved[hop] = result
+        return result
+
+    def chain(self, url):
+        # The recorded hops from url, as a list of (from, to, status)
+        hops = []
+        while url in self.hops and len(hops) <= self.max_redirects:
+            next_url, status = self.hops[url]
+            hops.append((url, next_url, status))
+            url = next_url
+        return hops
+
+
+_fetcher = None
+_fetcher_options = {}
+_fetcher_lock = threading.Lock()
+
+
+def fetcher():
+    # The shared Fetcher of this process, created with the configured options on first use
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher(**_fetcher_options)
+        return _fetcher
+
+
+def configure(**options):
+    # Sets the options of the shared Fetcher, e.g. configure(timeout=5, rate_limit=2). It is
+    # created on the first request, so commands that make none never import requests. The
+    # pooled connections are kept when the options did not change, e.g. between batch commands.
+    global _fetcher, _fetcher_options
+    with _fetcher_lock:
+        if options == _fetcher_options:
+            return
+        if _fetcher is not None:
+            _fetcher.close()
+            _fetcher = None
+        _fetcher_options = options
+
+
+def add_fetch_arguments(parser):
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help=f'HTTP timeout in seconds (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help=f'Retries on connection errors, 429 and 5xx (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--max-per-host', type=int, default=DEFAULT_PER_HOST, help=f'Concurrent requests per host (default: {DEFAULT_PER_HOST})')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Requests per second per host (default: no limit)')
+    parser.add_argument('--ca-bundle', default=None, help='CA certificates to verify HTTPS servers with, e.g. of a local fixture server (default: the system ones)')
+
+
+def configure_from_args(args):
+    configure(timeout=args.timeout, retries=args.retries, per_host=args.max_per_host,
+              rate_limit=args.rate_limit, verify=args.ca_bundle or True)
@@ -0,0 +1,273 @@
+#
+# Fixtures
+#
+# A local HTTP server with a synthetic site, so the sitemap tools can be tested and
+# load-tested without internet access. The site has:
+#
+#   /                       home page, links to /page/0
+#   /page/N                 pages linking to their children, /private/N and an external site
+#   /private/N              pages robots.txt disallows
+#   /robots.txt             Disallow: /private/
+#   /sitemap.xml            sitemap index of gzipped nested indexes and sitemaps under /sitemaps/,
+#                           with sitemaps=0 a plain sitemap of all pages
+#   /redirect/K/page/N      K redirects before /page/N, what the sitemaps list with redirects=K
+#   /sitemap.xsd            the sitemap schema, for purple-sitemap discover --schema
+#
+# Every response waits `latency` seconds first. With head=False HEAD requests get 405, and
+# with a certificate the server speaks HTTPS, the tools trust it with --ca-bundle. Sitemaps
+# have an ETag, so conditional GETs get 304.
+#
+#   with FixtureServer(pages=1000, latency=0.02) as site:
+#       urls = SitemapLoader().load(f"{site.url}/sitemap.xml")
+#
+# python -m purple_sitemap.fixtures --pages 1000 --latency 0.02 --port 8000
+#
+
+import gzip
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sitemap.xsd')
+ROBOTS_TXT = 'User-agent: *\nDisallow: /private/\n'
+EXTERNAL_LINK = 'https://www.example.org/'
+
+
+def chunks(items, count):
+    # Splits items into count contiguous parts of about the same size, none of them empty
+    count = max(1, min(count, len(items)))
+    size, extra = divmod(len(items), count)
+    start = 0
+    for part in range(count):
+        end = start + size + (1 if part < extra else 0)
+        yield items[start:end]
+        start = end
+
+
+def make_certificate(directory, host='127.0.0.1'):
+    # Writes a self-signed certificate for host with openssl, returns (certfile, keyfile) or
+    # None when openssl is not installed. The certificate is also the CA bundle to trust it.
+    if shutil.which('openssl') is None:
+        return None
+    certfile = os.path.join(directory, 'fixture-cert.pem')
+    keyfile = os.path.join(directory, 'fixture-key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+                    '-keyout', keyfile, '-out', certfile, '-subj', f'/CN={host}',
+                    '-addext', f'subjectAltName=IP:{host}'],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, with Nagle every keep-alive response would wait
+    # for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        site = self.server.fixture
+        site.hit(self.path)
+        if site.latency:
+            time.sleep(site.latency)
+        if self.command == 'HEAD' and not site.head:
+            self.respond(405, b'', {'Allow': 'GET'})
+            return
+        self.respond(*site.route(self.path, self.headers))
+
+    do_HEAD = do_GET
+
+    def respond(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    def __init__(self, pages=100, links=5, sitemaps=4, indexes=2, redirects=0, latency=0.0, head=True,
+                 lastmod='2024-01-01', port=0, certfile=None, keyfile=None):
+        self.pages = pages
+        self.links = links
+        self.sitemaps = sitemaps
+        self.indexes = indexes
+        self.redirects = redirects
+        self.latency = latency
+        self.head = head
+        self.lastmod = lastmod
+        self.port = port
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.server = None
+        self.files = {}  # sitemap path -> body, built on start() once the port is known
+        self.hits = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        scheme = 'https' if self.certfile else 'http'
+        return f"{scheme}://127.0.0.1:{self.server.server_address[1]}"
+
+    def page_url(self, number):
+        # The URL of a page as the sitemaps list it, behind the redirects
+        if self.redirects:
+            return f"{self.url}/redirect/{self.redirects}/page/{number}"
+        return f"{self.url}/page/{number}"
+
+    def page_urls(self):
+        return [self.page_url(number) for number in range(self.pages)]
+
+    def hit(self, path):
+        with self.lock:
+            self.hits[path.partition('?')[0]] += 1
+
+    def requests(self):
+        with self.lock:
+            return sum(self.hits.values())
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), FixtureHandler)
+        self.server.fixture = self
+        if self.certfile:
+            import ssl
+
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self._build_sitemaps()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _build_sitemaps(self):
+        # /sitemap.xml lists the nested indexes, each lists some of the gzipped sitemaps
+        if not self.sitemaps:
+            self.files['/sitemap.xml'] = self._urlset(self.page_urls())
+            return
+        sitemaps = []
+        for number, urls in enumerate(chunks(self.page_urls(), self.sitemaps)):
+            path = f"/sitemaps/sitemap-{number}.xml.gz"
+            self.files[path] = gzip.compress(self._urlset(urls))
+            sitemaps.append(path)
+
+        children = sitemaps
+        if self.indexes:
+            children = []
+            for number, paths in enumerate(chunks(sitemaps, self.indexes)):
+                path = f"/sitemaps/index-{number}.xml.gz"
+                self.files[path] = gzip.compress(self._index(paths))
+                children.append(path)
+        self.files['/sitemap.xml'] = self._index(children)
+
+    def _urlset(self, urls):
+        entries = ''.join(f"<url><loc>{url}</loc><lastmod>{self.lastmod}</lastmod></url>" for url in urls)
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="{SITEMAP_NS}">{entries}</urlset>').encode('utf-8')
+
+    def _index(self, paths):
+        entries = ''.join(f"<sitemap><loc>{self.url}{path}</loc><lastmod>{self.lastmod}</lastmod></sitemap>"
+                          for path in paths)
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="{SITEMAP_NS}">{entries}</sitemapindex>').encode('utf-8')
+
+    def _page(self, path, links):
+        anchors = ''.join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+        return (f'<!DOCTYPE html><html lang="en"><head><title>{path}</title></head>'
+                f'<body><header><a href="/">Home</a></header><main><h1>{path}</h1><ul>{anchors}</ul></main>'
+                f'</body></html>').encode('utf-8')
+
+    def route(self, path, headers):
+        # Returns (status, body, headers) for a GET of path
+        path = path.partition('?')[0]
+        html = {'Content-Type': 'text/html; charset=utf-8'}
+        parts = path.strip('/').split('/')
+
+        if path in self.files:
+            etag = f'"{self.lastmod}"'
+            if headers.get('If-None-Match') == etag:
+                return 304, b'', {'ETag': etag}
+            content_type = 'application/x-gzip' if path.endswith('.gz') else 'application/xml'
+            return 200, self.files[path], {'Content-Type': content_type, 'ETag': etag}
+        if path == '/robots.txt':
+            return 200, ROBOTS_TXT.encode('utf-8'), {'Content-Type': 'text/plain'}
+        if path == '/sitemap.xsd':
+            with open(SCHEMA_FILE, 'rb') as file:
+                return 200, file.read(), {'Content-Type': 'application/xml'}
+        if path == '/':
+            return 200, self._page(path, ['/page/0', '/private/home', EXTERNAL_LINK]), html
+        if len(parts) >= 3 and parts[0] == 'redirect' and parts[1].isdigit():
+            hops = int(parts[1]) - 1
+            rest = '/'.join(parts[2:])
+            location = f"/redirect/{hops}/{rest}" if hops > 0 else f"/{rest}"
+            return 301, b'', {'Location': location}
+        if len(parts) == 2 and parts[0] == 'private':
+            return 200, self._page(path, ['/']), html
+        if len(parts) == 2 and parts[0] == 'page' and parts[1].isdigit() and int(parts[1]) < self.pages:
+            # Each page links to the next ones, so a crawl from the home page finds all of them
+            number = int(parts[1])
+            children = range(number * self.links + 1, min((number + 1) * self.links + 1, self.pages))
+            links = [f"/page/{child}" for child in children] + [f"/private/{number}", '/', EXTERNAL_LINK]
+            return 200, self._page(path, links), html
+        return 404, b'Not found', {'Content-Type': 'text/plain'}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve a synthetic site for testing the sitemap tools.')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on, 0 for any free port (default: 8000)')
+    parser.add_argument('--pages', type=int, default=1000, help='Pages of the site (default: 1000)')
+    parser.add_argument('--links', type=int, default=5, help='Links from each page to other pages (default: 5)')
+    parser.add_argument('--sitemaps', type=int, default=4, help='Gzipped sitemaps listing the pages, 0 for a plain /sitemap.xml (default: 4)')
+    parser.add_argument('--indexes', type=int, default=2, help='Nested sitemap indexes between /sitemap.xml and the sitemaps, 0 for none (default: 2)')
+    parser.add_argument('--redirects', type=int, default=0, help='Redirects in front of each page the sitemaps list (default: 0)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every response is delayed (default: 0)')
+    parser.add_argument('--no-head', action='store_true', help='Answer HEAD requests with 405')
+    parser.add_argument('--tls', default=None, metavar='DIR', help='Serve HTTPS with a self-signed certificate written to this directory')
+    args = parser.parse_args()
+
+    certfile = keyfile = None
+    if args.tls:
+        os.makedirs(args.tls, exist_ok=True)
+        certificate = make_certificate(args.tls)
+        if certificate is None:
+            parser.error('--tls needs openssl to create the certificate')
+        certfile, keyfile = certificate
+
+    site = FixtureServer(pages=args.pages, links=args.links, sitemaps=args.sitemaps, indexes=args.indexes,
+                         redirects=args.redirects, latency=args.latency, head=not args.no_head, port=args.port,
+                         certfile=certfile, keyfile=keyfile)
+    with site:
+        print(f"Serving {args.pages} pages at {site.url}, sitemap {site.url}/sitemap.xml")
+        if certfile:
+            print(f"Trust it with --ca-bundle {certfile}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"Stopped after {site.requests()} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#
+# Generate CSV to Sitemap
+#
+# purple-sitemap generate -c urls.csv -o sitemap.xml
+# Turns a CSV list of URLs or bare domains into a sitemap of the URLs that load, trying
+# https://www., https://, http://www. and http:// for entries without a scheme.
+#
+
+import csv
+from collections import Counter
+from urllib.parse import urlparse
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import RedirectResolver, add_fetch_arguments, configure_from_args
+
+DESCRIPTION = 'Verify URLs and generate sitemap.xml.'
+TOOL = 'generate_csv_to_sitemap'
+
+# Define a global count variable to keep track of checked URLs
+url_check_count = 0
+
+# Define a list to store failed URLs
+failed_urls = []
+
+# Dictionary to store the final URLs after following redirects
+final_urls = {}
+
+# Every redirect hop seen so far, shared by all probes so chains are only walked once
+redirects = RedirectResolver()
+
+# Canonical origin (scheme and host after redirects) of each domain that was probed successfully
+canonical_origins = {}
+
+def is_valid_url(url):
+    global url_check_count  # Declare the global count variable
+
+    url_check_count += 1  # Increment the count for each URL checked
+    print(f"Checking URL {url_check_count}: {url}")
+
+    final_url, status = redirects.resolve(url)  # Follow redirects
+    if final_url is None:
+        print(f"Error checking URL {url}")
+        return False
+    if status == 200:
+        # Store the final URL after following redirects
+        final_urls[url] = final_url
+        if url != final_url:
+            print(f"Redirect: {url} -> {final_url}")  # Print the redirect
+        return True
+    return False
+
+def resolve_path(origin, path):
+    # The final URL of a path under a probed origin, so path redirects like /old -> /new
+    # are listed where they end. Paths that do not load are left for is_valid_url to drop.
+    url = origin + '/' + path
+    if is_valid_url(url):
+        return final_urls[url]
+    return url
+
+def preprocess_url(url):
+    # print(f"preprocess_url? {url}")
+    if urlparse(url).scheme in ('http', 'https'):
+        return url
+
+    domain, slash, path = url.partition('/')
+    domain = domain.lower()
+    if domain in canonical_origins:
+        # Paths under a domain that was already resolved skip probing the prefixes
+        return resolve_path(canonical_origins[domain], path)
+    
+    # List of URL prefixes to try
+    url_prefixes = ["https://www.", "https://", "http://www.", "http://"]
+    
+    for prefix in url_prefixes:
+        modified_url = prefix + domain + '/'
+        if is_valid_url(modified_url):
+            final = urlparse(final_urls[modified_url])
+            canonical_origins[domain] = f"{final.scheme}://{final.netloc}"
+            if not path:
+                return final_urls[modified_url]  # Return the final URL after redirects
+            return resolve_path(canonical_origins[domain], path)
+        elif modified_url not in failed_urls:
+            failed_urls.append(modified_url)  # Add failed URL to the list
+    
+    # Not cached, the next path of this domain probes again. Without a scheme the URL
+    # could never be checked or listed, so assume https.
+    return "https://" + domain + slash + path
+
+def read_csv(csv_file):
+    print(f"read_csv? {csv_file}")
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        urls = [row[0].strip() for row in reader]
+    metrics.read_file(csv_file)
+    metrics.count('rows_parsed', len(urls))
+    return urls
+
+def generate_sitemap(urls, output_file):
+    from xml.etree import ElementTree as ET
+
+    print(f"generate_sitemap? {urls}")
+    root = ET.Element("urlset", xmlns="http://www.sitemaps.org/schemas/sitemap/0.9")
+    
+    for url in urls:
+        # Check for ".pdf" or ".xml" in the URL and skip if found
+        if ".pdf" in url or ".xml" in url:
+            print(f"Skipping URL with '.pdf' or '.xml': {url}")
+            continue
+        
+        url_element = ET.SubElement(root, "url")
+        loc_element = ET.SubElement(url_element, "loc")
+        loc_element.text = url
+    
+    # Use minidom to pretty-print the XML with line breaks
+    from xml.dom import minidom
+    xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
+
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(xml_str)
+    metrics.wrote_file(output_file)
+
+def check_duplicates(output_file):
+    with open(output_file, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+        url_counts = Counter(lines)
+    
+    duplicate_urls = [url for url, count in url_counts.items() if count > 1]
+    if duplicate_urls:
+        print("\nDuplicate URLs found in the output file:")
+        for url in duplicate_urls:
+            print(url.strip())
+
+def add_arguments(parser):
+    parser.add_argument('-c', '--csv_file', required=True, help='Path to the CSV file containing URLs.')
+    parser.add_argument('-o', '--output_file', required=True, help='Path to the output sitemap.xml file.')
+    add_fetch_arguments(parser)
+
+def run(args):
+    global url_check_count
+
+    configure_from_args(args)
+    # Within a batch the redirects and canonical origins stay cached for the next command
+    url_check_count = 0
+    failed_urls.clear()
+    generate_csv_to_sitemap(args)
+
+def generate_csv_to_sitemap(args):
+    with metrics.stage('preprocess_url'):
+        urls = [preprocess_url(url) for url in read_csv(args.csv_file)]
+    with metrics.stage('is_valid_url'):
+        valid_urls = [url for url in urls if is_valid_url(url)]
+
+    if not valid_urls:
+        print("No valid URLs found. Exiting.")
+        return
+
+    with metrics.stage('generate_sitemap'):
+        generate_sitemap(valid_urls, args.output_file)
+    print(f"Sitemap generated with {len(valid_urls)} valid URLs. Saved to {args.output_file}")
+
+    # Print failed URLs
+    if failed_urls:
+        print("\nFailed to load URLs:")
+        for failed_url in failed_urls:
+            print(failed_url)
+
+    # Check for duplicates in the output file
+    check_duplicates(args.output_file)
@@ -0,0 +1,95 @@
+#
+# Sitemap Randomizer Add CSV
+#
+# purple-sitemap merge -x sitemap.xml -c new-urls.csv -o combined.xml
+# Adds the URLs of a CSV file that are not in a sitemap yet to it. A sitemap index is replaced
+# by a sitemap of the pages of its children.
+#
+
+import sys
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args
+from purple_sitemap.sitemaps import add_sitemap_arguments, sitemap_loader
+
+DESCRIPTION = 'Combine existing sitemap.xml with new URLs from a CSV file.'
+TOOL = 'sitemap-randomizer-add-csv'
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+def read_xml(xml_file, args=None):
+    from xml.etree import ElementTree as ET
+
+    metrics.read_file(xml_file)
+    tree = ET.parse(xml_file)
+    root = tree.getroot()
+    if root.tag == f'{{{SITEMAP_NS}}}sitemapindex':
+        # The new URLs are added to a sitemap of the pages of all children of the index
+        with sitemap_loader(args) as loader:
+            urls = loader.load(xml_file)
+        if loader.stats['errors'] and not getattr(args, 'allow_partial', False):
+            # Same as update, a merge without the pages of the failed children would drop them
+            sys.exit(f"Could not read {loader.stats['errors']} sitemaps of {xml_file}, nothing was written. "
+                     f"Use --allow-partial to merge the others anyway.")
+        root = ET.Element(f'{{{SITEMAP_NS}}}urlset')
+        for url in urls:
+            ET.SubElement(ET.SubElement(root, f'{{{SITEMAP_NS}}}url'), f'{{{SITEMAP_NS}}}loc').text = url
+    return root
+
+def read_csv(csv_file):
+    metrics.read_file(csv_file)
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        urls = [line.strip() for line in file.read().splitlines()]
+    metrics.count('rows_parsed', len(urls))
+    return urls
+
+def append_urls_to_sitemap(xml_root, new_urls):
+    from xml.etree import ElementTree as ET
+
+    for new_url in new_urls:
+        if new_url not in [loc.text for loc in xml_root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc")]:
+            url_element = ET.SubElement(xml_root, "url")
+            loc_element = ET.SubElement(url_element, "loc")
+            loc_element.text = new_url
+
+def write_sitemap(output_file, xml_root):
+    import xml.dom.minidom
+    from xml.etree import ElementTree as ET
+
+    tree = ET.ElementTree(xml_root)
+
+    # Convert the ElementTree to a string and then parse it with minidom for pretty printing
+    xml_string = ET.tostring(tree.getroot(), encoding='unicode')
+    dom = xml.dom.minidom.parseString(xml_string)
+
+    # Get the pretty printed string with proper indentation and line breaks
+    pretty_xml_as_string = dom.toprettyxml(indent="    ")
+
+    # Write the pretty printed XML to the file
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(pretty_xml_as_string)
+    metrics.wrote_file(output_file)
+
+def combine_xml_csv(xml_sitemap, new_csv, output_file, args=None):
+    with metrics.stage('read'):
+        xml_root = read_xml(xml_sitemap, args)
+        new_urls = read_csv(new_csv)
+    with metrics.stage('append_urls'):
+        append_urls_to_sitemap(xml_root, new_urls)
+    with metrics.stage('write_sitemap'):
+        write_sitemap(output_file, xml_root)
+
+def add_arguments(parser):
+    parser.add_argument('-x', '--xml_sitemap', required=True, help='Path to the existing sitemap.xml file.')
+    parser.add_argument('-c', '--new_csv', required=True, help='Path to the CSV file containing new URLs.')
+    parser.add_argument('-o', '--output_file', required=True, help='Path to the output sitemap.xml file.')
+    # Only used when the sitemap is an index
+    parser.add_argument('--allow-partial', action='store_true',
+                        help='Merge the children of a sitemap index that could be read when others fail')
+    add_sitemap_arguments(parser)
+    add_fetch_arguments(parser)
+
+def run(args):
+    configure_from_args(args)
+    combine_xml_csv(args.xml_sitemap, args.new_csv, args.output_file, args)
+    print(f"Combined sitemap saved to {args.output_file}")
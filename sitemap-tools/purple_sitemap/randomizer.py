@@ -0,0 +1,117 @@
+#
+# Sitemap Randomizer
+# 
+# Run this command with some basic parameters. -u URL, -n number of urls, -f format for exported file. 
+# purple-sitemap randomize -u https://whitehouse.gov/sitemap.xml -n 2000 -f xml
+#
+
+import csv
+import hashlib
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.sharding import add_shard_argument, in_shard
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args
+from purple_sitemap.sitemaps import add_sitemap_arguments, sitemap_loader
+
+DESCRIPTION = 'Randomize and filter URLs from a sitemap.'
+TOOL = 'sitemap-randomizer'
+
+def get_sitemap_urls(url, args):
+    # Follows sitemap indexes, their children are downloaded concurrently and with --mirror
+    # only when they changed
+    with sitemap_loader(args) as loader:
+        urls = loader.load(url)
+    if loader.mirror:
+        print(f"Sitemaps: {loader.stats['downloaded']} downloaded, {loader.stats['not_modified']} not modified, "
+              f"{loader.stats['skipped']} unchanged according to lastmod")
+    return urls
+
+def filter_and_randomize_urls(urls, exclude_strings, include_strings, percentage):
+    excluded_extensions = ['pdf', 'zip', 'txt', 'pptx', '.pdf', '.pdf-0', '.doc', '.docx-0', '.docx', '.docx-0', '.xls', '.xls-0', '.xlsx', '.xlsx-0', '.ppt', '.ppt-0', '.pptx', '.pptx-0', '.rss', '.xml', '.zip', '.zip-0', '.zip-1', '.txt']
+
+    # Filter URLs based on excluded extensions and strings
+    filtered_urls = [
+        url for url in urls
+        if not any(url.endswith(ext) for ext in excluded_extensions) and not any(es in url for es in exclude_strings)
+    ]
+
+
+    # Include URLs that match the specified strings
+    if include_strings:
+        filtered_urls = [url for url in filtered_urls if any(es in url for es in include_strings)]
+
+    # Filter URLs based on the hash percentage
+    percent_range = int(percentage / 10)
+    allowed_starts = [str(i) for i in range(percent_range)]
+
+    def get_hash(url):
+        return hashlib.md5(url.encode()).hexdigest()
+
+    filtered_by_hash = [
+        url for url in filtered_urls
+        if get_hash(url)[0] in allowed_starts
+    ]
+    
+    return filtered_by_hash
+
+def get_hash(url):
+    hash_object = hashlib.md5(url.encode())
+    return hash_object.hexdigest()
+
+# Using the hash is a good way to ensure that mostly the same URLs are being scanned. 
+# Unlike a random script, this will consistently pull up mostly the same results, 
+# and they will be random
+def filter_by_hash_percentage(hashed_urls, percentage):
+    max_first_digit = percentage // 10
+    return [url for url, hash_value in hashed_urls if int(hash_value[0], 16) < max_first_digit]
+
+
+def save_urls_to_xml(urls, filename):
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for url in urls:
+            file.write(f'  <url><loc>{url}</loc></url>\n')
+        file.write('</urlset>\n')
+
+def save_urls_to_csv(urls, filename):
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        for url in urls:
+            writer.writerow([url])
+
+def add_arguments(parser):
+    parser.add_argument('-u', '--url', required=True, help='The URL of the sitemap.')
+    parser.add_argument('-n', '--number', type=int, default=2000, help='The number of URLs to retrieve (default: 2000).')
+    parser.add_argument('-e', '--exclude', nargs='+', default=[], help='Strings to exclude from URLs.')
+    parser.add_argument('-i', '--include', nargs='+', default=[], help='Strings to force inclusion from URLs.')
+    parser.add_argument('-f', '--format', choices=['xml', 'csv'], default='xml', help='Output format (default: xml).')
+    parser.add_argument('-o', '--output', required=True, help='Output filename with path.')
+    parser.add_argument('-p', '--percentage', type=int, choices=[10, 20, 30, 40, 50], default=10, help='Percentage of URLs to return (default: 10).')
+    add_shard_argument(parser)
+    add_sitemap_arguments(parser)
+    add_fetch_arguments(parser)
+
+def run(args):
+    configure_from_args(args)
+    randomize_sitemap(args)
+
+def randomize_sitemap(args):
+    with metrics.stage('get_sitemap_urls'):
+        urls = get_sitemap_urls(args.url, args)
+    with metrics.stage('filter_and_randomize_urls'):
+        filtered_urls = filter_and_randomize_urls(urls, args.exclude, args.include, args.percentage)[:args.number]
+        # Sharding after the cut keeps the union of all shards equal to the unsharded sample
+        filtered_urls = [url for url in filtered_urls if in_shard(url, args.shard)]
+
+    # Use the specified output filename
+    output_filename = args.output
+
+    with metrics.stage('save_urls'):
+        if args.format == 'xml':
+            save_urls_to_xml(filtered_urls, output_filename)
+        elif args.format == 'csv':
+            save_urls_to_csv(filtered_urls, output_filename)
+    metrics.wrote_file(output_filename)
+
+    print(f"Output saved to {output_filename}")
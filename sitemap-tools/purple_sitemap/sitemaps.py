@@ -0,0 +1,279 @@
+#
+# Sitemaps
+#
+# Reads the page URLs of a sitemap, following sitemap indexes. The child sitemaps of an
+# index are downloaded concurrently and parsed as they stream in, .xml.gz files are
+# decompressed on the fly, so even a site with millions of URLs is never held in memory as
+# one document.
+#
+# With a mirror directory every sitemap is kept locally with its ETag and Last-Modified
+# headers and the <lastmod> its index gave it. The next read skips children whose <lastmod>
+# did not change and sends conditional GETs for the others, so only changed children are
+# downloaded again.
+#
+#   from purple_sitemap.sitemaps import SitemapLoader, SitemapMirror
+#   with SitemapMirror('sitemap-mirror') as mirror:
+#       urls = SitemapLoader(mirror=mirror).load('https://example.gov/sitemap_index.xml')
+#
+
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import fetcher
+
+DEFAULT_WORKERS = 8
+GZIP_MAGIC = b'\x1f\x8b'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+LOC = f'{{{SITEMAP_NS}}}loc'
+LASTMOD = f'{{{SITEMAP_NS}}}lastmod'
+ENTRY_TAGS = {f'{{{SITEMAP_NS}}}url': 'url', f'{{{SITEMAP_NS}}}sitemap': 'sitemap'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sitemaps (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    file TEXT NOT NULL,
+    entries INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    lastmod TEXT,
+    fetched_at TEXT
+);
+"""
+
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def open_stream(raw):
+    # Wraps a binary stream, decompressing it when it is gzip whatever the file is called
+    import gzip
+
+    stream = io.BufferedReader(raw) if not isinstance(raw, io.BufferedReader) else raw
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parse_sitemap(stream):
+    # Returns ('urlset', [url, ...]) or ('sitemapindex', [(child url, lastmod or None), ...]).
+    # Elements are dropped as soon as they are read. Only a sitemap <loc> and <lastmod> directly
+    # in a <url> or <sitemap> count, extensions like <image:loc> are skipped.
+    from xml.etree.ElementTree import iterparse
+
+    kind = root = None
+    items = []
+    loc = lastmod = None
+    depth = 0  # the root is at depth 1, <url> and <sitemap> at 2, their <loc> at 3
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                kind, root = element.tag.rpartition('}')[2], element
+            continue
+        depth -= 1
+        if depth == 2 and element.tag == LOC:
+            loc = (element.text or '').strip()
+        elif depth == 2 and element.tag == LASTMOD:
+            lastmod = (element.text or '').strip() or None
+        elif depth == 1 and element.tag in ENTRY_TAGS:
+            if loc:
+                items.append(loc if ENTRY_TAGS[element.tag] == 'url' else (loc, lastmod))
+            loc = lastmod = None
+            root.clear()
+    return kind, items
+
+
+class SitemapMirror:
+    # Local copies of sitemaps, the parsed entries of each one in a text file next to an index
+    def __init__(self, directory):
+        import sqlite3
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, 'sitemaps.sqlite'))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, url):
+        entry = self.connection.execute('SELECT * FROM sitemaps WHERE url = ?', (url,)).fetchone()
+        if entry is not None and not os.path.exists(os.path.join(self.directory, entry['file'])):
+            return None
+        return entry
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, entry):
+        # Returns (kind, items) as parse_sitemap did when the sitemap was saved
+        with open(os.path.join(self.directory, entry['file']), 'r', encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        if entry['kind'] == 'sitemapindex':
+            return entry['kind'], [(url, lastmod or None) for url, _, lastmod in (line.partition('\t') for line in lines)]
+        return entry['kind'], lines
+
+    def save(self, url, kind, items, headers, lastmod):
+        filename = f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.txt"
+        path = os.path.join(self.directory, filename)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8', buffering=1 << 20) as file:
+            for item in items:
+                file.write(f"{item[0]}\t{item[1] or ''}\n" if kind == 'sitemapindex' else f"{item}\n")
+        os.replace(temporary, path)
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO sitemaps (url, kind, file, entries, etag, last_modified, lastmod, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, kind, filename, len(items), headers.get('ETag'), headers.get('Last-Modified'), lastmod, now())
+            )
+
+    def not_modified(self, url, lastmod):
+        with self.connection:
+            self.connection.execute('UPDATE sitemaps SET lastmod = ?, fetched_at = ? WHERE url = ?', (lastmod, now(), url))
+
+
+class SitemapLoader:
+    def __init__(self, mirror=None, workers=DEFAULT_WORKERS, fetch=None):
+        self.mirror = mirror
+        self.workers = workers
+        self.fetch = fetch
+        self.sitemaps = {}  # sitemap url or path -> (kind, items)
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'skipped': 0, 'errors': 0}
+
+    def _download(self, url, headers):
+        # Runs in a worker thread, returns (kind, items, response headers) or None on 304
+        def read(response):
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            response.raw.decode_content = True
+            # Keeps urllib3 from closing the stream under the gzip reader at the end of the body
+            response.raw.auto_close = False
+            kind, items = parse_sitemap(open_stream(response.raw))
+            return kind, items, response.headers
+
+        return (self.fetch or fetcher()).read(url, read, headers=headers)
+
+    def _read_file(self, path):
+        with open(path, 'rb') as file:
+            return parse_sitemap(open_stream(file))
+
+    def load(self, source):
+        # Returns the page URLs of a sitemap URL or file, in document order with the children
+        # of an index in place of their entry. Sitemaps that fail are reported and skipped.
+        import requests
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        from xml.etree.ElementTree import ParseError
+
+        self.sitemaps = {}
+        seen = {source}
+        pending = {}
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            def add(url, kind, items):
+                self.sitemaps[url] = (kind, items)
+                if kind == 'sitemapindex':
+                    for child, lastmod in items:
+                        if child not in seen:
+                            seen.add(child)
+                            submit(child, lastmod)
+
+            def submit(url, lastmod):
+                entry = self.mirror.get(url) if self.mirror else None
+                if entry is not None and lastmod and entry['lastmod'] == lastmod:
+                    # The index says the child did not change since it was mirrored
+                    self.stats['skipped'] += 1
+                    metrics.count('sitemaps_skipped')
+                    add(url, *self.mirror.read(entry))
+                    return
+                headers = self.mirror.conditional_headers(entry) if self.mirror else {}
+                pending[pool.submit(self._download, url, headers)] = (url, lastmod, entry)
+
+            if urlparse(source).scheme in ('http', 'https'):
+                submit(source, None)
+            else:
+                with metrics.stage('parse_sitemap'):
+                    add(source, *self._read_file(source))
+                metrics.read_file(source)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, lastmod, entry = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except (requests.RequestException, ParseError, OSError, EOFError) as e:
+                        print(f"Error fetching sitemap {url}: {e}")
+                        self.stats['errors'] += 1
+                        continue
+                    if result is None:
+                        self.stats['not_modified'] += 1
+                        metrics.count('sitemaps_not_modified')
+                        self.mirror.not_modified(url, lastmod)
+                        add(url, *self.mirror.read(entry))
+                        continue
+                    kind, items, headers = result
+                    self.stats['downloaded'] += 1
+                    metrics.count('sitemaps_fetched')
+                    if self.mirror:
+                        self.mirror.save(url, kind, items, headers, lastmod)
+                    add(url, kind, items)
+
+        return list(self._expand(source, set()))
+
+    def _expand(self, url, visited):
+        # Page URLs of one sitemap, an index that lists itself or a parent is only read once
+        if url in visited or url not in self.sitemaps:
+            return
+        visited.add(url)
+        kind, items = self.sitemaps[url]
+        if kind == 'sitemapindex':
+            for child, _ in items:
+                yield from self._expand(child, visited)
+        else:
+            yield from items
+
+    def kind(self, source):
+        # 'urlset' or 'sitemapindex' for a sitemap read by load(), None when it failed
+        return self.sitemaps.get(source, (None,))[0]
+
+
+def add_sitemap_arguments(parser):
+    parser.add_argument('--mirror', default=None,
+                        help='Directory with local copies of the sitemaps, only changed sitemaps are downloaded again')
+    parser.add_argument('--sitemap-workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Child sitemaps of an index downloaded at once (default: {DEFAULT_WORKERS})')
+
+
+@contextmanager
+def sitemap_loader(args=None):
+    # SitemapLoader with the --mirror and --sitemap-workers options, the defaults without args
+    mirror = getattr(args, 'mirror', None)
+    workers = getattr(args, 'sitemap_workers', DEFAULT_WORKERS)
+    if mirror:
+        with SitemapMirror(mirror) as sitemap_mirror:
+            yield SitemapLoader(mirror=sitemap_mirror, workers=workers)
+    else:
+        yield SitemapLoader(workers=workers)
@@ -0,0 +1,150 @@
+#
+# Update Sitemap
+#
+# purple-sitemap update -x sitemap.xml [--changes-store changes.db]
+# Rewrites a sitemap with the final URL of each HTML page that still loads, and with a change
+# store also splits the pages into those changed since their last confirmed scan and the others.
+#
+# purple-sitemap update -x sitemap.xml --changes-store changes.db --scanned sitemap-changed.xml
+# First confirms that the pages of sitemap-changed.xml were scanned, they only count as
+# unchanged from then on.
+#
+
+import os
+import shutil
+from datetime import datetime
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args, fetcher
+from purple_sitemap.changes import ChangeStore
+from purple_sitemap.sitemaps import SitemapLoader, add_sitemap_arguments, sitemap_loader
+
+DESCRIPTION = 'Update sitemap file with valid URLs.'
+TOOL = 'update_sitemap'
+
+def get_final_url_and_mime_type(url, changes=None):
+    # Also returns whether the page changed since its last confirmed scan, None without a change store
+    import requests
+
+    try:
+        headers = changes.conditional_headers(url) if changes else None
+        response = fetcher().get(url, allow_redirects=True, headers=headers)
+        if response.status_code == 304 and changes:
+            page = changes.not_modified(url)
+            if page is not None:
+                return page['final_url'], page['content_type'], 200, changes.changed(page)
+            # Nothing stored to stand in for the body, ask again without conditions
+            response = fetcher().get(url, allow_redirects=True)
+        final_url = response.url
+        mime_type = response.headers.get('Content-Type', '')
+        changed = None
+        if changes and response.status_code == 200 and 'text/html' in mime_type:
+            changed = changes.record(url, response)
+        return final_url, mime_type, response.status_code, changed
+    except requests.RequestException as e:
+        print(f"Error accessing {url}: {e}")
+        return url, None, None, None
+
+def read_scanned_urls(path, loader):
+    # A sitemap like {sitemap}-changed.xml or a list with one URL per line
+    with open(path, 'rb') as file:
+        is_xml = file.read(512).lstrip().startswith((b'<', b'\x1f\x8b'))
+    if is_xml:
+        return loader.load(path)
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+def write_sitemap(urls, sitemap_file):
+    # Manually create sitemap content
+    sitemap_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
+    sitemap_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for url in urls:
+        sitemap_content += f'  <url><loc>{url}</loc></url>\n'
+    sitemap_content += '</urlset>'
+
+    # Write the manually created sitemap to the file
+    with open(sitemap_file, 'w', encoding='utf-8') as file:
+        file.write(sitemap_content)
+    metrics.wrote_file(sitemap_file)
+
+def write_url_list(urls, list_file):
+    with open(list_file, 'w', encoding='utf-8') as file:
+        for url in urls:
+            file.write(f"{url}\n")
+    metrics.wrote_file(list_file)
+
+def update_sitemap(sitemap_file, changes=None, changed_file=None, unchanged_file=None, loader=None):
+    # A sitemap index is expanded, the updated sitemap then lists the pages of all its children
+    loader = loader or SitemapLoader()
+    urls = loader.load(sitemap_file)
+    if loader.stats['errors']:
+        print(f"Could not read {loader.stats['errors']} sitemaps, {sitemap_file} was not changed.")
+        return
+    unique_urls = set()
+    original_url_count = 0
+    updated_url_count = 0
+    changes_made = loader.kind(sitemap_file) == 'sitemapindex'
+    changed_urls = []
+    unchanged_urls = []
+
+    for original_url in urls:
+        original_url_count += 1
+
+        with metrics.stage('get_final_url_and_mime_type'):
+            final_url, mime_type, status_code, changed = get_final_url_and_mime_type(original_url, changes)
+
+        if original_url in unique_urls or mime_type is None or 'text/html' not in mime_type or status_code != 200:
+            changes_made = True
+            continue
+
+        print(f"Adding {final_url}")
+        unique_urls.add(final_url)
+        updated_url_count += 1
+        if changed is not None:
+            (changed_urls if changed else unchanged_urls).append(final_url)
+
+    if changes_made:
+        # Backup the original file
+        backup_filename = f"{os.path.splitext(sitemap_file)[0]}-{datetime.now().strftime('%d%b%Y')}.xml"
+        shutil.copyfile(sitemap_file, backup_filename)
+
+        write_sitemap(unique_urls, sitemap_file)
+
+        print(f"Original URL Count: {original_url_count}")
+        print(f"Updated URL Count (excluding duplicates and invalid): {updated_url_count}")
+        print(f"Changes made. Original file backed up as {backup_filename}")
+    else:
+        print("No changes made to the sitemap.")
+
+    if changes:
+        # Scan only the changed pages, the scoring tools carry the others forward
+        write_sitemap(changed_urls, changed_file)
+        write_url_list(unchanged_urls, unchanged_file)
+        print(f"{len(changed_urls)} pages changed since their last confirmed scan, written to {changed_file}")
+        print(f"{len(unchanged_urls)} unchanged pages written to {unchanged_file}")
+
+def add_arguments(parser):
+    parser.add_argument('-x', '--sitemap', required=True, help='Path to the sitemap file.')
+    parser.add_argument('--changes-store', default=None, help='SQLite file with the ETag, Last-Modified and body hash of each page, enables change detection')
+    parser.add_argument('--changed-out', default=None, help='Sitemap of the pages changed since their last confirmed scan (default: {sitemap}-changed.xml)')
+    parser.add_argument('--scanned', default=None, action='append',
+                        help='Sitemap or URL list of pages whose scan succeeded since the last run, they become the baseline for change detection (repeatable)')
+    parser.add_argument('--unchanged-out', default=None, help='List of the unchanged pages for find-score.py --carry-forward (default: {sitemap}-unchanged.txt)')
+    add_sitemap_arguments(parser)
+    add_fetch_arguments(parser)
+
+def run(args):
+    configure_from_args(args)
+    with sitemap_loader(args) as loader:
+        if args.changes_store:
+            base = os.path.splitext(args.sitemap)[0]
+            with ChangeStore(args.changes_store) as changes:
+                for scanned_file in args.scanned or []:
+                    marked = changes.mark_scanned(read_scanned_urls(scanned_file, loader))
+                    print(f"{marked} pages of {scanned_file} marked as scanned")
+                update_sitemap(args.sitemap, changes, args.changed_out or f"{base}-changed.xml",
+                               args.unchanged_out or f"{base}-unchanged.txt", loader)
+        else:
+            if args.scanned:
+                print("--scanned needs --changes-store, ignored")
+            update_sitemap(args.sitemap, loader=loader)
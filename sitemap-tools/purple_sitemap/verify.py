@@ -0,0 +1,93 @@
+#
+# Remove Duplicates and Verify URLs
+#
+# purple-sitemap verify -c urls.csv -o verified.csv
+# Normalizes a CSV list of URLs, drops duplicates and files that are not pages, and keeps the
+# URLs that load, after following redirects.
+#
+
+import csv
+from datetime import datetime
+from urllib.parse import urlparse, urlunparse
+
+from purple_sitemap.tool_metrics import metrics
+from purple_sitemap.fetch import add_fetch_arguments, configure_from_args, fetcher
+
+DESCRIPTION = 'Remove duplicate and not useful URLs and verify that the URLs work'
+TOOL = 'remove-duplicates-verify-urls'
+
+def normalize_url(url):
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url  # Default to https if no scheme is present
+    parsed = urlparse(url)
+    if parsed.netloc.startswith('www.'):
+        netloc = parsed.netloc[4:]
+    else:
+        netloc = parsed.netloc
+    return urlunparse(parsed._replace(netloc=netloc, scheme='https'))
+
+def should_include_url(url, excluded_extensions):
+    return not any(url.endswith(ext) for ext in excluded_extensions)
+
+def crawl_url(url):
+    import requests
+
+    try:
+        response = fetcher().get(url, allow_redirects=True)
+        if response.history:
+            final_url = response.url
+            return final_url, url, final_url != url
+        if response.status_code == 200:
+            return url, None, False
+    except requests.RequestException as e:
+        print(f"Invalid URL: {url} - Error: {e}")
+    return None, None, False
+
+def process_urls(input_file, excluded_extensions):
+    with open(input_file, 'r') as file:
+        reader = csv.reader(file)
+        urls = set()
+        for row in reader:
+            for url in row:
+                metrics.count('rows_parsed')
+                normalized = normalize_url(url)
+                if should_include_url(normalized, excluded_extensions):
+                    urls.add(normalized)
+        return urls
+
+def add_arguments(parser):
+    parser.add_argument('-c', '--csv', required=True, help='CSV list of URLs.')
+    parser.add_argument('-o', '--output', required=False, help='Path to the output URL.csv')
+    add_fetch_arguments(parser)
+
+def run(args):
+    configure_from_args(args)
+    remove_duplicates_verify_urls(args)
+
+def remove_duplicates_verify_urls(args):
+    excluded_extensions = ['.asp', '.aspx', '.ashx', '.css', '.png', '.json', '.pdf', '.txt', '.js', '.php', '.svg', '.woff2', '.woff', '.ttf', '.eot', '.ico', '.esi', '.gif', '.jpg', '.html', '.rss', '.zip', '.doc', '.docx']
+    with metrics.stage('read_csv'):
+        metrics.read_file(args.csv)
+        urls_to_crawl = process_urls(args.csv, excluded_extensions)
+
+    final_urls = set()
+    for url in urls_to_crawl:
+        with metrics.stage('crawl_url'):
+            resolved_url, original_url, is_redirected = crawl_url(url)
+        if resolved_url:
+            final_urls.add(resolved_url)
+            if is_redirected:
+                print(f"Redirected URL: Original: {original_url}, Final: {resolved_url}")
+
+    output_file = args.output
+    if not output_file:
+        second_url = list(urls_to_crawl)[1]
+        domain = urlparse(second_url).netloc
+        today = datetime.today().strftime('%d%m%Y')
+        output_file = f"{domain}-{today}.csv"
+
+    with open(output_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        for url in final_urls:
+            writer.writerow([url])
+    metrics.wrote_file(output_file)
@@ -5,79 +5,11 @@
 # Pulls a list of domain names from "domain_source.csv" and then saves successfully discovered sitemaps to "sitemap_extracts.csv" 
 # and also includes a list of failures "sitemap_failures.csv" for manual inspection.
 #
+# Same as `purple-sitemap discover`, the code is in purple_sitemap/discovery.py. This script
+# is kept so the shell drivers and existing commands keep working.
+#
 
-import csv
-import requests
-from urllib.parse import urljoin, urlparse, urlunparse
-from bs4 import BeautifulSoup
-from lxml import etree
-import xml.etree.ElementTree as ET
-from urllib.request import urlopen
-from urllib.error import URLError
-from lxml import etree
-
-def is_valid_sitemap(xml_content):
-    try:
-        schema_url = "http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd"
-        schema_file = urlopen(schema_url)
-        schema_doc = etree.parse(schema_file)
-        xmlschema = etree.XMLSchema(schema_doc)
-        parser = etree.XMLParser(schema=xmlschema)
-        etree.fromstring(xml_content, parser)
-        return True
-    except (ET.ParseError, URLError, etree.XMLSyntaxError):
-        return False
-
-def get_valid_domains(domains):
-    valid_domains = set()
-    failed_domains = set()
-
-    for domain in domains:
-        try:
-            # Step 1: Check if the main page loads
-            response = requests.get(domain, timeout=5)
-            if response.status_code == 200:
-                # Step 2: Check for sitemap.xml
-                sitemap_url = urljoin(response.url, '/sitemap.xml')
-                sitemap_response = requests.get(sitemap_url, timeout=5)
-                if sitemap_response.status_code == 200 and is_valid_sitemap(sitemap_response.content):
-                    valid_domains.add(sitemap_url)
-                else:
-                    valid_domains.add(urlunparse(urlparse(response.url)._replace(path='', query='', fragment='')))
-                    failed_domains.add(domain)  # Add the main domain to failures if sitemap is not found or not valid
-
-        except requests.RequestException as e:
-            print(f"Error processing domain {domain}: {e}")
-            failed_domains.add(domain)
-
-    return valid_domains, failed_domains
-
-def read_domains_from_csv(file_path):
-    domains = set()
-    with open(file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if row:  # Check if the row is not empty
-                domains.add(row[0])
-    return domains
-
-def write_domains_to_csv(file_path, domains):
-    with open(file_path, 'w', encoding='utf-8', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        for domain in domains:
-            writer.writerow([domain])
-
-if __name__ == "__main__":
-    input_domains = read_domains_from_csv("domain_source.csv")
-    unique_valid_domains, failed_domains = get_valid_domains(input_domains)
-    
-    write_domains_to_csv("sitemap_extracts.csv", unique_valid_domains)
-    write_domains_to_csv("sitemap_failures.csv", failed_domains)
-
-    print("Domains with sitemaps:")
-    for domain in unique_valid_domains:
-        print(domain)
+from purple_sitemap.cli import run_tool
 
-    print("\nDomains without sitemaps:")
-    for domain in failed_domains:
-        print(domain)
+if __name__ == '__main__':
+    run_tool('discover')